@@ -0,0 +1,75 @@
+# benchmarks/bench_cli_startup.py
+"""命令行入口的启动耗时预算（见 cli.py 说明）
+
+- `python cli.py --help` 的总耗时（含解释器启动）不超过 --help-budget 毫秒；
+- 生成所需模块（pandas、openpyxl、fpdf 等）的导入耗时不超过 --import-budget 毫秒；
+- 用示例台账完整生成一次 Excel 和 PDF，过程中不得导入 PyQt6。
+
+任一项不满足时以退出码 1 结束。
+
+用法：python benchmarks/bench_cli_startup.py [--repeat 5] [--help-budget 150] [--import-budget 1000]
+"""
+import sys
+import os
+import json
+import time
+import argparse
+import subprocess
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CLI = os.path.join(ROOT_DIR, "cli.py")
+
+RUN = """
+import sys, json, time, tempfile, contextlib, os
+sys.path.insert(0, {root!r})
+start = time.perf_counter()
+import cli
+import core.template_manager, core.ledger, generators.excel_generator, generators.pdf_generator
+imports = time.perf_counter() - start
+with tempfile.TemporaryDirectory() as tmp, contextlib.redirect_stdout(sys.stderr):
+    code = cli.main([{ledger!r}, "--excel", os.path.join(tmp, "询证函.xlsx"), "--pdf", tmp, "--workers", "1"])
+qt = sorted(name for name in sys.modules if name.split(".")[0] == "PyQt6")
+print(json.dumps({{"imports": imports, "code": code, "qt": qt}}))
+"""
+
+
+def help_time(repeat):
+    """取多次运行的中位数，排除磁盘缓存等偶然因素"""
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, CLI, "--help"], capture_output=True, check=True)
+        times.append(time.perf_counter() - start)
+    return sorted(times)[len(times) // 2]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--help-budget", type=float, default=150, help="毫秒")
+    parser.add_argument("--import-budget", type=float, default=1000, help="毫秒")
+    args = parser.parse_args()
+
+    ok = True
+    elapsed = help_time(args.repeat) * 1000
+    passed = elapsed <= args.help_budget
+    ok &= passed
+    print(f"cli.py --help:     {elapsed:7.1f} ms  (预算 {args.help_budget:.0f} ms) {'通过' if passed else '超出'}")
+
+    ledger = os.path.join(ROOT_DIR, "example_input.xlsx")
+    out = subprocess.run([sys.executable, "-c", RUN.format(root=ROOT_DIR, ledger=ledger)],
+                         capture_output=True, text=True, check=True)
+    result = json.loads(out.stdout.strip().splitlines()[-1])
+    elapsed = result["imports"] * 1000
+    passed = elapsed <= args.import_budget
+    ok &= passed
+    print(f"生成模块导入:      {elapsed:7.1f} ms  (预算 {args.import_budget:.0f} ms) {'通过' if passed else '超出'}")
+    passed = result["code"] == 0 and not result["qt"]
+    ok &= passed
+    print(f"示例台账生成:      退出码 {result['code']}  导入的 PyQt6 模块 {result['qt'] or '无'}")
+
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,56 @@
+# benchmarks/bench_clone_sheet.py
+"""对比逐单元格复制（旧）与编译计划（新）两种方式克隆模板工作表的单张耗时
+
+用法：python benchmarks/bench_clone_sheet.py [--sheets 500]
+"""
+import sys
+import os
+import time
+import argparse
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT_DIR not in sys.path:
+    sys.path.insert(0, ROOT_DIR)
+
+from openpyxl import load_workbook, Workbook
+
+from core.utils import get_default_template_path, compile_sheet, stamp_sheet, _copy_sheet
+
+
+def bench_legacy(template_ws, sheets):
+    wb = Workbook()
+    wb.remove(wb.active)
+    start = time.perf_counter()
+    for i in range(sheets):
+        _copy_sheet(template_ws, wb.create_sheet(title=f"S{i}"))
+    return time.perf_counter() - start
+
+
+def bench_plan(template_ws, sheets):
+    wb = Workbook()
+    wb.remove(wb.active)
+    start = time.perf_counter()
+    plan = compile_sheet(template_ws)
+    for i in range(sheets):
+        stamp_sheet(plan, wb, f"S{i}")
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sheets", type=int, default=500)
+    parser.add_argument("--template", default=get_default_template_path())
+    args = parser.parse_args()
+
+    template_ws = load_workbook(args.template).active
+    legacy = bench_legacy(template_ws, args.sheets)
+    plan = bench_plan(template_ws, args.sheets)
+
+    print(f"工作表数量: {args.sheets}")
+    print(f"逐单元格复制: {legacy / args.sheets * 1000:.3f} ms/张")
+    print(f"编译计划:     {plan / args.sheets * 1000:.3f} ms/张（含一次编译）")
+    print(f"加速比:       {legacy / plan:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+# benchmarks/bench_excel_backends.py
+"""对比 openpyxl 后端与 xml 后端：耗时，以及两者输出的单元格值、样式、合并单元格、行列尺寸是否一致
+
+用法：python benchmarks/bench_excel_backends.py [--letters 1000]
+输出不一致时以非零状态码退出。
+"""
+import sys
+import os
+import time
+import argparse
+import tempfile
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT_DIR not in sys.path:
+    sys.path.insert(0, ROOT_DIR)
+
+from openpyxl import load_workbook
+
+from core.utils import get_default_template_path
+from generators.excel_generator import generate_excel
+from benchmarks.sample_data import make_batch
+
+
+def snapshot(path):
+    """按工作表提取可见内容；各工作簿的默认字体统一记为 DEFAULT"""
+    wb = load_workbook(path)
+    default_font = wb._fonts[0]
+    sheets = []
+    for ws in wb.worksheets:
+        cells = {}
+        for row in ws.iter_rows():
+            for c in row:
+                if not c.has_style and c.value is None:
+                    continue
+                cells[c.coordinate] = (
+                    type(c).__name__, c.value,
+                    "DEFAULT" if c.font == default_font else repr(c.font),
+                    repr(c.border), repr(c.fill), c.number_format,
+                    repr(c.alignment), repr(c.protection),
+                )
+        sheets.append((
+            ws.title, cells, sorted(map(str, ws.merged_cells)),
+            {k: v.width for k, v in ws.column_dimensions.items()},
+            {k: v.height for k, v in ws.row_dimensions.items() if v.height},
+        ))
+    return sheets
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--letters", type=int, default=1000)
+    parser.add_argument("--template", default=get_default_template_path())
+    parser.add_argument("--compare-letters", type=int, default=50, help="用于逐单元格比对的询证函数量")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        data_list = make_batch(args.letters)
+        timings = {}
+        for backend, kwargs in (("openpyxl", {"streaming": True}), ("xml", {"backend": "xml"})):
+            start = time.perf_counter()
+            generate_excel(data_list, args.template, os.path.join(tmp, f"{backend}.xlsx"), **kwargs)
+            timings[backend] = time.perf_counter() - start
+            print(f"{backend:<8} {timings[backend]:.2f} s  {timings[backend] / args.letters * 1000:.3f} ms/张")
+        print(f"加速比: {timings['openpyxl'] / timings['xml']:.1f}x")
+
+        sample = data_list.letters[:args.compare_letters]
+        generate_excel(sample, args.template, os.path.join(tmp, "a.xlsx"))
+        generate_excel(sample, args.template, os.path.join(tmp, "b.xlsx"), backend="xml")
+        if snapshot(os.path.join(tmp, "a.xlsx")) != snapshot(os.path.join(tmp, "b.xlsx")):
+            print("输出不一致！")
+            sys.exit(1)
+        print(f"前 {len(sample)} 份询证函两种后端输出一致")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,48 @@
+# benchmarks/bench_excel_shards.py
+"""Excel 分片输出：单个工作簿 vs 按 --shard-size 拆分、不同进程数生成的耗时
+
+用法：python benchmarks/bench_excel_shards.py [--letters 3000] [--shard-size 500] [--workers 1 2 4] [--backend openpyxl]
+"""
+import sys
+import os
+import time
+import argparse
+import tempfile
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT_DIR not in sys.path:
+    sys.path.insert(0, ROOT_DIR)
+
+from core.utils import get_default_template_path
+from generators.excel_generator import generate_excel
+from generators.excel_shards import generate_excel_shards
+from benchmarks.sample_data import make_batch
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--letters", type=int, default=3000)
+    parser.add_argument("--shard-size", type=int, default=500)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--backend", choices=("openpyxl", "xml"), default="openpyxl")
+    args = parser.parse_args()
+
+    batch = make_batch(args.letters)
+    template = get_default_template_path()
+    with tempfile.TemporaryDirectory() as tmp:
+        start = time.perf_counter()
+        generate_excel(batch, template, os.path.join(tmp, "单个.xlsx"), streaming=True, backend=args.backend)
+        single = time.perf_counter() - start
+        size = os.path.getsize(os.path.join(tmp, "单个.xlsx")) / 1024 / 1024
+        print(f"单个工作簿:              {single:7.2f} s  ({size:.1f} MB)")
+        for workers in args.workers:
+            start = time.perf_counter()
+            generate_excel_shards(batch, template, os.path.join(tmp, f"分片{workers}.xlsx"),
+                                  shard_size=args.shard_size, workers=workers, backend=args.backend)
+            elapsed = time.perf_counter() - start
+            print(f"分片（每个 {args.shard_size} 张，{workers} 进程）: {elapsed:7.2f} s  "
+                  f"(单个工作簿的 {single / elapsed:.1f} 倍速度)")
+
+
+if __name__ == "__main__":
+    main()
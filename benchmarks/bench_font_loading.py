@@ -0,0 +1,74 @@
+# benchmarks/bench_font_loading.py
+"""InquiryPDF 每份询证函的字体加载耗时：fpdf 原生 add_font、磁盘缓存冷启动、进程内缓存
+
+用法：python benchmarks/bench_font_loading.py [--repeat 20]
+"""
+import sys
+import os
+import time
+import argparse
+import subprocess
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT_DIR not in sys.path:
+    sys.path.insert(0, ROOT_DIR)
+
+from fpdf import FPDF
+
+from generators.pdf_generator import InquiryPDF
+from generators.font_cache import _cache_file
+
+FONT_DIR = os.path.join(ROOT_DIR, "assets", "fonts")
+FONTS = [
+    ("AlibabaPuHuiTi-M", os.path.join(FONT_DIR, "AlibabaPuHuiTi-3-65-Medium.ttf")),
+    ("AlibabaPuHuiTi-L", os.path.join(FONT_DIR, "AlibabaPuHuiTi-3-45-Light.ttf")),
+]
+
+COLD_START = """
+import sys, time
+sys.path.insert(0, {root!r})
+from generators.pdf_generator import InquiryPDF
+start = time.perf_counter()
+InquiryPDF()
+print(time.perf_counter() - start)
+"""
+
+
+def per_call(func, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        func()
+    return (time.perf_counter() - start) / repeat
+
+
+def uncached():
+    pdf = FPDF()
+    for family, path in FONTS:
+        pdf.add_font(family, "", path)
+
+
+def cold_start():
+    """新进程中第一次构造 InquiryPDF 的耗时（读取磁盘缓存）"""
+    out = subprocess.run([sys.executable, "-c", COLD_START.format(root=ROOT_DIR)],
+                         capture_output=True, text=True, check=True)
+    return float(out.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    missing = [path for _, path in FONTS if not os.path.exists(path)]
+    if missing:
+        sys.exit(f"缺少字体文件：{', '.join(missing)}")
+
+    InquiryPDF()  # 确保磁盘缓存已生成
+    print(f"fpdf add_font（每份都解析）: {per_call(uncached, args.repeat) * 1000:8.2f} ms/份")
+    print(f"磁盘缓存（新进程首份）:      {cold_start() * 1000:8.2f} ms")
+    print(f"进程内缓存:                  {per_call(InquiryPDF, args.repeat) * 1000:8.2f} ms/份")
+    print(f"缓存文件: {_cache_file(FONTS[0][1]).parent}")
+
+
+if __name__ == "__main__":
+    main()
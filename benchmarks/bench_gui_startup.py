@@ -0,0 +1,95 @@
+# benchmarks/bench_gui_startup.py
+"""桌面程序的冷启动耗时：导入 core.gui 的耗时、到窗口第一次绘制的耗时，以及窗口显示后后台预热的耗时
+
+导入 core.gui 时不应加载 pandas、openpyxl、fpdf、fontTools；超出预算或加载了这些模块时以退出码 1 结束。
+每项都在新进程中测量（需要安装 PyQt6；无显示器的环境可用 --platform offscreen）。
+
+用法：python benchmarks/bench_gui_startup.py [--repeat 3] [--import-budget 300] [--window-budget 500] [--platform offscreen]
+"""
+import sys
+import os
+import json
+import time
+import argparse
+import subprocess
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+HEAVY_MODULES = ("pandas", "openpyxl", "fpdf", "fontTools")
+
+RUN = """
+import time
+start = time.perf_counter()
+import sys, json, threading
+sys.path.insert(0, {root!r})
+import core.gui
+imported = time.perf_counter() - start
+heavy = [name for name in {heavy!r} if name in sys.modules]
+
+from PyQt6.QtCore import QObject, QEvent, QTimer
+from PyQt6.QtWidgets import QApplication
+
+class FirstPaint(QObject):
+    painted = None
+
+    def eventFilter(self, obj, event):
+        if event.type() == QEvent.Type.Paint and self.painted is None:
+            self.painted = time.perf_counter() - start
+            QTimer.singleShot(0, app.quit)
+        return False
+
+app = QApplication(sys.argv)
+core.gui.DarkTheme.apply(app)
+window = core.gui.ExcelToInquiryLetter()
+first_paint = FirstPaint()
+window.installEventFilter(first_paint)
+window.show()
+app.exec()
+
+warm_start = time.perf_counter()
+core.gui.warm_up()
+warm = time.perf_counter() - warm_start
+print(json.dumps({{"imported": imported, "heavy": heavy, "window": first_paint.painted, "warm": warm}}))
+"""
+
+
+def measure(env):
+    start = time.perf_counter()
+    out = subprocess.run([sys.executable, "-c", RUN.format(root=ROOT_DIR, heavy=HEAVY_MODULES)],
+                         capture_output=True, text=True, check=True, env=env)
+    result = json.loads(out.stdout.strip().splitlines()[-1])
+    # 进程内计时不含解释器启动，这里补上
+    result["process"] = time.perf_counter() - start
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--import-budget", type=float, default=300, help="毫秒")
+    parser.add_argument("--window-budget", type=float, default=500, help="毫秒")
+    parser.add_argument("--platform", help="QT_QPA_PLATFORM，例如 offscreen")
+    args = parser.parse_args()
+
+    env = dict(os.environ)
+    if args.platform:
+        env["QT_QPA_PLATFORM"] = args.platform
+
+    results = [measure(env) for _ in range(args.repeat)]
+
+    def median(key):
+        return sorted(r[key] for r in results)[len(results) // 2] * 1000
+
+    heavy = sorted({name for r in results for name in r["heavy"]})
+    imported, window = median("imported"), median("window")
+    ok = imported <= args.import_budget and window <= args.window_budget and not heavy
+    print(f"导入 core.gui:     {imported:7.1f} ms  (预算 {args.import_budget:.0f} ms)")
+    print(f"窗口首次绘制:      {window:7.1f} ms  (预算 {args.window_budget:.0f} ms，从进程内开始计时)")
+    print(f"进程总耗时:        {median('process'):7.1f} ms  (含解释器启动与退出)")
+    print(f"后台预热:          {median('warm'):7.1f} ms  (窗口显示后执行)")
+    print(f"导入时加载的重模块: {', '.join(heavy) or '无'}")
+    print("通过" if ok else "超出预算")
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+# benchmarks/bench_ledger_probe.py
+"""选择台账时的探查耗时：在一份很大的合成台账上比较
+
+- probe：core.ledger.list_sheets + probe_sheet（只读工作簿清单和表头，数据行按字节计数）；
+- pandas：pd.ExcelFile 列出工作表 + read_excel 读入整张工作表（旧实现选择台账、生成前各读一遍）；
+- stream：read_letters 逐行读完整张工作表（生成时的读取耗时，作为参照）。
+
+probe 超过 --budget 毫秒时以退出码 1 结束。未安装 pandas 时跳过 pandas 一项。
+合成台账生成较慢，可用 --ledger 指定已有的台账文件（工作表名为“台账”）。
+
+用法：python benchmarks/bench_ledger_probe.py [--rows 20000] [--extra-columns 40] [--budget 1000] [--ledger 台账.xlsx]
+"""
+import sys
+import os
+import time
+import argparse
+import tempfile
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT_DIR not in sys.path:
+    sys.path.insert(0, ROOT_DIR)
+
+from core.ledger import TEMPLATE_FIELDS, list_sheets, probe_sheet, read_letters
+from benchmarks.sample_data import make_ledger
+
+SHEET = "台账"
+FIELDS = {key: key for key in TEMPLATE_FIELDS}
+DATE = "2025.11.1"
+
+
+def timed(func, repeat):
+    """取多次运行的中位数"""
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        times.append(time.perf_counter() - start)
+    return sorted(times)[len(times) // 2], result
+
+
+def probe(path):
+    list_sheets(path)
+    return probe_sheet(path, SHEET)
+
+
+def pandas_read(path):
+    import pandas as pd
+    pd.ExcelFile(path).sheet_names
+    return len(pd.read_excel(path, sheet_name=SHEET, dtype=str))
+
+
+def stream_read(path):
+    return sum(1 for _ in read_letters(path, SHEET, FIELDS, DATE))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=20000)
+    parser.add_argument("--extra-columns", type=int, default=40)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--budget", type=float, default=1000, help="probe 的耗时上限（毫秒）")
+    parser.add_argument("--ledger", help="使用已有的台账文件，不生成合成台账")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = args.ledger
+        if path is None:
+            path = make_ledger(os.path.join(tmp, "台账.xlsx"), args.rows, extra_columns=args.extra_columns,
+                               realistic=True)
+        print(f"台账：{os.path.getsize(path) / 1024 / 1024:.1f} MB")
+
+        seconds, result = timed(lambda: probe(path), args.repeat)
+        print(f"probe:  {seconds * 1000:9.1f} ms  表头 {len(result.columns)} 列，缺少 {result.missing or '无'}，"
+              f"{result.rows} 行")
+        passed = seconds * 1000 <= args.budget
+
+        try:
+            import pandas  # noqa: F401
+        except ImportError:
+            print("pandas: 未安装，跳过")
+        else:
+            elapsed, rows = timed(lambda: pandas_read(path), 1)
+            print(f"pandas: {elapsed * 1000:9.1f} ms  {rows} 行（probe 的 {elapsed / seconds:.0f} 倍）")
+        elapsed, letters = timed(lambda: stream_read(path), 1)
+        print(f"stream: {elapsed * 1000:9.1f} ms  {letters} 份（probe 的 {elapsed / seconds:.0f} 倍）")
+        # 合成台账没有只在其他列有值的行，两者应当相同
+        if result.rows != letters and args.ledger is None:
+            print("probe 的行数与逐行读取的份数不一致")
+            passed = False
+
+    print(f"预算 {args.budget:.0f} ms：{'通过' if passed else '未通过'}")
+    sys.exit(0 if passed else 1)
+
+
+if __name__ == "__main__":
+    main()
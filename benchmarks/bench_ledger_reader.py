@@ -0,0 +1,98 @@
+# benchmarks/bench_ledger_reader.py
+"""台账读取：pandas.read_excel + iterrows（旧实现）vs core.ledger.read_letters 逐行读取必需列
+
+每种方式在独立子进程中运行，比较耗时与峰值常驻内存（依赖 resource 模块，Windows 上不统计内存），
+并校验两者得到的询证函数据一致。
+
+用法：python benchmarks/bench_ledger_reader.py [--rows 20000] [--extra-columns 40]
+"""
+import sys
+import os
+import json
+import argparse
+import tempfile
+import subprocess
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT_DIR not in sys.path:
+    sys.path.insert(0, ROOT_DIR)
+
+from benchmarks.sample_data import make_ledger
+
+RUN = """
+import sys, json, time, hashlib
+sys.path.insert(0, {root!r})
+from core.ledger import REQUIRED_COLUMNS, TEMPLATE_FIELDS, read_letters
+from core.utils import get_season_from_date
+
+FIELDS = {{key: key for key in TEMPLATE_FIELDS}}
+DATE = "2025.11.1"
+
+
+def pandas_letters(path, sheet):
+    import pandas as pd
+    df = pd.read_excel(path, sheet_name=sheet, dtype=str)
+    df = df.fillna("")
+    season = get_season_from_date(DATE)
+    for _, row in df.iterrows():
+        yield {{
+            'sheet_name': str(row["工作表名称"]),
+            'number': row["编号"],
+            'unit': row["函证单位"],
+            'project': row["工程项目"] or "",
+            'receivable': row["应收帐款（已开票末付款）"] or "0.00",
+            'long_term': row["长期应收款（质量保金）"] or "0.00",
+            'total': row["合计"] or "0.00",
+            **FIELDS,
+            'date': DATE,
+            'season': season,
+        }}
+
+
+start = time.perf_counter()
+if {method!r} == "pandas":
+    letters = pandas_letters({path!r}, "台账")
+else:
+    letters = read_letters({path!r}, "台账", FIELDS, DATE)
+digest = hashlib.md5()
+count = 0
+for data in letters:
+    if not isinstance(data, dict):
+        data = data.to_dict()
+    digest.update(json.dumps(data, ensure_ascii=False, sort_keys=True).encode())
+    count += 1
+elapsed = time.perf_counter() - start
+try:
+    import resource
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    peak = peak / 1024 if sys.platform != "darwin" else peak / 1024 / 1024
+except ImportError:
+    peak = None
+print(json.dumps({{"elapsed": elapsed, "count": count, "digest": digest.hexdigest(), "peak": peak}}))
+"""
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=20000)
+    parser.add_argument("--extra-columns", type=int, default=40)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = make_ledger(os.path.join(tmp, "台账.xlsx"), args.rows, args.extra_columns)
+        results = {}
+        for method, label in (("pandas", "read_excel + iterrows"), ("stream", "read_letters")):
+            out = subprocess.run([sys.executable, "-c", RUN.format(root=ROOT_DIR, method=method, path=path)],
+                                 capture_output=True, text=True, check=True)
+            result = results[method] = json.loads(out.stdout.strip().splitlines()[-1])
+            peak = f"{result['peak']:7.1f} MB" if result["peak"] is not None else "    未统计"
+            print(f"{label:<22} {result['elapsed']:6.2f} s  {result['count']} 份  峰值内存 {peak}")
+
+    if results["pandas"]["digest"] != results["stream"]["digest"]:
+        print("两种方式得到的询证函数据不一致！")
+        sys.exit(1)
+    print("两种方式得到的询证函数据一致")
+
+
+if __name__ == "__main__":
+    main()
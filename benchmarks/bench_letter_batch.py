@@ -0,0 +1,57 @@
+# benchmarks/bench_letter_batch.py
+"""询证函数据的内存占用：每行一个字典（旧格式）vs LetterBatch（共享字段只存一份，每行一个 __slots__ 记录）
+
+两种方式引用同一批单元格字符串，只统计容器本身新增的内存（tracemalloc）。
+
+用法：python benchmarks/bench_letter_batch.py [--rows 100000]
+"""
+import sys
+import os
+import argparse
+import tracemalloc
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT_DIR not in sys.path:
+    sys.path.insert(0, ROOT_DIR)
+
+from core.letters import Letter, LetterHeader, LetterBatch, ROW_FIELDS, HEADER_FIELDS
+from benchmarks.sample_data import make_data_list
+
+
+def measure(build):
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    result = build()
+    used = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    return result, used
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=100000)
+    args = parser.parse_args()
+
+    sample = make_data_list(args.rows)
+    rows = [tuple(data[name] for name in ROW_FIELDS) for data in sample]
+    shared = tuple(sample[0][name] for name in HEADER_FIELDS)
+    del sample
+
+    def dicts():
+        return [dict(zip(ROW_FIELDS + HEADER_FIELDS, row + shared)) for row in rows]
+
+    def batch():
+        header = LetterHeader(*shared)
+        return LetterBatch(header, [Letter(header, *row) for row in rows])
+
+    scale = 100000 / args.rows
+    results = {}
+    for label, build in (("字典列表", dicts), ("LetterBatch", batch)):
+        _, used = measure(build)
+        results[label] = used
+        print(f"{label:<12} {used / args.rows:6.1f} 字节/行  {used * scale / 1024 / 1024:7.1f} MB/10 万行")
+    print(f"节省: {1 - results['LetterBatch'] / results['字典列表']:.0%}")
+
+
+if __name__ == "__main__":
+    main()
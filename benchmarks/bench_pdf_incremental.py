@@ -0,0 +1,71 @@
+# benchmarks/bench_pdf_incremental.py
+"""增量生成 PDF：首次生成、台账不变时再次生成、修改少数几行后再次生成的耗时
+
+修改后的结果与全量生成逐文件比较页数和页面内容流（需要 pypdf；未安装时跳过比较）。
+
+用法：python benchmarks/bench_pdf_incremental.py [--letters 1000] [--changed 10] [--workers 1]
+"""
+import sys
+import os
+import time
+import argparse
+import tempfile
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT_DIR not in sys.path:
+    sys.path.insert(0, ROOT_DIR)
+
+from core.letters import Letter, LetterBatch
+from generators.pdf_generator import generate_pdfs
+from benchmarks.sample_data import make_batch
+
+
+def timed(data_list, output_dir, workers, incremental=True):
+    start = time.perf_counter()
+    generate_pdfs(data_list, output_dir, workers=workers, incremental=incremental)
+    return time.perf_counter() - start
+
+
+def pdf_contents(directory):
+    try:
+        from pypdf import PdfReader
+    except ImportError:
+        return None
+    return {name: [page.get_contents().get_data() for page in PdfReader(os.path.join(directory, name)).pages]
+            for name in sorted(os.listdir(directory)) if name.endswith(".pdf")}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--letters", type=int, default=1000)
+    parser.add_argument("--changed", type=int, default=10)
+    parser.add_argument("--workers", type=int, default=1)
+    args = parser.parse_args()
+
+    batch = make_batch(args.letters)
+    letters = list(batch)
+    step = max(1, len(letters) // args.changed)
+    for i in range(0, len(letters), step)[:args.changed]:
+        old = letters[i]
+        letters[i] = Letter(old.header, old.sheet_name, old.number, old.unit, old.project,
+                            "1.00", old.long_term, old.total)
+    changed = LetterBatch(batch.header, letters)
+
+    with tempfile.TemporaryDirectory() as out, tempfile.TemporaryDirectory() as full:
+        first = timed(batch, out, args.workers)
+        again = timed(batch, out, args.workers)
+        incremental = timed(changed, out, args.workers)
+        rebuilt = timed(changed, full, args.workers, incremental=False)
+        print(f"首次生成（同时写入缓存）: {first:7.2f} s")
+        print(f"台账不变，再次生成:       {again:7.2f} s")
+        print(f"修改 {args.changed} 行，增量生成:     {incremental:7.2f} s")
+        print(f"修改 {args.changed} 行，全量生成:     {rebuilt:7.2f} s")
+        expected = pdf_contents(full)
+        if expected is None:
+            print("未安装 pypdf，跳过结果比较")
+        else:
+            print("结果与全量生成一致" if pdf_contents(out) == expected else "结果与全量生成不一致")
+
+
+if __name__ == "__main__":
+    main()
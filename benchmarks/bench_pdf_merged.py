@@ -0,0 +1,54 @@
+# benchmarks/bench_pdf_merged.py
+"""generate_pdfs 的耗时与峰值内存：台账行数增加时，合并 PDF 的内存占用应基本不变
+
+每个行数在独立子进程中运行，峰值常驻内存互不影响（依赖 resource 模块，Windows 上不统计内存）。
+
+用法：python benchmarks/bench_pdf_merged.py [--letters 100 500 2000]
+"""
+import sys
+import os
+import json
+import argparse
+import subprocess
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT_DIR not in sys.path:
+    sys.path.insert(0, ROOT_DIR)
+
+RUN = """
+import sys, os, json, time, tempfile
+sys.path.insert(0, {root!r})
+from generators.pdf_generator import generate_pdfs
+from benchmarks.sample_data import make_batch
+data_list = make_batch({letters})
+with tempfile.TemporaryDirectory() as tmp:
+    start = time.perf_counter()
+    generate_pdfs(data_list, tmp)
+    elapsed = time.perf_counter() - start
+    merged = os.path.getsize(os.path.join(tmp, "询证函-合并.pdf"))
+try:
+    import resource
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    peak = peak / 1024 if sys.platform != "darwin" else peak / 1024 / 1024
+except ImportError:
+    peak = None
+print(json.dumps({{"elapsed": elapsed, "merged": merged, "peak": peak}}))
+"""
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--letters", type=int, nargs="+", default=[100, 500, 2000])
+    args = parser.parse_args()
+
+    for letters in args.letters:
+        out = subprocess.run([sys.executable, "-c", RUN.format(root=ROOT_DIR, letters=letters)],
+                             capture_output=True, text=True, check=True)
+        result = json.loads(out.stdout.strip().splitlines()[-1])
+        peak = f"{result['peak']:7.1f} MB" if result["peak"] is not None else "    未统计"
+        print(f"{letters:>6} 份: {result['elapsed']:7.2f} s  {result['elapsed'] / letters * 1000:6.1f} ms/份  "
+              f"峰值内存 {peak}  合并 PDF {result['merged'] / 1024:8.1f} KB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+# benchmarks/bench_pdf_pipeline.py
+"""多进程 PDF 流水线：从台账逐行读入到写出，总耗时、第一份单份 PDF 出现的时间和主进程峰值内存
+
+台账用 core.ledger.read_letters 惰性读取（不校验），对比先把台账全部读入再生成（list）与边读边生成（stream）。
+峰值内存为主进程中 tracemalloc 记录的 Python 分配（不含子进程）；tracemalloc 会拖慢主进程，
+只比较耗时时加 --no-memory。
+
+用法：python benchmarks/bench_pdf_pipeline.py [--rows 400] [--workers 2] [--no-memory]
+"""
+import sys
+import os
+import time
+import argparse
+import tempfile
+import threading
+import tracemalloc
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT_DIR not in sys.path:
+    sys.path.insert(0, ROOT_DIR)
+
+from core.ledger import TEMPLATE_FIELDS, read_letters
+from generators.pdf_generator import generate_pdfs
+from benchmarks.sample_data import make_ledger
+
+SHEET = "台账"
+FIELDS = {key: key for key in TEMPLATE_FIELDS}
+DATE = "2025.11.1"
+MERGED = "询证函-合并.pdf"
+
+
+def first_output(output_dir, start, stop):
+    """轮询输出目录，返回第一份单份 PDF 出现时距 start 的秒数"""
+    while not stop.is_set():
+        if os.path.isdir(output_dir) and any(name.endswith(".pdf") and name != MERGED
+                                             for name in os.listdir(output_dir)):
+            return time.perf_counter() - start
+        time.sleep(0.01)
+    return None
+
+
+def run(ledger, output_dir, workers, materialize, memory):
+    result = {}
+    stop = threading.Event()
+    start = time.perf_counter()
+    watcher = threading.Thread(target=lambda: result.setdefault("first", first_output(output_dir, start, stop)))
+    watcher.start()
+    if memory:
+        tracemalloc.start()
+    try:
+        letters = read_letters(ledger, SHEET, FIELDS, DATE)
+        if materialize:
+            letters = list(letters)
+        generate_pdfs(letters, output_dir, workers=workers)
+        peak = tracemalloc.get_traced_memory()[1] if memory else None
+    finally:
+        tracemalloc.stop()
+        elapsed = time.perf_counter() - start
+        stop.set()
+        watcher.join()
+    return elapsed, result.get("first"), peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=400)
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--no-memory", action="store_true", help="不记录主进程峰值内存")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        ledger = make_ledger(os.path.join(tmp, "台账.xlsx"), args.rows, realistic=True)
+        print(f"台账 {args.rows} 行，{args.workers} 进程，CPU 核数: {os.cpu_count()}")
+        for name, materialize in (("list", True), ("stream", False)):
+            elapsed, first, peak = run(ledger, os.path.join(tmp, name), args.workers, materialize,
+                                       not args.no_memory)
+            first = f"{first:6.2f} s" if first is not None else "     -"
+            peak = f"{peak / 1024 / 1024:6.1f} MB" if peak is not None else "     -"
+            print(f"{name:6s}: 总耗时 {elapsed:6.2f} s  第一份 PDF {first}  主进程峰值 {peak}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,40 @@
+# benchmarks/bench_pdf_workers.py
+"""generate_pdfs 多进程扩展性：分别以 1、2、4、8 个进程生成同一批询证函
+
+用法：python benchmarks/bench_pdf_workers.py [--letters 200] [--workers 1 2 4 8]
+"""
+import sys
+import os
+import time
+import argparse
+import tempfile
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT_DIR not in sys.path:
+    sys.path.insert(0, ROOT_DIR)
+
+from generators.pdf_generator import generate_pdfs
+from benchmarks.sample_data import make_batch
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--letters", type=int, default=200)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, 8])
+    args = parser.parse_args()
+
+    data_list = make_batch(args.letters)
+    print(f"询证函数量: {args.letters}，CPU 核数: {os.cpu_count()}")
+
+    baseline = None
+    for workers in args.workers:
+        with tempfile.TemporaryDirectory() as tmp:
+            start = time.perf_counter()
+            generate_pdfs(data_list, tmp, workers=workers)
+            elapsed = time.perf_counter() - start
+        baseline = baseline or elapsed
+        print(f"{workers} 进程: {elapsed:7.2f} s  {elapsed / args.letters * 1000:7.1f} ms/份  加速比 {baseline / elapsed:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
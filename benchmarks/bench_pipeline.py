@@ -0,0 +1,188 @@
+# benchmarks/bench_pipeline.py
+"""生成流程分阶段基准：合成台账 -> 读取 -> 整理 -> 校验 -> 构建 Excel -> 保存 Excel -> 排版 PDF -> 写出 PDF
+
+合成台账的列与 example_input.xlsx 相同，单位和项目为拟真的中文名称。每个阶段先计时（取 --repeat 次中最快的一次），
+再在 tracemalloc 下重跑一次记录峰值内存（该阶段新增的 Python 内存）。
+
+结果写入 JSON 文件（--output）。--thresholds 指定的阈值文件给出各阶段每份询证函耗时和峰值内存的上限
+（峰值内存的上限只适用于阈值文件中 letters 指定的份数）；--baseline 指定上一次的结果文件时，
+耗时或内存超过上次的 (1 + --tolerance) 倍视为退化；
+超出阈值或退化时以退出码 1 结束，可直接用于持续集成。
+
+用法：python benchmarks/bench_pipeline.py [--letters 500] [--repeat 1] [--output pipeline.json]
+          [--thresholds benchmarks/thresholds.json] [--baseline 上次的结果.json] [--tolerance 0.25] [--no-memory]
+"""
+import sys
+import os
+import json
+import time
+import argparse
+import platform
+import tempfile
+import tracemalloc
+from datetime import datetime
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT_DIR not in sys.path:
+    sys.path.insert(0, ROOT_DIR)
+
+from core.ledger import LedgerWorkbook, list_sheets, prepare_data
+from core.utils import get_default_template_path
+from core.letters import pdf_file_name
+from core.validation import check_letters, format_letters
+from generators.excel_generator import build_workbook
+from generators.pdf_generator import _render_chunk, _embedded_fonts, _write_letters, _write_merged
+from generators.write_behind import WriteBehind
+from benchmarks.sample_data import make_ledger
+
+DEFAULT_THRESHOLDS = os.path.join(os.path.dirname(os.path.abspath(__file__)), "thresholds.json")
+FIELDS = {
+    "address": "四川省成都市金牛区XX路1号",
+    "contact": "张三",
+    "phone": "13900000000",
+    "email": "88888888@qq.com",
+    "issuer": "XXXXXXXX有限责任公司",
+}
+DATE = "2025.11.1"
+# 参与阈值检查的指标
+METRICS = ("ms_per_letter", "peak_mb")
+
+
+def stages(ledger_path, work_dir):
+    """按顺序返回 (阶段名称, 函数)；各阶段的结果保存在 state 中供后续阶段使用"""
+    state = {}
+
+    def read():
+        wb = LedgerWorkbook(ledger_path)
+        try:
+            for _ in wb.iter_rows(wb.sheetnames[0]):
+                pass
+        finally:
+            wb.close()
+
+    def prepare():
+        state["batch"] = prepare_data(ledger_path, list_sheets(ledger_path)[0], FIELDS, DATE)
+
+    def validate():
+        issues = check_letters(state["batch"])
+        assert not issues, issues[0]
+        state["batch"] = format_letters(state["batch"])
+
+    def excel_build():
+        state["workbook"] = build_workbook(state["batch"], get_default_template_path())
+
+    def excel_save():
+        state["workbook"].save(os.path.join(work_dir, "询证函.xlsx"))
+
+    def pdf_render():
+        pdf_dir = os.path.join(work_dir, "pdf")
+        os.makedirs(pdf_dir, exist_ok=True)
+        rows = [(os.path.join(pdf_dir, pdf_file_name(data.sheet_name)), data) for data in state["batch"]]
+        state["keep"] = set({path: i for i, (path, _) in enumerate(rows)}.values())
+        state["glyphs"] = _render_chunk(rows, os.path.join(work_dir, "letters.bin"))
+
+    def pdf_write():
+        spool_path = os.path.join(work_dir, "letters.bin")
+        fonts = _embedded_fonts(state["glyphs"])
+        _write_letters(spool_path, fonts, state["keep"], WriteBehind())
+        _write_merged([spool_path], fonts, os.path.join(work_dir, "pdf", "询证函-合并.pdf"))
+
+    return [("read", read), ("prepare", prepare), ("validate", validate), ("excel_build", excel_build), ("excel_save", excel_save),
+            ("pdf_render", pdf_render), ("pdf_write", pdf_write)]
+
+
+def run_stage(func, repeat, memory):
+    seconds = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        elapsed = time.perf_counter() - start
+        seconds = elapsed if seconds is None else min(seconds, elapsed)
+    peak = None
+    if memory:
+        tracemalloc.start()
+        baseline = tracemalloc.get_traced_memory()[0]
+        func()
+        peak = tracemalloc.get_traced_memory()[1] - baseline
+        tracemalloc.stop()
+    return seconds, peak
+
+
+def check(results, thresholds, baseline, tolerance):
+    """返回超出阈值或相对上次结果退化的说明
+
+    thresholds、baseline 为阈值文件和上次的结果文件的内容（可以为空字典）；
+    峰值内存只在份数相同时比较。
+    """
+    failures = []
+    for name, result in results["stages"].items():
+        for metric in METRICS:
+            value = result.get(metric)
+            if value is None:
+                continue
+            limit = thresholds.get("stages", {}).get(name, {}).get(metric)
+            if metric == "peak_mb" and thresholds.get("letters") != results["letters"]:
+                limit = None
+            if limit is not None and value > limit:
+                failures.append(f"{name}.{metric} = {value:.3f}，超过阈值 {limit}")
+            previous = baseline.get("stages", {}).get(name, {}).get(metric)
+            if metric == "peak_mb" and baseline.get("letters") != results["letters"]:
+                previous = None
+            if previous and value > previous * (1 + tolerance):
+                failures.append(f"{name}.{metric} = {value:.3f}，比上次 {previous:.3f} 增加 {value / previous - 1:.0%}")
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--letters", type=int, default=500)
+    parser.add_argument("--repeat", type=int, default=1)
+    parser.add_argument("--output", default="pipeline.json", help="结果 JSON 文件")
+    parser.add_argument("--thresholds", default=DEFAULT_THRESHOLDS, help="阈值 JSON 文件（为空字符串时不检查）")
+    parser.add_argument("--baseline", help="上一次的结果 JSON 文件")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="相对上次结果允许增加的比例")
+    parser.add_argument("--no-memory", action="store_true", help="不记录峰值内存（省去 tracemalloc 下的重跑）")
+    args = parser.parse_args()
+
+    results = {
+        "letters": args.letters,
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "stages": {},
+    }
+    with tempfile.TemporaryDirectory(prefix="bench-pipeline-") as work_dir:
+        ledger_path = make_ledger(os.path.join(work_dir, "台账.xlsx"), args.letters, realistic=True)
+        for name, func in stages(ledger_path, work_dir):
+            seconds, peak = run_stage(func, args.repeat, not args.no_memory)
+            result = {"seconds": round(seconds, 4), "ms_per_letter": round(seconds * 1000 / args.letters, 4)}
+            if peak is not None:
+                result["peak_mb"] = round(peak / 1024 / 1024, 2)
+            results["stages"][name] = result
+            memory = f"  峰值 {result['peak_mb']:8.2f} MB" if peak is not None else ""
+            print(f"{name:<12} {seconds:8.3f} s  {result['ms_per_letter']:8.3f} ms/份{memory}")
+
+    thresholds = {}
+    if args.thresholds:
+        with open(args.thresholds, encoding="utf-8") as f:
+            thresholds = json.load(f)
+        if thresholds.get("letters") != args.letters:
+            print(f"阈值文件按 {thresholds.get('letters')} 份询证函设定，本次不检查峰值内存")
+    baseline = {}
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+    failures = check(results, thresholds, baseline, args.tolerance)
+    results["failures"] = failures
+
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(results, f, ensure_ascii=False, indent=2)
+    print(f"结果已写入 {args.output}")
+    for failure in failures:
+        print(f"退化：{failure}")
+    print("通过" if not failures else "未通过")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+# benchmarks/bench_template_cache.py
+"""新进程中第一次载入模板的耗时：编译（openpyxl 解析模板）vs 读取磁盘上的编译结果
+
+每次在新进程中执行 load_template_plan，使用临时的缓存目录；“编译”每次先清空缓存目录。
+两项都包含导入 openpyxl 的时间（写出工作簿总要导入）。
+
+用法：python benchmarks/bench_template_cache.py [--repeat 5] [--template template.xlsx]
+"""
+import sys
+import os
+import shutil
+import argparse
+import tempfile
+import subprocess
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT_DIR not in sys.path:
+    sys.path.insert(0, ROOT_DIR)
+
+from core.utils import get_default_template_path
+
+COLD_START = """
+import sys, time
+sys.path.insert(0, {root!r})
+start = time.perf_counter()
+from core.template_plan import load_template_plan
+load_template_plan({template!r}, cache_dir={cache_dir!r})
+print(time.perf_counter() - start)
+"""
+
+
+def cold_start(template, cache_dir):
+    out = subprocess.run([sys.executable, "-c", COLD_START.format(root=ROOT_DIR, template=template,
+                                                                  cache_dir=cache_dir)],
+                         capture_output=True, text=True, check=True)
+    return float(out.stdout.strip().splitlines()[-1])
+
+
+def median(values):
+    return sorted(values)[len(values) // 2]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--template", default=get_default_template_path())
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        cache_dir = os.path.join(tmp, "template-cache")
+        compiled = []
+        for _ in range(args.repeat):
+            shutil.rmtree(cache_dir, ignore_errors=True)
+            compiled.append(cold_start(args.template, cache_dir))
+        cached = [cold_start(args.template, cache_dir) for _ in range(args.repeat)]
+
+    compiled, cached = median(compiled), median(cached)
+    print(f"编译模板:     {compiled * 1000:7.1f} ms")
+    print(f"读取编译结果: {cached * 1000:7.1f} ms  (节省 {(compiled - cached) * 1000:.1f} ms)")
+
+
+if __name__ == "__main__":
+    main()
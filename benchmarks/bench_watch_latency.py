@@ -0,0 +1,95 @@
+# benchmarks/bench_watch_latency.py
+"""从放入台账到询证函生成完毕的延迟：每次启动 cli.py vs 常驻的 watch.py
+
+冷启动：每个台账在新进程中运行一次 cli.py（包含启动 Python、导入、加载字体和模板、启动进程池）。
+常驻：先启动 watch.py 并等到预热完成，再逐个把台账放入收件文件夹（先写到别处再改名，一次出现），
+读取 jobs.jsonl 中从发现到完成的延迟，另加等待台账写完的 --settle 与轮询间隔。
+
+用法：python benchmarks/bench_watch_latency.py [--ledgers 3] [--rows 100] [--workers 2]
+"""
+import sys
+import os
+import json
+import time
+import shutil
+import signal
+import argparse
+import tempfile
+import subprocess
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT_DIR not in sys.path:
+    sys.path.insert(0, ROOT_DIR)
+
+from benchmarks.sample_data import make_ledger
+
+SETTLE = 0.2
+INTERVAL = 0.1
+
+
+def cold(ledger, output_dir, workers):
+    os.makedirs(output_dir)
+    start = time.perf_counter()
+    subprocess.run([sys.executable, os.path.join(ROOT_DIR, "cli.py"), ledger, "--excel",
+                    os.path.join(output_dir, "询证函.xlsx"), "--pdf", os.path.join(output_dir, "pdf"),
+                    "--workers", str(workers)], check=True, capture_output=True)
+    return time.perf_counter() - start
+
+
+def wait_for_line(stream):
+    line = stream.readline()
+    if not line:
+        raise RuntimeError("watch.py 已退出")
+    return json.loads(line)
+
+
+def warm(ledgers, tmp, workers):
+    """启动 watch.py，逐个放入台账，返回 (预热秒数, [放入到完成的秒数])"""
+    inbox = os.path.join(tmp, "收件")
+    os.makedirs(inbox)
+    proc = subprocess.Popen([sys.executable, os.path.join(ROOT_DIR, "watch.py"), inbox, os.path.join(tmp, "输出"),
+                             "--workers", str(workers), "--settle", str(SETTLE), "--interval", str(INTERVAL),
+                             "--json"], stdout=subprocess.PIPE, text=True, encoding="utf-8")
+    try:
+        ready = wait_for_line(proc.stdout)
+        latencies = []
+        for n, ledger in enumerate(ledgers):
+            staged = os.path.join(tmp, f"staged-{n}.xlsx")
+            shutil.copy(ledger, staged)
+            dropped = time.perf_counter()
+            os.replace(staged, os.path.join(inbox, f"台账{n}.xlsx"))
+            job = wait_for_line(proc.stdout)
+            if job["code"] != 0:
+                raise RuntimeError(f"生成失败：{job}")
+            latencies.append(time.perf_counter() - dropped)
+    finally:
+        if sys.platform == "win32":
+            proc.terminate()
+        else:
+            proc.send_signal(signal.SIGINT)
+        proc.wait()
+    return ready["warm_up_seconds"], latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--ledgers", type=int, default=3)
+    parser.add_argument("--rows", type=int, default=100)
+    parser.add_argument("--workers", type=int, default=2)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        ledger = make_ledger(os.path.join(tmp, "台账.xlsx"), args.rows, realistic=True)
+        ledgers = [ledger] * args.ledgers
+        print(f"{args.ledgers} 个台账，每个 {args.rows} 行，{args.workers} 进程")
+        colds = [cold(ledger, os.path.join(tmp, f"cold-{n}"), args.workers) for n, ledger in enumerate(ledgers)]
+        warm_up, latencies = warm(ledgers, tmp, args.workers)
+    for n, (c, w) in enumerate(zip(colds, latencies)):
+        print(f"台账 {n + 1}: 冷启动 cli.py {c:6.2f} s   常驻 watch.py {w:6.2f} s")
+    print(f"平均:     冷启动 cli.py {sum(colds) / len(colds):6.2f} s   常驻 watch.py "
+          f"{sum(latencies) / len(latencies):6.2f} s  (watch.py 启动时预热 {warm_up:.2f} s，"
+          f"含等待写完 {SETTLE} s)")
+
+
+if __name__ == "__main__":
+    main()
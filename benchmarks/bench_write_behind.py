@@ -0,0 +1,81 @@
+# benchmarks/bench_write_behind.py
+"""单份 PDF 的写出：逐个同步写出 vs WriteBehind 后台线程写出 vs ArchiveWriter 写入 ZIP 包
+
+写出 --files 个与单份询证函 PDF 大小相近的文件（先写临时文件再改名，与生成时相同），生产方在
+每个文件之间模拟 --render 毫秒的排版。用 --dir 指向网络共享盘上的文件夹时可看到等待往返的影响。
+ZIP 包按 --compression 存储或压缩（随机内容几乎不可压缩，与 PDF 相近）。
+
+用法：python benchmarks/bench_write_behind.py [--files 500] [--size 32] [--render 5] [--threads 4] [--compression stored] [--dir 共享盘文件夹]
+"""
+import sys
+import os
+import time
+import argparse
+import tempfile
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT_DIR not in sys.path:
+    sys.path.insert(0, ROOT_DIR)
+
+from core.utils import write_atomic
+from generators.write_behind import WriteBehind, ArchiveWriter
+
+
+def busy(seconds):
+    """模拟排版：占用 CPU 而不是 sleep"""
+    end = time.perf_counter() + seconds
+    while time.perf_counter() < end:
+        pass
+
+
+def synchronous(paths, data, render):
+    for path in paths:
+        busy(render)
+        write_atomic(path, lambda f: f.write(data))
+
+
+def write_behind(paths, data, render, files):
+    with files:
+        for path in paths:
+            busy(render)
+            files.submit(path, data)
+    return files.metrics()
+
+
+def report(label, seconds, sync_seconds, metrics):
+    print(f"{label}:   {seconds:7.2f} s  (同步的 {sync_seconds / seconds:.1f} 倍速度，"
+          f"{metrics['bytes'] / 1024 / 1024 / metrics['seconds']:.1f} MB/s，"
+          f"队列最大深度 {metrics['max_queue']}，提交时等待 {metrics['waits']} 次)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--files", type=int, default=500)
+    parser.add_argument("--size", type=int, default=32, help="每个文件的大小（KB）")
+    parser.add_argument("--render", type=float, default=5, help="每个文件之间模拟的排版耗时（毫秒）")
+    parser.add_argument("--threads", type=int, default=4)
+    parser.add_argument("--compression", choices=("stored", "deflated"), default="stored")
+    parser.add_argument("--dir", help="写出的文件夹（默认为临时文件夹）")
+    args = parser.parse_args()
+
+    data = os.urandom(args.size * 1024)
+    render = args.render / 1000
+    with tempfile.TemporaryDirectory(dir=args.dir) as tmp:
+        paths = [os.path.join(tmp, f"询证函{n}.pdf") for n in range(args.files)]
+        start = time.perf_counter()
+        synchronous(paths, data, render)
+        sync_seconds = time.perf_counter() - start
+        print(f"同步写出:   {sync_seconds:7.2f} s")
+
+        start = time.perf_counter()
+        metrics = write_behind(paths, data, render, WriteBehind(threads=args.threads))
+        report("后台写出", time.perf_counter() - start, sync_seconds, metrics)
+
+        start = time.perf_counter()
+        archive = ArchiveWriter(os.path.join(tmp, "询证函.zip"), args.compression)
+        metrics = write_behind(paths, data, render, archive)
+        report("ZIP 包  ", time.perf_counter() - start, sync_seconds, metrics)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+# benchmarks/sample_data.py
+"""基准测试共用的合成询证函数据"""
+import random
+
+from core.utils import get_season_from_date
+from core.letters import LetterBatch
+
+# 拟真台账用的地名与字号（与实际台账的名称长度和用字相近）
+_CITIES = ["成都市", "绵阳市", "德阳市", "宜宾市", "泸州市", "南充市", "乐山市", "重庆市", "贵阳市", "昆明市",
+           "西安市", "兰州市", "武汉市", "长沙市", "郑州市", "西宁市"]
+_DISTRICTS = ["金牛区", "武侯区", "锦江区", "青羊区", "成华区", "高新区", "天府新区", "龙泉驿区", "双流区", "郫都区",
+              "涪城区", "旌阳区", "翠屏区", "江阳区", "顺庆区", "市中区"]
+_FIRMS = ["中建", "中铁", "华西", "蜀道", "川建", "鼎盛", "恒通", "宏远", "锦程", "天府", "巴蜀", "瑞丰", "金鑫",
+          "泰和", "永安", "长城", "新希望", "东方", "西南", "兴业"]
+_TRADES = ["建设工程", "建筑劳务", "市政工程", "机电安装", "装饰工程", "钢结构工程", "路桥工程", "水利水电工程",
+           "园林绿化", "建材贸易", "混凝土", "幕墙工程"]
+_SUFFIXES = ["有限公司", "有限责任公司", "集团有限公司", "股份有限公司"]
+_PROJECTS = ["安置房", "综合管廊", "快速路改造", "污水处理厂", "学校新建", "人民医院门诊楼", "产业园标准厂房",
+             "片区道路", "滨江公园", "地铁站点配套", "保障性住房", "体育中心"]
+_PHASES = ["一期", "二期", "三期", "EPC总承包", "施工总承包", "土建及安装"]
+
+
+def _realistic_row(rng, i):
+    city = rng.choice(_CITIES)
+    unit = f"{city[:-1]}{rng.choice(_FIRMS)}{rng.choice(_TRADES)}{rng.choice(_SUFFIXES)}"
+    if rng.random() < 0.3:
+        unit = f"{rng.choice(_CITIES)}{rng.choice(_DISTRICTS)}{rng.choice(_FIRMS)}{rng.choice(_TRADES)}{rng.choice(_SUFFIXES)}"
+    project = f"{city}{rng.choice(_DISTRICTS)}{rng.choice(_PROJECTS)}{rng.choice(_PHASES)}工程"
+    receivable = round(rng.lognormvariate(12, 1.5), 2)
+    long_term = 0.0 if rng.random() < 0.2 else round(receivable * rng.uniform(0.03, 0.1), 2)
+    return {
+        'sheet_name': f"{rng.choice(_FIRMS)}{rng.choice(_PROJECTS)[:4]}{i}",
+        'number': f"2025-{i:05d}",
+        'unit': unit,
+        'project': project,
+        'receivable': f"{receivable:.2f}",
+        'long_term': "" if long_term == 0 else f"{long_term:.2f}",
+        'total': f"{receivable + long_term:.2f}",
+    }
+
+
+def make_data_list(count, date="2025.11.1", realistic=False, seed=0):
+    """旧格式：每份询证函一个字典
+
+    realistic=True 时单位和项目名称为随机组合的中文名称（长度和用字接近实际台账），金额为随机的两位小数；
+    同一 seed 的结果相同。
+    """
+    season = get_season_from_date(date)
+    rng = random.Random(seed)
+    return [{
+        **(_realistic_row(rng, i) if realistic else {
+            'sheet_name': f"项目{i % 7}简称{i}",
+            'number': f"2025-{i:04d}",
+            'unit': f"四川某某建设工程有限公司{i}",
+            'project': f"成都市某某片区{i % 13}号地块工程",
+            'receivable': str(1000 + i * 37.5),
+            'long_term': "" if i % 5 == 0 else str(i * 12.25),
+            # 合计等于应收帐款与长期应收款之和，可通过 core.validation 的校验
+            'total': str(1000 + i * 37.5) if i % 5 == 0 else str(1000 + i * 49.75),
+        }),
+        'address': "四川省成都市金牛区XX路1号",
+        'contact': "张三",
+        'phone': "13900000000",
+        'email': "88888888@qq.com",
+        'issuer': "XXXXXXXX有限责任公司",
+        'date': date,
+        'season': season,
+    } for i in range(count)]
+
+
+def make_batch(count, date="2025.11.1", realistic=False, seed=0):
+    """与 make_data_list 内容相同的 LetterBatch"""
+    return LetterBatch.from_dicts(make_data_list(count, date, realistic, seed))
+
+
+def make_ledger(path, count, extra_columns=0, sheet="台账", realistic=False, seed=0):
+    """写出一份合成台账：必需的七列之外再加 extra_columns 列无关数据（模拟实际使用中很宽的台账）
+
+    列与 example_input.xlsx 相同；realistic、seed 的含义与 make_data_list 相同。
+    """
+    from openpyxl import Workbook
+    from core.ledger import REQUIRED_COLUMNS
+
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet(sheet)
+    ws.append(REQUIRED_COLUMNS + [f"备注{n}" for n in range(extra_columns)])
+    for data in make_data_list(count, realistic=realistic, seed=seed):
+        ws.append([data['sheet_name'], data['number'], data['unit'], data['project'],
+                   float(data['receivable']), float(data['long_term'] or 0), float(data['total'])]
+                  + [f"无关数据{n}" for n in range(extra_columns)])
+    wb.save(path)
+    return path
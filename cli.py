@@ -0,0 +1,322 @@
+# cli.py
+"""询证函生成器命令行入口（不导入 PyQt6，可用于定时任务或服务器）
+
+示例：
+    python cli.py 台账.xlsx --sheet Sheet1 --excel 询证函.xlsx --pdf pdf/ --date 2025.9.30
+
+未指定的模板字段（回函地址、联系人、电话、邮箱、发函单位、发函日期）取自用户模板，与图形界面一致。
+--json 时每个进度事件输出一行 JSON 到标准输出；--report 时把各阶段的耗时（core.instrument）写入 JSON 运行报告。
+
+生成前先校验台账（core.validation）：金额无法识别、合计不等于应收帐款与长期应收款之和、工作表名称
+不合法或重名时逐行列出问题，不生成任何文件；--no-validate 时跳过校验，按旧方式逐行读取、边读边写。
+
+退出码：0 成功；1 生成失败；2 参数错误（含模板字段未填写、日期格式错误）；3 台账无法读取或校验未通过。
+
+启动耗时预算：模块顶层只导入标准库，`python cli.py --help` 及参数错误应在 150 ms 内返回；
+pandas、openpyxl、fpdf 在确实需要时才导入，生成前的总导入开销不超过 1 s。
+benchmarks/bench_cli_startup.py 检查这两项预算，并确认整个流程没有导入 PyQt6。
+"""
+import os
+import sys
+import json
+import time
+import logging
+import argparse
+import contextlib
+import datetime
+import multiprocessing
+
+ROOT_DIR = os.path.dirname(os.path.abspath(__file__))
+if ROOT_DIR not in sys.path:
+    sys.path.insert(0, ROOT_DIR)
+
+logger = logging.getLogger(__name__)
+
+EXIT_OK = 0
+EXIT_FAILED = 1
+EXIT_USAGE = 2
+EXIT_INPUT = 3
+
+FIELD_LABELS = {
+    "address": "回函地址",
+    "contact": "联系人",
+    "phone": "电话",
+    "email": "邮箱",
+    "issuer": "发函单位",
+}
+
+
+class Reporter:
+    """输出进度：--json 时每个事件一行 JSON，否则输出可读的中文提示
+
+    stream 不为空时全部事件写入 stream（例如监视文件夹模式中每个任务的事件日志）。
+    """
+
+    def __init__(self, as_json, stream=None):
+        self.as_json = as_json
+        self.stream = stream
+        self.start = time.perf_counter()
+
+    def emit(self, event, text, **info):
+        if self.as_json:
+            info["elapsed"] = round(time.perf_counter() - self.start, 3)
+            print(json.dumps({"event": event, **info}, ensure_ascii=False), file=self.stream or sys.stdout,
+                  flush=True)
+        else:
+            stream = self.stream or (sys.stderr if event == "error" else sys.stdout)
+            print(text, file=stream, flush=True)
+
+    def error(self, code, message):
+        self.emit("error", f"错误：{message}", code=code, message=message)
+        return code
+
+
+# progress 事件的最小间隔（秒）：与图形界面的 core.worker.GenerationWorker 一样节流，不为每一步都输出一行
+PROGRESS_INTERVAL = 0.5
+
+
+class ProgressEvents:
+    """core.progress.Progress 的回调：把生成进度节流后作为 progress 事件输出
+
+    target 为 "excel" 或 "pdf"；done、total 为生成器的步数（total 为 None 表示总数未知）。
+    """
+
+    def __init__(self, reporter, target, label):
+        self.reporter = reporter
+        self.target = target
+        self.label = label
+        self._last_report = 0.0
+
+    def __call__(self, done, total):
+        now = time.monotonic()
+        if done == 0 or done == total or now - self._last_report >= PROGRESS_INTERVAL:
+            self._last_report = now
+            text = f"{self.label}进度：{done}/{total}" if total else f"{self.label}进度：{done}"
+            self.reporter.emit("progress", text, target=self.target, done=done, total=total)
+
+
+class LetterCounter:
+    """统计流经生成器的询证函份数"""
+
+    def __init__(self):
+        self.letters = 0
+
+    def count(self, data_list):
+        """返回计数的 data_list：已读入内存（有长度）时结果也有长度，生成器据此得到进度的总数"""
+        return _Counted(self, data_list)
+
+
+class _Counted:
+    def __init__(self, counter, data_list):
+        self.counter = counter
+        self.data_list = data_list
+
+    def __iter__(self):
+        self.counter.letters = 0
+        for data in self.data_list:
+            self.counter.letters += 1
+            yield data
+
+    def __len__(self):
+        return len(self.data_list)
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        prog="cli.py",
+        description="从询证函台账批量生成询证函（Excel 和/或 PDF）",
+    )
+    parser.add_argument("input", help="询证函台账 .xlsx 文件")
+    parser.add_argument("--sheet", help="要处理的工作表（台账只有一张工作表时可省略）")
+    parser.add_argument("--excel", metavar="OUTPUT", help="输出的询证函 .xlsx 文件")
+    parser.add_argument("--pdf", metavar="DIR", help="输出 PDF 询证函的文件夹")
+    for field, label in FIELD_LABELS.items():
+        parser.add_argument(f"--{field}", help=f"{label}（默认取自用户模板）")
+    parser.add_argument("--date", help="发函日期，格式 YYYY.M.D（默认取自用户模板，模板为空时为今天）")
+    parser.add_argument("--template", help="询证函模板（默认为用户模板）")
+    parser.add_argument("--backend", choices=("openpyxl", "xml"), default="openpyxl", help="Excel 生成后端")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="生成 PDF 及分片 Excel 的进程数")
+    parser.add_argument("--shard-size", type=int, metavar="N",
+                        help="Excel 分片输出：每个工作簿最多 N 张工作表，--excel 处写出索引工作簿")
+    parser.add_argument("--incremental", action="store_true",
+                        help="增量生成 PDF：只重新生成有变化的询证函，中断后再次运行时继续")
+    parser.add_argument("--zip", action="store_true",
+                        help="单份 PDF（及 Excel 分片）写入同一个 ZIP 包，不逐个写出文件")
+    parser.add_argument("--zip-compression", choices=("stored", "deflated"), default="stored",
+                        help="ZIP 包内文件的压缩方式（默认 stored：PDF 与 xlsx 本身已压缩）")
+    parser.add_argument("--no-validate", action="store_true",
+                        help="跳过台账校验（金额按旧方式逐个解析，无法识别时为 0.00）")
+    parser.add_argument("--save-fields", action="store_true", help="生成成功后把模板字段保存到用户模板")
+    parser.add_argument("--json", action="store_true", help="以 JSON Lines 输出进度")
+    parser.add_argument("--report", metavar="FILE", help="把各阶段的耗时写入 JSON 运行报告")
+    parser.add_argument("--trace-memory", action="store_true", help="运行报告中同时记录各阶段的峰值内存（较慢）")
+    return parser
+
+
+def _check_date(date):
+    parts = date.split(".")
+    try:
+        datetime.date(*map(int, parts))
+    except (TypeError, ValueError):
+        return False
+    return len(parts) == 3
+
+
+def _resolve_fields(args, tm):
+    """命令行参数优先，未指定的字段取自用户模板"""
+    saved = tm.load_fields()
+    fields = {}
+    for field in FIELD_LABELS:
+        value = getattr(args, field)
+        fields[field] = (value if value is not None else saved.get(field, "")).strip()
+    date = args.date or saved.get("date") or ""
+    if not _check_date(date) and args.date is None:
+        today = datetime.date.today()
+        date = f"{today.year}.{today.month}.{today.day}"
+    return fields, date
+
+
+def run(args, reporter):
+    if not args.excel and not args.pdf:
+        return reporter.error(EXIT_USAGE, "请至少指定 --excel 或 --pdf")
+    if not os.path.isfile(args.input):
+        return reporter.error(EXIT_INPUT, f"台账文件不存在：{args.input}")
+    if args.workers < 1:
+        return reporter.error(EXIT_USAGE, "--workers 必须为正整数")
+    if args.shard_size is not None and args.shard_size < 1:
+        return reporter.error(EXIT_USAGE, "--shard-size 必须为正整数")
+    if args.zip and args.incremental:
+        return reporter.error(EXIT_USAGE, "--zip 不能与 --incremental 同时使用")
+
+    from core.template_manager import TemplateManager
+    tm = TemplateManager()
+    fields, date = _resolve_fields(args, tm)
+    if not _check_date(date):
+        return reporter.error(EXIT_USAGE, f"发函日期格式应为 YYYY.M.D：{date}")
+    empty = [FIELD_LABELS[f] for f, value in fields.items() if not value]
+    if empty:
+        return reporter.error(EXIT_USAGE, f"请填写所有模板字段：{', '.join(empty)}")
+
+    from core.ledger import list_sheets, probe_sheet, read_letters
+    try:
+        sheets = list_sheets(args.input)
+        sheet = args.sheet
+        if sheet is None:
+            if len(sheets) != 1:
+                return reporter.error(EXIT_USAGE, f"台账包含多张工作表，请用 --sheet 指定：{', '.join(sheets)}")
+            sheet = sheets[0]
+        elif sheet not in sheets:
+            return reporter.error(EXIT_INPUT, f"台账中没有工作表：{sheet}")
+        # 先检查表头，有误时在生成任何文件之前报错（只读表头，数据行只计数）
+        probe = probe_sheet(args.input, sheet)
+    except Exception as e:
+        return reporter.error(EXIT_INPUT, f"无法读取台账：{e}")
+    if probe.missing:
+        return reporter.error(EXIT_INPUT, f"无法读取台账：缺少列：{', '.join(probe.missing)}")
+    reporter.emit("loaded", f"开始处理台账（工作表：{sheet}，{probe.rows} 行）",
+                  input=args.input, sheet=sheet, rows=probe.rows)
+
+    counter = LetterCounter()
+    recorder = None
+    if args.report:
+        from core.instrument import Recorder
+        recorder = Recorder(memory=args.trace_memory)
+    from core.progress import Progress
+    try:
+        with recorder or contextlib.nullcontext():
+            if not args.no_validate:
+                from core.instrument import stage
+                from core.validation import check_letters
+                # 先逐行读一遍台账校验（不保留询证函），有问题时不生成任何文件
+                with stage("validate"):
+                    issues = check_letters(read_letters(args.input, sheet, fields, date))
+                if issues:
+                    reporter.emit("invalid", "台账校验未通过：\n" + "\n".join(map(str, issues)),
+                                  issues=[issue.to_dict() for issue in issues])
+                    return reporter.error(EXIT_INPUT, f"台账中有 {len(issues)} 处问题，未生成任何文件")
+
+            def letters():
+                # 台账逐行读取、边读边写，每种输出各读一遍；校验过时金额已整理
+                letters = read_letters(args.input, sheet, fields, date)
+                if args.no_validate:
+                    return letters
+                from core.validation import format_letters
+                return format_letters(letters)
+
+            if args.excel:
+                output_path = args.excel if args.excel.endswith(".xlsx") else args.excel + ".xlsx"
+                template = args.template or tm.user_template
+                data_list = counter.count(letters())
+                progress = Progress(ProgressEvents(reporter, "excel", "Excel "))
+                if args.shard_size:
+                    from generators.excel_shards import generate_excel_shards
+                    output_path = generate_excel_shards(data_list, template, output_path, shard_size=args.shard_size,
+                                                        workers=args.workers, backend=args.backend, progress=progress,
+                                                        archive=args.zip, compression=args.zip_compression)
+                    shards = -(-counter.letters // args.shard_size)
+                    kind = "ZIP 包" if args.zip else "索引"
+                    reporter.emit("excel", f"询证函已生成：{output_path}（{kind}，{counter.letters} 份，{shards} 个分片）",
+                                  output=output_path, letters=counter.letters, shards=shards)
+                else:
+                    from generators.excel_generator import generate_excel
+                    generate_excel(data_list, template, output_path, streaming=True, backend=args.backend,
+                                   progress=progress)
+                    reporter.emit("excel", f"询证函已生成：{output_path}（{counter.letters} 份）",
+                                  output=output_path, letters=counter.letters)
+            if args.pdf:
+                from generators.pdf_generator import generate_pdfs
+                data_list = counter.count(letters())
+                progress = Progress(ProgressEvents(reporter, "pdf", "PDF "))
+                generate_pdfs(data_list, args.pdf, workers=args.workers, progress=progress, incremental=args.incremental,
+                              archive=args.zip, compression=args.zip_compression)
+                if args.zip:
+                    from generators.pdf_generator import ARCHIVE_NAME
+                    archive = os.path.join(args.pdf, ARCHIVE_NAME)
+                    reporter.emit("pdf", f"PDF询证函已生成：{archive}（ZIP 包，{counter.letters} 份）",
+                                  output=args.pdf, archive=archive, letters=counter.letters)
+                else:
+                    reporter.emit("pdf", f"PDF询证函已生成：{args.pdf}（{counter.letters} 份）",
+                                  output=args.pdf, letters=counter.letters)
+            if args.save_fields:
+                tm.save_fields({**fields, "date": date})
+    except Exception as e:
+        return reporter.error(EXIT_FAILED, f"处理失败：{e}")
+    finally:
+        # 失败时也写出报告，便于定位出错前各阶段的耗时
+        if recorder is not None:
+            _write_report(recorder, args, sheet, counter, reporter)
+
+    reporter.emit("done", "完成", letters=counter.letters)
+    return EXIT_OK
+
+
+def _write_report(recorder, args, sheet, counter, reporter):
+    try:
+        recorder.write_report(args.report, input=args.input, sheet=sheet, letters=counter.letters,
+                              excel=args.excel, pdf=args.pdf, workers=args.workers)
+    except OSError as e:
+        logger.warning("无法写入运行报告：%s", e)
+        return
+    reporter.emit("report", f"运行报告已写入：{args.report}\n{recorder.summary()}", output=args.report)
+
+
+def setup_logging():
+    """本程序各模块的提示和警告（logging）写到标准错误，标准输出只留给事件（--json 时为 JSON Lines）
+
+    第三方库（例如 fontTools 裁剪字体）只显示警告。
+    """
+    logging.basicConfig(stream=sys.stderr, level=logging.WARNING, format="%(message)s")
+    for name in ("core", "generators"):
+        logging.getLogger(name).setLevel(logging.INFO)
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    setup_logging()
+    return run(args, Reporter(args.json))
+
+
+if __name__ == "__main__":
+    # 多进程生成 PDF 需要（与 main.py 一致）
+    multiprocessing.freeze_support()
+    sys.exit(main())
@@ -1,20 +1,40 @@
 # core/gui.py
 import sys
 import os
-import pandas as pd
+import logging
+import threading
 from PyQt6.QtWidgets import (
     QApplication, QWidget, QVBoxLayout, QHBoxLayout, QPushButton,
-    QFileDialog, QLabel, QLineEdit, QMessageBox, QInputDialog, QDateEdit, QMenuBar, QMenu
+    QFileDialog, QLabel, QLineEdit, QMessageBox, QInputDialog, QDateEdit, QMenuBar, QMenu, QProgressBar,
+    QCheckBox
 )
-from PyQt6.QtCore import Qt, QDate
+from PyQt6.QtCore import Qt, QDate, pyqtSignal
 from PyQt6.QtGui import QPalette, QColor, QIcon
 
-# 绝对导入
+# 绝对导入（pandas、openpyxl、fpdf 导入较慢，在用到它们的功能里再导入，窗口可以先显示出来）
 from core.template_manager import TemplateManager
-from generators.excel_generator import generate_excel
-from generators.pdf_generator import generate_pdfs
-from core.utils import get_user_template_path, get_season_from_date
+from core.utils import get_user_template_path, get_config_dir
 from core.utils import resource_path
+from core.worker import GenerationWorker
+from core.instrument import Recorder, stage
+
+logger = logging.getLogger(__name__)
+
+
+def warm_up():
+    """预先导入生成询证函所需的模块、载入编译好的用户模板并加载 PDF 字体（窗口显示后在后台线程中执行）"""
+    try:
+        import core.ledger
+        import generators.excel_generator
+        from core.template_plan import load_template_plan
+        from generators.pdf_generator import letter_skeleton
+        if os.path.exists(get_user_template_path()):
+            load_template_plan(get_user_template_path())
+        letter_skeleton()
+    except Exception as e:
+        # 预热失败不影响使用，真正导出时会再次加载并报告错误
+        logger.warning("后台预热失败：%s", e)
+
 
 class DarkTheme:
     @staticmethod
@@ -180,14 +200,33 @@ class StyledLabel(QLabel):
 
 
 class ExcelToInquiryLetter(QWidget):
+    fields_loaded = pyqtSignal(dict)
+
     def __init__(self):
         super().__init__()
         self.tm = TemplateManager()
         self.input_path = ""
         self.selected_sheet = None
+        self.ledger_rows = 0
         self.sheet_label = None
+        self.worker = None
         self.init_ui()
-        self.load_template_fields()
+        # 读取模板字段需要 openpyxl，放到后台线程，窗口可以先显示出来；读完之前用户修改过的字段不覆盖
+        self._initial_date = self.date_edit.date()
+        self.fields_loaded.connect(self.load_template_fields)
+        threading.Thread(target=self._read_template_fields, name="template-fields", daemon=True).start()
+
+    def _read_template_fields(self):
+        try:
+            fields = self.tm.load_fields()
+        except Exception as e:
+            logger.warning("无法读取模板字段：%s", e)
+            fields = self.tm._get_default_fields()
+        self.fields_loaded.emit(fields)
+
+    def start_warm_up(self):
+        """在后台线程中预热，缩短第一次导出的等待"""
+        threading.Thread(target=warm_up, name="warm-up", daemon=True).start()
 
     def init_ui(self):
         self.setWindowTitle("询证函生成器V1.0--by KevinMai")
@@ -305,6 +344,22 @@ class ExcelToInquiryLetter(QWidget):
         btn_layout.addWidget(self.btn_process_pdf)
         layout.addLayout(btn_layout)
 
+        # 增量生成会在所选的输出文件夹中留下缓存，默认关闭
+        self.incremental_check = QCheckBox("增量导出PDF：只重新生成有变化的询证函（缓存保存在输出文件夹的 .inquiry-cache 中）")
+        layout.addWidget(self.incremental_check)
+
+        # 生成进度（仅在生成时显示）
+        progress_layout = QHBoxLayout()
+        self.progress_bar = QProgressBar()
+        self.progress_bar.setTextVisible(True)
+        self.btn_cancel = StyledButton("取消")
+        self.btn_cancel.clicked.connect(self.cancel_generation)
+        progress_layout.addWidget(self.progress_bar, 1)
+        progress_layout.addWidget(self.btn_cancel)
+        layout.addLayout(progress_layout)
+        self.progress_bar.hide()
+        self.btn_cancel.hide()
+
         self.setLayout(layout)
 
     def show_help(self):
@@ -326,18 +381,19 @@ class ExcelToInquiryLetter(QWidget):
         help_dialog.setStandardButtons(QMessageBox.StandardButton.Ok)
         help_dialog.exec()
 
-    def load_template_fields(self):
-        fields = self.tm.load_fields()
-        self.addr_edit.setText(fields['address'])
-        self.contact_edit.setText(fields['contact'])
-        self.phone_edit.setText(fields['phone'])
-        self.email_edit.setText(fields['email'])
-        self.issuer_edit.setText(fields['issuer'])
-        try:
-            y, m, d = map(int, fields['date'].split('.'))
-            self.date_edit.setDate(QDate(y, m, d))
-        except:
-            self.date_edit.setDate(QDate.currentDate())
+    def load_template_fields(self, fields):
+        """填入用户模板中的字段；用户在读取完成之前已经修改过的字段保持不变"""
+        edits = {'address': self.addr_edit, 'contact': self.contact_edit, 'phone': self.phone_edit,
+                 'email': self.email_edit, 'issuer': self.issuer_edit}
+        for name, edit in edits.items():
+            if not edit.isModified():
+                edit.setText(fields[name])
+        if self.date_edit.date() == self._initial_date:
+            try:
+                y, m, d = map(int, fields['date'].split('.'))
+                self.date_edit.setDate(QDate(y, m, d))
+            except:
+                self.date_edit.setDate(QDate.currentDate())
 
         self.addr_edit.setPlaceholderText("例如：四川省成都市金牛区...")
         self.contact_edit.setPlaceholderText("例如：李四")
@@ -351,8 +407,8 @@ class ExcelToInquiryLetter(QWidget):
             return
 
         try:
-            excel_file = pd.ExcelFile(file_path)
-            sheet_names = excel_file.sheet_names
+            from core.ledger import list_sheets, probe_sheet
+            sheet_names = list_sheets(file_path)
             if not sheet_names:
                 raise ValueError("Excel 文件中没有工作表！")
             elif len(sheet_names) == 1:
@@ -362,116 +418,224 @@ class ExcelToInquiryLetter(QWidget):
                 if not ok:
                     return
 
+            # 只读表头并统计行数，缺少列时在选择台账时就提示
+            QApplication.setOverrideCursor(Qt.CursorShape.WaitCursor)
+            try:
+                probe = probe_sheet(file_path, selected_sheet)
+            finally:
+                QApplication.restoreOverrideCursor()
+            if probe.missing:
+                raise ValueError(f"工作表 {selected_sheet} 缺少列：{', '.join(probe.missing)}")
+
             self.input_path = file_path
             self.selected_sheet = selected_sheet
+            self.ledger_rows = probe.rows
             self.label_input.setText(f"已选择：{os.path.basename(file_path)}")
             self.label_input.setStyleSheet("color: #7ecb7e; font-weight: bold;")
-            self.sheet_label.setText(f"工作表：{selected_sheet}")
+            self.sheet_label.setText(f"工作表：{selected_sheet}（{probe.rows} 行）")
             self.sheet_label.setStyleSheet("color: #7ecb7e; font-weight: bold;")
 
         except Exception as e:
             QMessageBox.critical(self, "错误", f"无法读取 Excel 文件：\n{str(e)}")
 
-    def _prepare_data(self):
-        df = pd.read_excel(self.input_path, sheet_name=self.selected_sheet, dtype=str)
-        required_cols = [
-            "工作表名称", "编号", "函证单位", "工程项目",
-            "应收帐款（已开票末付款）", "长期应收款（质量保金）", "合计"
-        ]
-        missing = [col for col in required_cols if col not in df.columns]
-        if missing:
-            raise ValueError(f"缺少列：{', '.join(missing)}")
-
-        df = df.fillna("")
-        date = self.date_edit.date().toString("yyyy.M.d")
-        season = get_season_from_date(date)
-
-        data_list = []
-        for _, row in df.iterrows():
-            data_list.append({
-                'sheet_name': str(row["工作表名称"]),
-                'number': row["编号"],
-                'unit': row["函证单位"],
-                'project': row["工程项目"] or "",
-                'receivable': row["应收帐款（已开票末付款）"] or "0.00",
-                'long_term': row["长期应收款（质量保金）"] or "0.00",
-                'total': row["合计"] or "0.00",
-                'address': self.addr_edit.text().strip(),
-                'contact': self.contact_edit.text().strip(),
-                'phone': self.phone_edit.text().strip(),
-                'email': self.email_edit.text().strip(),
-                'issuer': self.issuer_edit.text().strip(),
-                'date': date,
-                'season': season
-            })
-        return data_list
+    def _template_fields(self):
+        return {
+            'address': self.addr_edit.text().strip(),
+            'contact': self.contact_edit.text().strip(),
+            'phone': self.phone_edit.text().strip(),
+            'email': self.email_edit.text().strip(),
+            'issuer': self.issuer_edit.text().strip(),
+            'date': self.date_edit.date().toString("yyyy.M.d")
+        }
+
+    def _prepare_data(self, fields, validate=True):
+        """校验台账，返回逐行读取、金额已格式化的询证函数据（LetterBatch）
+
+        在后台线程中调用，fields 为界面线程中读取的模板字段。先逐行读一遍台账校验（不保留询证函），
+        生成时再读一遍。台账有问题时抛出 LedgerInvalid，对话框中列出全部问题，由用户选择取消或
+        仍然生成。validate=False 时不校验（与命令行的 --no-validate 相同），金额按旧方式解析，
+        无法识别时为 0.00。
+        """
+        from core.ledger import read_letters
+        from core.validation import LedgerInvalid, check_letters, format_letters
+
+        def letters():
+            return read_letters(self.input_path, self.selected_sheet, fields, fields['date'])
+
+        if not validate:
+            return letters()
+        issues = check_letters(letters())
+        if issues:
+            raise LedgerInvalid(issues)
+        return format_letters(letters())
+
+    def _start_worker(self, generate, result, success_text, failure_text, validate=True):
+        """在后台线程中读取台账并执行 generate(data_list, progress)，期间显示进度条并禁用导出按钮
+
+        台账校验未通过时不生成任何文件，生成线程结束后询问是否跳过校验仍然生成。
+        """
+        fields = self._template_fields()
+        # 各阶段的耗时记录在运行报告中，成功时在对话框的详细信息里显示
+        recorder = Recorder()
+        report_path = get_config_dir() / "last_run.json"
+
+        invalid = []
+
+        def run(progress):
+            from core.validation import LedgerInvalid
+            try:
+                with recorder:
+                    with stage("prepare"):
+                        data_list = self._prepare_data(fields, validate)
+                    generate(data_list, progress)
+                    # 保存模板
+                    self.tm.save_fields(fields)
+            except LedgerInvalid as e:
+                invalid.append(e)
+                raise
+            finally:
+                try:
+                    recorder.write_report(report_path, input=self.input_path, sheet=self.selected_sheet,
+                                          output=str(result))
+                except OSError as e:
+                    logger.warning("无法写入运行报告：%s", e)
+
+        def failed(message):
+            # 校验未通过时在生成线程结束后询问（见 finished）
+            if not invalid:
+                QMessageBox.critical(self, "错误", f"{failure_text}：\n{message}")
+
+        def finished():
+            # 在 _generation_finished 恢复按钮之后询问，仍然生成时不校验、重新启动生成线程
+            if invalid:
+                self._confirm_invalid(invalid[0], lambda: self._start_worker(
+                    generate, result, success_text, failure_text, validate=False))
+
+        self.worker = GenerationWorker(run, result, self)
+        self.worker.progress_changed.connect(self.update_progress)
+        self.worker.succeeded.connect(
+            lambda path: self._show_run_summary(f"{success_text}：\n{path}", recorder, report_path))
+        self.worker.failed.connect(failed)
+        self.worker.cancelled.connect(
+            lambda: QMessageBox.information(self, "已取消", "已取消生成，写了一半的文件已删除。"))
+        self.worker.finished.connect(self._generation_finished)
+        self.worker.finished.connect(finished)
+
+        self.btn_process.setEnabled(False)
+        self.btn_process_pdf.setEnabled(False)
+        self.btn_browse.setEnabled(False)
+        self.btn_cancel.setEnabled(True)
+        self.progress_bar.setRange(0, 0)
+        self.progress_bar.show()
+        self.btn_cancel.show()
+        self.worker.start()
+
+    def _confirm_invalid(self, error, generate_anyway):
+        """列出台账校验发现的问题，用户选择仍然生成时调用 generate_anyway()"""
+        box = QMessageBox(self)
+        box.setIcon(QMessageBox.Icon.Warning)
+        box.setWindowTitle("台账校验未通过")
+        box.setText(f"台账中有 {len(error.issues)} 处问题，尚未生成任何文件。\n"
+                    f"仍然生成时不再校验，无法识别的金额按 0.00 生成。")
+        box.setDetailedText("\n".join(map(str, error.issues)))
+        anyway = box.addButton("仍然生成", QMessageBox.ButtonRole.AcceptRole)
+        box.addButton(QMessageBox.StandardButton.Cancel)
+        box.setDefaultButton(QMessageBox.StandardButton.Cancel)
+        box.exec()
+        if box.clickedButton() is anyway:
+            generate_anyway()
+
+    def _show_run_summary(self, text, recorder, report_path):
+        box = QMessageBox(self)
+        box.setIcon(QMessageBox.Icon.Information)
+        box.setWindowTitle("成功")
+        box.setText(text)
+        box.setDetailedText(f"各阶段耗时：\n{recorder.summary()}\n\n运行报告：{report_path}")
+        box.exec()
+
+    def update_progress(self, done, total):
+        # 总数未知时显示忙碌状态
+        self.progress_bar.setRange(0, total)
+        self.progress_bar.setValue(done)
+
+    def cancel_generation(self):
+        if self.worker is not None:
+            self.btn_cancel.setEnabled(False)
+            self.worker.cancel()
+
+    def _generation_finished(self):
+        self.worker.deleteLater()
+        self.worker = None
+        self.progress_bar.hide()
+        self.btn_cancel.hide()
+        self.btn_process.setEnabled(True)
+        self.btn_process_pdf.setEnabled(True)
+        self.btn_browse.setEnabled(True)
+
+    def closeEvent(self, event):
+        # 生成中关闭窗口：取消并等待后台线程删除未完成的文件
+        if self.worker is not None:
+            self.worker.cancel()
+            self.worker.wait()
+        super().closeEvent(event)
 
     def process(self):
         if not self.input_path or not self.selected_sheet:
             QMessageBox.warning(self, "错误", "请先选择原始 Excel 文件及工作表！")
             return
 
-        try:
-            data_list = self._prepare_data()
-            if not all([d['address'], d['contact'], d['phone'], d['email'], d['issuer'], d['date']] for d in data_list[:1]):
-                QMessageBox.warning(self, "警告", "请填写所有模板字段！")
-                return
+        if not all(self._template_fields().values()):
+            QMessageBox.warning(self, "警告", "请填写所有模板字段！")
+            return
 
-            output_path, _ = QFileDialog.getSaveFileName(self, "保存询证函文件", "询证函.xlsx", "Excel Files (*.xlsx)")
-            if not output_path:
-                return
-            if not output_path.endswith('.xlsx'):
-                output_path += '.xlsx'
+        # 工作表过多时 Excel 保存和打开都很慢，建议拆分为多个工作簿
+        from generators.excel_shards import DEFAULT_SHARD_SIZE
+        shard_size = None
+        if self.ledger_rows > DEFAULT_SHARD_SIZE:
+            answer = QMessageBox.question(
+                self, "拆分工作簿",
+                f"台账共 {self.ledger_rows} 行，放在一个工作簿中时 Excel 保存和打开都很慢。\n"
+                f"是否按每 {DEFAULT_SHARD_SIZE} 份拆分为多个工作簿？\n"
+                f"（保存的文件为索引，列出每份询证函所在的文件和工作表；分片保存在同一文件夹）")
+            if answer == QMessageBox.StandardButton.Yes:
+                shard_size = DEFAULT_SHARD_SIZE
+
+        output_path, _ = QFileDialog.getSaveFileName(self, "保存询证函文件", "询证函.xlsx", "Excel Files (*.xlsx)")
+        if not output_path:
+            return
+        if not output_path.endswith('.xlsx'):
+            output_path += '.xlsx'
 
+        def generate(data_list, progress):
             user_template = get_user_template_path()
-            generate_excel(data_list, user_template, output_path)
-
-            # 保存模板
-            fields = {
-                'address': self.addr_edit.text().strip(),
-                'contact': self.contact_edit.text().strip(),
-                'phone': self.phone_edit.text().strip(),
-                'email': self.email_edit.text().strip(),
-                'issuer': self.issuer_edit.text().strip(),
-                'date': self.date_edit.date().toString("yyyy.M.d")
-            }
-            self.tm.save_fields(fields)
+            if shard_size:
+                from generators.excel_shards import generate_excel_shards
+                generate_excel_shards(data_list, user_template, output_path, shard_size=shard_size,
+                                      workers=os.cpu_count(), progress=progress)
+            else:
+                from generators.excel_generator import generate_excel
+                generate_excel(data_list, user_template, output_path, streaming=True, progress=progress)
 
-            QMessageBox.information(self, "成功", f"询证函已生成：\n{output_path}")
-
-        except Exception as e:
-            QMessageBox.critical(self, "错误", f"处理失败：\n{str(e)}")
+        self._start_worker(generate, output_path, "询证函已生成", "处理失败")
 
     def process_pdf(self):
         if not self.input_path or not self.selected_sheet:
             QMessageBox.warning(self, "错误", "请先选择原始 Excel 文件及工作表！")
             return
 
-        try:
-            data_list = self._prepare_data()
-            if not all([d['address'], d['contact'], d['phone'], d['email'], d['issuer'], d['date']] for d in data_list[:1]):
-                QMessageBox.warning(self, "警告", "请填写所有模板字段！")
-                return
-
-            base_dir = QFileDialog.getExistingDirectory(self, "选择PDF保存文件夹", "")
-            if not base_dir:
-                return
-
-            pdf_dir = os.path.join(base_dir, "pdf")
-            generate_pdfs(data_list, pdf_dir)
-
-            # 保存模板
-            fields = {
-                'address': self.addr_edit.text().strip(),
-                'contact': self.contact_edit.text().strip(),
-                'phone': self.phone_edit.text().strip(),
-                'email': self.email_edit.text().strip(),
-                'issuer': self.issuer_edit.text().strip(),
-                'date': self.date_edit.date().toString("yyyy.M.d")
-            }
-            self.tm.save_fields(fields)
+        if not all(self._template_fields().values()):
+            QMessageBox.warning(self, "警告", "请填写所有模板字段！")
+            return
 
-            QMessageBox.information(self, "成功", f"PDF询证函已生成：\n{pdf_dir}")
+        base_dir = QFileDialog.getExistingDirectory(self, "选择PDF保存文件夹", "")
+        if not base_dir:
+            return
+        pdf_dir = os.path.join(base_dir, "pdf")
+        incremental = self.incremental_check.isChecked()
 
-        except Exception as e:
-            QMessageBox.critical(self, "错误", f"PDF生成失败：\n{str(e)}")
\ No newline at end of file
+        def generate(data_list, progress):
+            from generators.pdf_generator import generate_pdfs
+            # 增量导出时同一文件夹再次导出只重新生成有变化的询证函
+            generate_pdfs(data_list, pdf_dir, workers=os.cpu_count(), progress=progress, incremental=incremental)
+
+        self._start_worker(generate, pdf_dir, "PDF询证函已生成", "PDF生成失败")
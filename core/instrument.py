@@ -0,0 +1,235 @@
+# core/instrument.py
+"""生成流程的阶段计时与内存记录
+
+读取台账、克隆工作表、保存工作簿、排版和写出 PDF 等环节用 stage(名称, 行号) 包围。
+没有设置接收方（sink）时 stage() 返回共用的空上下文，几乎没有开销；设置后每个阶段结束时
+向接收方发送一个事件字典：
+
+    {"stage": 阶段名称, "index": 询证函序号或 None, "seconds": 耗时, "peak": 新增峰值内存（字节）或 None}
+
+接收方可以是任意可调用对象。Recorder 按阶段汇总事件，生成 JSON 运行报告；memory=True 时
+开启 tracemalloc 记录各阶段的峰值内存（开销较大，只在排查问题时使用）。
+
+多进程生成 PDF 时子进程中不记录，主进程按阶段整体记录（index 为 None）。
+
+record_metrics(名称, 统计值) 记录不属于某个阶段的统计值（例如后台写出的队列深度、字节数），
+Recorder 把同名的统计值累加后写入报告的 "metrics"。
+"""
+import json
+import time
+import threading
+import tracemalloc
+from datetime import datetime
+
+_sink = None
+_local = threading.local()
+
+
+class _NullStage:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+_NULL_STAGE = _NullStage()
+
+
+class _Stage:
+    __slots__ = ("sink", "name", "index", "start", "memory", "base", "peak")
+
+    def __init__(self, sink, name, index):
+        self.sink = sink
+        self.name = name
+        self.index = index
+
+    def __enter__(self):
+        self.memory = tracemalloc.is_tracing() and getattr(self.sink, "memory", False)
+        if self.memory:
+            self.base = tracemalloc.get_traced_memory()[0]
+            self.peak = self.base
+            tracemalloc.reset_peak()
+            _stack().append(self)
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        seconds = time.perf_counter() - self.start
+        peak = None
+        if self.memory:
+            stack = _stack()
+            stack.pop()
+            top = max(self.peak, tracemalloc.get_traced_memory()[1])
+            peak = top - self.base
+            if stack:
+                # 内层阶段重置了峰值，把它的峰值交给外层
+                stack[-1].peak = max(stack[-1].peak, top)
+                tracemalloc.reset_peak()
+        self.sink({"stage": self.name, "index": self.index, "seconds": seconds, "peak": peak})
+        return False
+
+
+def _stack():
+    stack = getattr(_local, "stack", None)
+    if stack is None:
+        stack = _local.stack = []
+    return stack
+
+
+def set_sink(sink):
+    """设置接收方（None 表示关闭），返回原来的接收方"""
+    global _sink
+    previous, _sink = _sink, sink
+    return previous
+
+
+def enabled():
+    return _sink is not None
+
+
+def stage(name, index=None):
+    """with stage("pdf_render", i): ... —— 未设置接收方时不做任何事"""
+    if _sink is None:
+        return _NULL_STAGE
+    return _Stage(_sink, name, index)
+
+
+def record_metrics(name, values):
+    """把一组统计值 {名称: 数值} 交给接收方；接收方不汇总统计值或未设置时忽略"""
+    add = getattr(_sink, "add_metrics", None)
+    if add is not None:
+        add(name, values)
+
+
+def timed_iter(name, iterable):
+    """逐项记录取得下一项的耗时（用于惰性读取），未设置接收方时原样返回"""
+    if _sink is None:
+        return iterable
+    return _timed_iter(name, iterable)
+
+
+def _timed_iter(name, iterable):
+    # 只计时，不记录内存
+    iterator = iter(iterable)
+    index = 0
+    while True:
+        start = time.perf_counter()
+        try:
+            item = next(iterator)
+        except StopIteration:
+            return
+        sink = _sink
+        if sink is not None:
+            sink({"stage": name, "index": index, "seconds": time.perf_counter() - start, "peak": None})
+        yield item
+        index += 1
+
+
+class Recorder:
+    """按阶段汇总事件的接收方；用作上下文管理器时在期间接收全部事件
+
+    slowest 为报告中保留的最慢事件个数，其余事件只计入汇总，内存占用与询证函份数无关。
+    """
+
+    def __init__(self, memory=False, slowest=10):
+        self.memory = memory
+        self.slowest = slowest
+        self.stages = {}
+        self.metrics = {}
+        self.events = []
+        self.started = None
+        self.seconds = None
+        self._lock = threading.Lock()
+        self._previous = None
+        self._tracing = False
+
+    def __call__(self, event):
+        with self._lock:
+            total = self.stages.get(event["stage"])
+            if total is None:
+                total = self.stages[event["stage"]] = {
+                    "count": 0, "seconds": 0.0, "max_seconds": 0.0, "max_index": None, "peak": None}
+            total["count"] += 1
+            total["seconds"] += event["seconds"]
+            if event["seconds"] >= total["max_seconds"]:
+                total["max_seconds"] = event["seconds"]
+                total["max_index"] = event["index"]
+            if event["peak"] is not None:
+                total["peak"] = max(total["peak"] or 0, event["peak"])
+            if self.slowest:
+                self.events.append(event)
+                if len(self.events) > self.slowest * 2:
+                    self._trim()
+
+    def add_metrics(self, name, values):
+        """累加同名的统计值：max_ 开头的取最大值，其余相加"""
+        with self._lock:
+            total = self.metrics.setdefault(name, {})
+            for key, value in values.items():
+                if key in total:
+                    value = max(total[key], value) if key.startswith("max_") else total[key] + value
+                total[key] = value
+
+    def _trim(self):
+        self.events.sort(key=lambda event: event["seconds"], reverse=True)
+        del self.events[self.slowest:]
+
+    def __enter__(self):
+        self.started = datetime.now()
+        self._start = time.perf_counter()
+        if self.memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._tracing = True
+        self._previous = set_sink(self)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        set_sink(self._previous)
+        if self._tracing:
+            tracemalloc.stop()
+            self._tracing = False
+        self.seconds = time.perf_counter() - self._start
+        return False
+
+    def report(self, **info):
+        """运行报告（可直接写成 JSON）；info 为附加的运行信息，例如台账路径、份数"""
+        with self._lock:
+            self._trim()
+            return {
+                "started": self.started.isoformat(timespec="seconds") if self.started else None,
+                "seconds": self.seconds,
+                "memory": self.memory,
+                **info,
+                "stages": {name: dict(total) for name, total in self.stages.items()},
+                "metrics": {name: dict(values) for name, values in self.metrics.items()},
+                "slowest": list(self.events),
+            }
+
+    def write_report(self, path, **info):
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.report(**info), f, ensure_ascii=False, indent=2)
+
+    def summary(self):
+        """按耗时从大到小的各阶段汇总文本"""
+        lines = []
+        for name, total in sorted(self.stages.items(), key=lambda item: item[1]["seconds"], reverse=True):
+            line = f"{name}: {total['seconds']:.2f} 秒 / {total['count']} 次"
+            if total["count"] > 1:
+                line += f"，最慢 {total['max_seconds'] * 1000:.1f} 毫秒"
+                if total["max_index"] is not None:
+                    line += f"（第 {total['max_index'] + 1} 份）"
+            if total["peak"] is not None:
+                line += f"，峰值内存 {total['peak'] / 1024 / 1024:.1f} MB"
+            lines.append(line)
+        for name, values in self.metrics.items():
+            if "bytes" in values and values.get("seconds"):
+                # 后台写出（generators.write_behind）
+                lines.append(f"{name}: 写出 {values['files']} 个文件 {values['bytes'] / 1024 / 1024:.1f} MB，"
+                             f"{values['bytes'] / 1024 / 1024 / values['seconds']:.1f} MB/秒，"
+                             f"队列最大深度 {values['max_queue']}，提交时等待 {values['waits']} 次")
+            else:
+                lines.append(f"{name}: " + "，".join(f"{key} {value}" for key, value in values.items()))
+        if self.seconds is not None:
+            lines.append(f"总计：{self.seconds:.2f} 秒")
+        return "\n".join(lines)
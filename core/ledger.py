@@ -0,0 +1,373 @@
+# core/ledger.py
+"""询证函台账读取
+
+把台账中的一张工作表转换为生成器使用的 LetterBatch。图形界面和命令行共用，不依赖 Qt。
+
+台账直接按 XML 流式解析（不经过 pandas 和 openpyxl 的单元格对象）：读到表头后只转换
+必需的七列，其余列的单元格直接跳过；询证函数据按行惰性产出，生成器边读边写，
+不需要把整张工作表载入内存。单元格值的文本形式与 pandas.read_excel(dtype=str) 一致。
+
+选择台账时用 probe_sheet 快速探查：只解析表头行（共享字符串只解析到表头用到的位置），
+数据行数按原始字节扫描得到，不解析数据行的 XML。
+"""
+import re
+import zipfile
+from xml.etree import ElementTree
+
+from core.utils import get_season_from_date
+from core.letters import Letter, LetterHeader, LetterBatch, ROW_FIELDS
+from core.instrument import stage, timed_iter
+
+REQUIRED_COLUMNS = [
+    "工作表名称", "编号", "函证单位", "工程项目",
+    "应收帐款（已开票末付款）", "长期应收款（质量保金）", "合计"
+]
+# 应用到所有询证函的模板字段（日期单独传入）
+TEMPLATE_FIELDS = ("address", "contact", "phone", "email", "issuer")
+
+NS_MAIN = "http://schemas.openxmlformats.org/spreadsheetml/2006/main"
+NS_REL = "http://schemas.openxmlformats.org/officeDocument/2006/relationships"
+NS_PKG_REL = "http://schemas.openxmlformats.org/package/2006/relationships"
+
+_ROW = f"{{{NS_MAIN}}}row"
+_CELL = f"{{{NS_MAIN}}}c"
+_VALUE = f"{{{NS_MAIN}}}v"
+_TEXT = f"{{{NS_MAIN}}}t"
+_INLINE = f"{{{NS_MAIN}}}is"
+_PHONETIC = f"{{{NS_MAIN}}}rPh"
+_SHARED_STRING = f"{{{NS_MAIN}}}si"
+# 工作表根元素的命名空间前缀（多数文件使用默认命名空间，没有前缀）
+_ROOT_PREFIX = re.compile(rb"<(\w+:)?worksheet[\s>]")
+# 探查行数时每次读取的字节数
+_SCAN_CHUNK = 1 << 20
+
+
+_column_indexes = {}
+
+
+def _column_index(ref):
+    """'AB12' -> 28（按列字母缓存，每个单元格都要调用）"""
+    letters = ref.rstrip("0123456789")
+    col = _column_indexes.get(letters)
+    if col is None:
+        col = 0
+        for ch in letters:
+            col = col * 26 + ord(ch.upper()) - 64
+        _column_indexes[letters] = col
+    return col
+
+
+def _rich_text(node):
+    """共享字符串或内联字符串的文本（与 openpyxl 一致，忽略注音 rPh）"""
+    parts = []
+    for child in node:
+        if child.tag == _TEXT:
+            parts.append(child.text or "")
+        elif child.tag != _PHONETIC:
+            parts.extend(t.text or "" for t in child.iter(_TEXT))
+    return "".join(parts)
+
+
+class _SharedStrings:
+    """共享字符串表：按需逐条解析，只读表头时不必解析整张表"""
+
+    def __init__(self, archive):
+        self.strings = []
+        self._file = None
+        self._events = None
+        if "xl/sharedStrings.xml" in archive.namelist():
+            self._file = archive.open("xl/sharedStrings.xml")
+            self._events = ElementTree.iterparse(self._file)
+
+    def __getitem__(self, index):
+        while index >= len(self.strings) and self._events is not None:
+            self._parse_next()
+        return self.strings[index]
+
+    def _parse_next(self):
+        for _, node in self._events:
+            if node.tag == _SHARED_STRING:
+                self.strings.append(_rich_text(node))
+                node.clear()
+                return
+        self.close()
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+        self._file = None
+        self._events = None
+
+
+class LedgerWorkbook:
+    """台账 xlsx 包的只读视图：工作表名称、共享字符串和日期样式按需解析"""
+
+    def __init__(self, path):
+        self.archive = zipfile.ZipFile(path)
+        try:
+            workbook = ElementTree.fromstring(self.archive.read("xl/workbook.xml"))
+            rels = ElementTree.fromstring(self.archive.read("xl/_rels/workbook.xml.rels"))
+        except BaseException:
+            self.archive.close()
+            raise
+        targets = {rel.get("Id"): rel.get("Target") for rel in rels.iter(f"{{{NS_PKG_REL}}}Relationship")}
+        self.sheets = {}
+        for sheet in workbook.iter(f"{{{NS_MAIN}}}sheet"):
+            target = targets[sheet.get(f"{{{NS_REL}}}id")]
+            self.sheets[sheet.get("name")] = "xl/" + target.lstrip("/").removeprefix("xl/")
+        props = workbook.find(f"{{{NS_MAIN}}}workbookPr")
+        self.date1904 = props is not None and props.get("date1904") in ("1", "true")
+        self._strings = None
+        self._date_styles = None
+
+    @property
+    def sheetnames(self):
+        return list(self.sheets)
+
+    def close(self):
+        if self._strings is not None:
+            self._strings.close()
+        self.archive.close()
+
+    def shared_strings(self):
+        if self._strings is None:
+            self._strings = _SharedStrings(self.archive)
+        return self._strings
+
+    def date_styles(self):
+        """数字格式为日期/时长的单元格样式编号 -> 是否为时长"""
+        if self._date_styles is None:
+            from openpyxl.styles.numbers import BUILTIN_FORMATS, is_date_format, is_timedelta_format
+
+            self._date_styles = {}
+            if "xl/styles.xml" in self.archive.namelist():
+                styles = ElementTree.fromstring(self.archive.read("xl/styles.xml"))
+                formats = dict(BUILTIN_FORMATS)
+                for fmt in styles.iter(f"{{{NS_MAIN}}}numFmt"):
+                    formats[int(fmt.get("numFmtId"))] = fmt.get("formatCode")
+                cell_xfs = styles.find(f"{{{NS_MAIN}}}cellXfs")
+                for style_id, xf in enumerate(cell_xfs if cell_xfs is not None else ()):
+                    code = formats.get(int(xf.get("numFmtId", 0)))
+                    if code and is_date_format(code):
+                        self._date_styles[style_id] = is_timedelta_format(code)
+        return self._date_styles
+
+    def _cell_value(self, cell):
+        """单元格的值（公式取缓存结果），与 openpyxl 只读模式一致；错误值视为空"""
+        kind = cell.get("t", "n")
+        if kind == "inlineStr":
+            node = cell.find(_INLINE)
+            return _rich_text(node) if node is not None else None
+        value = cell.find(_VALUE)
+        if value is None or value.text is None:
+            return None
+        text = value.text
+        if kind == "s":
+            return self.shared_strings()[int(text)]
+        if kind == "n":
+            number = float(text) if any(ch in text for ch in ".eE") else int(text)
+            style = cell.get("s")
+            date_styles = self.date_styles()
+            if style is not None and int(style) in date_styles:
+                from openpyxl.utils.datetime import from_excel, CALENDAR_MAC_1904, CALENDAR_WINDOWS_1900
+                epoch = CALENDAR_MAC_1904 if self.date1904 else CALENDAR_WINDOWS_1900
+                return from_excel(number, epoch, timedelta=date_styles[int(style)])
+            return number
+        if kind == "b":
+            return bool(int(text))
+        if kind == "d":
+            from openpyxl.utils.datetime import from_ISO8601
+            return from_ISO8601(text)
+        if kind == "e":
+            return None
+        return text
+
+    def iter_rows(self, sheet_name, columns=(), numbered=False):
+        """逐行产出 {列号: 值}，只含非空单元格
+
+        columns 非空时只转换其中的列；传入的集合可在遍历中途补充（例如读到表头之后）。
+        numbered 为 True 时产出 (行号, {列号: 值})。
+        """
+        if sheet_name not in self.sheets:
+            raise KeyError(f"台账中没有工作表：{sheet_name}")
+        with self.archive.open(self.sheets[sheet_name]) as f:
+            for _, row in ElementTree.iterparse(f):
+                if row.tag != _ROW:
+                    continue
+                values = {}
+                col = 0
+                for cell in row.iter(_CELL):
+                    ref = cell.get("r")
+                    col = _column_index(ref) if ref else col + 1
+                    if columns and col not in columns:
+                        continue
+                    value = self._cell_value(cell)
+                    if value is not None:
+                        values[col] = value
+                if numbered:
+                    number = row.get("r")
+                    values = (int(number) if number else None, values)
+                row.clear()
+                yield values
+
+    def count_rows(self, sheet_name):
+        """有值的行数（含表头），按原始字节扫描，不解析 XML
+
+        一行中只要有单元格带值（<v> 或内联字符串）就计入，只有格式的空行不计入。
+        """
+        if sheet_name not in self.sheets:
+            raise KeyError(f"台账中没有工作表：{sheet_name}")
+        count = 0
+        with self.archive.open(self.sheets[sheet_name]) as f:
+            head = f.read(_SCAN_CHUNK)
+            match = _ROOT_PREFIX.search(head)
+            prefix = (match.group(1) or b"") if match else b""
+            row_tag = b"<" + prefix + b"row"
+            markers = (b"<" + prefix + b"v>", b"<" + prefix + b"is>")
+            pending = head
+            while True:
+                chunk = f.read(_SCAN_CHUNK)
+                if chunk:
+                    pending += chunk
+                # 最后一个 <row 之后的部分可能不完整，留到下一块
+                end = len(pending) if not chunk else pending.rfind(row_tag)
+                if end <= 0:
+                    if not chunk:
+                        break
+                    continue
+                for segment in pending[:end].split(row_tag)[1:]:
+                    if markers[0] in segment or markers[1] in segment:
+                        count += 1
+                pending = pending[end:]
+                if not chunk:
+                    break
+        return count
+
+
+def list_sheets(input_path):
+    """返回台账中的工作表名称"""
+    wb = LedgerWorkbook(input_path)
+    try:
+        return wb.sheetnames
+    finally:
+        wb.close()
+
+
+def _cell_text(value):
+    """单元格值转为文本，与 pandas.read_excel(dtype=str) 一致：整数值的浮点数不带小数点，空单元格为空串"""
+    if value is None:
+        return ""
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return str(value)
+
+
+def _header(rows):
+    """读取表头（第一个非空行），返回 {列名: 列号}；同名列以最左边的一列为准（与 pandas 一致）"""
+    titles = next((values for _, values in rows if values), {})
+    return {_cell_text(value): col for col, value in sorted(titles.items(), reverse=True)}
+
+
+class SheetProbe:
+    """probe_sheet 的结果：columns 为表头中的列名（按列的顺序），missing 为缺少的必需列，
+    rows 为表头之后有值的行数（只有其他列有值的行也计入，实际询证函份数可能更少）"""
+    __slots__ = ("sheet_name", "columns", "missing", "rows")
+
+    def __init__(self, sheet_name, columns, missing, rows):
+        self.sheet_name = sheet_name
+        self.columns = columns
+        self.missing = missing
+        self.rows = rows
+
+
+def probe_sheet(input_path, sheet_name):
+    """快速探查台账工作表：只解析表头，数据行只计数
+
+    缺少必需列时不抛出异常，由调用方根据 missing 提示。
+    """
+    wb = LedgerWorkbook(input_path)
+    try:
+        with stage("ledger_probe"):
+            rows = wb.iter_rows(sheet_name, numbered=True)
+            try:
+                titles = _header(rows)
+            finally:
+                rows.close()
+            columns = [title for title, _ in sorted(titles.items(), key=lambda item: item[1])]
+            missing = [col for col in REQUIRED_COLUMNS if col not in titles]
+            rows = max(wb.count_rows(sheet_name) - 1, 0) if titles else 0
+    finally:
+        wb.close()
+    return SheetProbe(sheet_name, columns, missing, rows)
+
+
+def _letters(wb, rows, columns, header):
+    try:
+        for row, values in timed_iter("ledger_row", rows):
+            # 必需列全部为空的行跳过
+            if not values:
+                continue
+            (sheet_name, number, unit, project,
+             receivable, long_term, total) = (_cell_text(values.get(col)) for col in columns)
+            yield Letter(header, sheet_name, number, unit, project,
+                         receivable or "0.00", long_term or "0.00", total or "0.00", row=row)
+    finally:
+        wb.close()
+
+
+def letter_header(fields, date):
+    """由模板字段（回函地址、联系人、电话、邮箱、发函单位）和 'YYYY.M.D' 格式的发函日期构建 LetterHeader"""
+    return LetterHeader(*(fields[key].strip() for key in TEMPLATE_FIELDS), date, get_season_from_date(date))
+
+
+def read_letters(input_path, sheet_name, fields, date):
+    """读取台账工作表，返回逐行读取的 LetterBatch
+
+    fields 为模板字段（回函地址、联系人、电话、邮箱、发函单位），date 为 'YYYY.M.D' 格式的发函日期。
+    第一个非空行为表头。工作表不存在、缺少列或日期格式错误时立即抛出异常；
+    返回的 LetterBatch 只能遍历一次。
+    """
+    header = letter_header(fields, date)
+
+    with stage("ledger_open"):
+        wb = LedgerWorkbook(input_path)
+    try:
+        wanted = set()
+        rows = wb.iter_rows(sheet_name, wanted, numbered=True)
+        with stage("ledger_header"):
+            titles = _header(rows)
+        missing = [col for col in REQUIRED_COLUMNS if col not in titles]
+        if missing:
+            raise ValueError(f"缺少列：{', '.join(missing)}")
+    except BaseException:
+        wb.close()
+        raise
+    columns = [titles[col] for col in REQUIRED_COLUMNS]
+    # 表头之后只转换必需的列
+    wanted.update(columns)
+    return LetterBatch(header, _letters(wb, rows, columns, header))
+
+
+def letters_from_records(records, fields, date):
+    """由内存中的台账记录构建逐条转换的 LetterBatch（不读取文件），与 read_letters 的结果相同
+
+    每条记录为字典，键为台账列名（REQUIRED_COLUMNS）或字段名（core.letters.ROW_FIELDS）；
+    值按单元格文本处理，金额为空时为 0.00。fields 与 date 同 read_letters。
+    """
+    header = letter_header(fields, date)
+    return LetterBatch(header, _record_letters(records, header))
+
+
+def _record_letters(records, header):
+    for record in records:
+        (sheet_name, number, unit, project,
+         receivable, long_term, total) = (_cell_text(record[field] if field in record else record.get(title))
+                                          for field, title in zip(ROW_FIELDS, REQUIRED_COLUMNS))
+        yield Letter(header, sheet_name, number, unit, project,
+                     receivable or "0.00", long_term or "0.00", total or "0.00")
+
+
+def prepare_data(input_path, sheet_name, fields, date):
+    """读取台账工作表，返回已全部读入内存的 LetterBatch"""
+    batch = read_letters(input_path, sheet_name, fields, date)
+    return LetterBatch(batch.header, list(batch))
@@ -0,0 +1,114 @@
+# core/letters.py
+"""询证函数据
+
+台账每行只有七列各不相同；回函地址、联系人、电话、邮箱、发函单位、日期和季度对整批询证函都一样，
+只在 LetterHeader 中保存一份，每份 Letter 引用它。两者都使用 __slots__，不为每行创建字典。
+"""
+from operator import attrgetter
+
+# 台账中每行不同的字段
+ROW_FIELDS = ("sheet_name", "number", "unit", "project", "receivable", "long_term", "total")
+# 整批共享的字段
+HEADER_FIELDS = ("address", "contact", "phone", "email", "issuer", "date", "season")
+
+
+class LetterHeader:
+    """整批询证函共享的模板字段"""
+    __slots__ = HEADER_FIELDS
+
+    def __init__(self, address, contact, phone, email, issuer, date, season):
+        self.address = address
+        self.contact = contact
+        self.phone = phone
+        self.email = email
+        self.issuer = issuer
+        self.date = date
+        self.season = season
+
+    def values(self):
+        return tuple(getattr(self, name) for name in HEADER_FIELDS)
+
+
+class Letter:
+    """一份询证函：台账中的一行，共享字段通过 header 读取（letter.address 等同于 letter.header.address）
+
+    row 为台账中的行号（用于报告问题，不是询证函内容；不是从台账读取时为 None）。
+    """
+    __slots__ = ROW_FIELDS + ("header", "row")
+
+    def __init__(self, header, sheet_name, number, unit, project, receivable, long_term, total, row=None):
+        self.header = header
+        self.row = row
+        self.sheet_name = sheet_name
+        self.number = number
+        self.unit = unit
+        self.project = project
+        self.receivable = receivable
+        self.long_term = long_term
+        self.total = total
+
+    def to_dict(self):
+        """旧格式的数据字典"""
+        return {name: getattr(self, name) for name in ROW_FIELDS + HEADER_FIELDS}
+
+
+# 共享字段以只读属性的形式挂到 Letter 上
+for _name in HEADER_FIELDS:
+    setattr(Letter, _name, property(attrgetter(f"header.{_name}")))
+del _name
+
+
+class LetterBatch:
+    """一批询证函：共享字段保存一份，letters 为 Letter 的列表或惰性序列
+
+    letters 为生成器时（例如 core.ledger.read_letters 的结果）只能遍历一次。
+    """
+
+    def __init__(self, header, letters):
+        self.header = header
+        self.letters = letters
+
+    def __iter__(self):
+        return iter(self.letters)
+
+    def __len__(self):
+        return len(self.letters)
+
+    @classmethod
+    def from_dicts(cls, data_list):
+        """由旧格式的数据字典列表构建（batch.header 取第一行的共享字段）"""
+        letters = list(iter_letters(data_list))
+        header = letters[0].header if letters else None
+        return cls(header, letters)
+
+
+def pdf_file_name(sheet_name):
+    """由工作表名称得到单份 PDF 的文件名"""
+    safe_name = "".join(c for c in sheet_name if c.isalnum() or c in (' ', '-', '_')).rstrip()
+    if not safe_name:
+        safe_name = "询证函"
+    return f"{safe_name}.pdf"
+
+
+def letter_count(data_list):
+    """询证函份数；惰性序列返回 None"""
+    try:
+        return len(data_list)
+    except TypeError:
+        return None
+
+
+def iter_letters(data_list):
+    """把 LetterBatch、Letter 序列或旧格式的数据字典序列统一为 Letter 序列
+
+    数据字典中共享字段相同的连续各行引用同一个 LetterHeader。
+    """
+    header = None
+    for data in data_list:
+        if isinstance(data, Letter):
+            yield data
+            continue
+        shared = tuple(data[name] for name in HEADER_FIELDS)
+        if header is None or header.values() != shared:
+            header = LetterHeader(*shared)
+        yield Letter(header, *(data[name] for name in ROW_FIELDS))
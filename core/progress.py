@@ -0,0 +1,47 @@
+# core/progress.py
+"""生成进度与取消
+
+生成器每处理完一份询证函调用一次 Progress.step()。界面线程调用 cancel() 后，
+生成器在下一次 step() 时抛出 Cancelled，最多再处理一份询证函就会停止。
+"""
+import threading
+
+
+class Cancelled(Exception):
+    """生成被用户取消"""
+
+
+class Progress:
+    """callback(done, total) 在生成器所在线程中调用；total 为 None 表示总数未知"""
+
+    def __init__(self, callback=None):
+        self.callback = callback
+        self.done = 0
+        self.total = None
+        self._cancelled = threading.Event()
+
+    def begin(self, total):
+        """开始新的一轮（例如先生成 Excel 再生成 PDF 时各一轮）"""
+        self.check()
+        self.done = 0
+        self.total = total
+        if self.callback is not None:
+            self.callback(self.done, self.total)
+
+    def step(self, count=1):
+        self.check()
+        self.done += count
+        if self.callback is not None:
+            self.callback(self.done, self.total)
+
+    def check(self):
+        if self._cancelled.is_set():
+            raise Cancelled()
+
+    def cancel(self):
+        """可在任意线程中调用"""
+        self._cancelled.set()
+
+    @property
+    def cancelled(self):
+        return self._cancelled.is_set()
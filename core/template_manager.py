@@ -1,9 +1,18 @@
 # core/template_manager.py
+"""用户模板与模板字段
+
+模板字段（回函地址、联系人、电话、邮箱、发函单位、发函日期）同时保存在用户模板 template.xlsx 中
+和配置目录下的 template_fields.json 中。JSON 记录写入时模板文件的修改时间和大小：模板未被修改时
+直接从 JSON 读取，不必用 openpyxl 打开模板；保存字段时只有模板中显示的内容确实变化才重写 template.xlsx。
+"""
 import os
 import sys
+import json
 import shutil
-from openpyxl import load_workbook
-from core.utils import get_user_template_path, get_default_template_path
+import logging
+from core.utils import get_user_template_path, get_default_template_path, get_config_dir, file_stamp
+
+logger = logging.getLogger(__name__)
 
 def parse_A9(text):
     """解析 A9 中的地址和联系人"""
@@ -14,9 +23,12 @@ def parse_A9(text):
         return addr, contact
     return text.strip(), ""
 
+FIELD_NAMES = ('address', 'contact', 'phone', 'email', 'issuer', 'date')
+
 class TemplateManager:
     def __init__(self):
         self.user_template = get_user_template_path()
+        self.fields_path = get_config_dir() / "template_fields.json"
         self._ensure_template_exists()
 
     def _ensure_template_exists(self):
@@ -25,10 +37,10 @@ class TemplateManager:
             default_template = get_default_template_path()
             if os.path.exists(default_template):
                 shutil.copy2(default_template, self.user_template)
-                print(f"已创建用户模板: {self.user_template}")
+                logger.info("已创建用户模板: %s", self.user_template)
             else:
                 # 如果默认模板也不存在，创建一个空的模板文件
-                print(f"警告: 默认模板不存在 {default_template}")
+                logger.warning("默认模板不存在 %s", default_template)
                 self._create_empty_template()
 
     def _create_empty_template(self):
@@ -47,7 +59,42 @@ class TemplateManager:
     def load_fields(self):
         if not self.user_template.exists():
             return self._get_default_fields()
-            
+
+        fields = self._load_sidecar()
+        if fields is None:
+            # 模板在程序之外被修改过（或第一次运行）：从模板读取并记录
+            fields = self._read_template_fields()
+            self._save_sidecar(fields)
+        return fields
+
+    def _load_sidecar(self):
+        """模板未被修改时返回 JSON 中的字段，否则返回 None"""
+        try:
+            with open(self.fields_path, encoding="utf-8") as f:
+                data = json.load(f)
+            if tuple(data["template"]) != file_stamp(self.user_template):
+                return None
+            return {name: str(data["fields"][name]) for name in FIELD_NAMES}
+        except (OSError, ValueError, KeyError, TypeError):
+            return None
+
+    def _save_sidecar(self, fields):
+        data = {
+            "template": list(file_stamp(self.user_template)),
+            "fields": {name: fields[name] for name in FIELD_NAMES},
+        }
+        tmp_path = f"{self.fields_path}.{os.getpid()}.tmp"
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(data, f, ensure_ascii=False)
+            os.replace(tmp_path, self.fields_path)
+        except OSError:
+            # 只是缓存，写不了下次从模板读取
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    def _read_template_fields(self):
+        from openpyxl import load_workbook
         wb = load_workbook(self.user_template, read_only=True, data_only=True)
         ws = wb.active
         a9 = str(ws['A9'].value or "").strip()
@@ -73,6 +120,15 @@ class TemplateManager:
         }
 
     def save_fields(self, fields):
+        """保存模板字段；模板中显示的内容不变时不重写 template.xlsx"""
+        fields = {name: fields[name] for name in FIELD_NAMES}
+        if self.user_template.exists() and self.load_fields() == fields:
+            return
+        self._write_template_fields(fields)
+        self._save_sidecar(fields)
+
+    def _write_template_fields(self, fields):
+        from openpyxl import load_workbook
         wb = load_workbook(self.user_template)
         ws = wb.active
         ws['A9'] = f"回函地址：{fields['address']}    联系人：{fields['contact']}"
@@ -0,0 +1,216 @@
+# core/template_plan.py
+"""询证函文字、模板单元格映射与编译后的模板
+
+letter_texts 只在这里组织一次询证函的各项文字，Excel 与 PDF 共用；CELL_TEMPLATES 规定
+模板中哪个单元格填写什么（以前 D1、A3、A4、C13 等坐标分别写死在两个 Excel 生成器里）。
+
+load_template_plan 把模板的活动工作表（单元格值、样式、合并单元格、行列尺寸）连同单元格映射
+编译为 TemplatePlan，以 JSON 保存在配置目录的 template-cache 中，以后的运行不必再用 openpyxl
+解析模板。文件名为模板内容、映射和编译格式的哈希；样式保存为 XML 片段，读取缓存不执行代码。
+同一进程中还按路径和修改时间缓存在内存中。也可以直接传入模板内容（bytes），此时按内容哈希
+只缓存在内存中，不读写磁盘。
+"""
+import os
+import json
+import logging
+import hashlib
+from io import BytesIO
+
+from core.utils import get_config_dir, file_stamp, compile_sheet, SheetPlan
+from core.validation import format_amount
+from core.instrument import stage
+
+logger = logging.getLogger(__name__)
+
+# 编译结果的格式版本，SheetPlan 或 TemplatePlan 的结构（或缓存格式）变化时加一
+PLAN_VERSION = 2
+CACHE_DIR_NAME = "template-cache"
+# 缓存目录中保留的编译结果个数（默认模板与用户模板等）
+CACHE_KEEP = 8
+
+# 模板单元格 -> 填写的内容（按 letter_texts 的字段格式化；只有一个字段时直接填写字段值）
+CELL_TEMPLATES = {
+    'D1': "编号：{number}",
+    'A3': "{unit}",
+    'A4': "    {body}",
+    'C13': "{receivable}",
+    'C14': "{long_term}",
+    'C16': "{total}",
+    'A9': "回函地址：{address}    联系人：{contact}",
+    'A10': "电话：{phone}",
+    'C10': "邮箱：{email}",
+    'B19': "{issuer}",
+    'D20': "{date}",
+    'B13': "{date}",
+    'B14': "{date}",
+    'A29': "{remark}",
+}
+
+
+def letter_texts(data):
+    """单份询证函（Letter）的各项文字 {字段: 文字}，金额已格式化"""
+    return {
+        'number': data.number,
+        'unit': data.unit,
+        'project': data.project,
+        'body': (
+            f"我公司承担的{data.project}项目，已完成了合同约定的相应工作，我公司核算截止到该项目{data.season}计价，"
+            f"债权记录截止到{data.date}尚有下表列示数据未收到，请贵公司核对，如与贵单位记录相符，请在本函下端“信息证明无误”处签章证明；"
+            f"如有不符，请在“信息不符”处列明不符金额"
+        ),
+        'receivable': format_amount(data.receivable),
+        'long_term': format_amount(data.long_term),
+        'total': format_amount(data.total),
+        'address': data.address,
+        'contact': data.contact,
+        'phone': data.phone,
+        'email': data.email,
+        'issuer': data.issuer,
+        'date': data.date,
+        'remark': f"3.备注：（如果截止{data.date}日后情况有变化，请在此列明最新情况）",
+    }
+
+
+def compile_cells(cells):
+    """{坐标: 内容格式} -> [(坐标, 单一字段名或 None, 内容格式)]"""
+    fills = []
+    for coord, fmt in cells.items():
+        name = fmt[1:-1]
+        single = fmt.startswith("{") and fmt.endswith("}") and name.isidentifier()
+        fills.append((coord, name if single else None, fmt))
+    return fills
+
+
+_CELL_FILLS = compile_cells(CELL_TEMPLATES)
+
+
+def letter_cells(data, fills=None):
+    """单份询证函需要填入模板的单元格值 {坐标: 值}；fills 默认为 CELL_TEMPLATES"""
+    texts = letter_texts(data)
+    return {coord: texts[name] if name else fmt.format_map(texts) for coord, name, fmt in fills or _CELL_FILLS}
+
+
+class TemplatePlan:
+    """编译后的模板：sheet 为 SheetPlan，cells 为 {坐标: 内容格式}"""
+
+    def __init__(self, digest, sheet, cells):
+        self.digest = digest
+        self.sheet = sheet
+        self.cells = dict(cells)
+        self.fills = compile_cells(self.cells)
+
+    def letter_cells(self, data):
+        return letter_cells(data, self.fills)
+
+    def to_json(self):
+        return {"version": PLAN_VERSION, "digest": self.digest, "cells": self.cells, "sheet": self.sheet.to_json()}
+
+    @classmethod
+    def from_json(cls, data):
+        if data.get("version") != PLAN_VERSION:
+            raise ValueError("模板缓存版本不匹配")
+        return cls(data["digest"], SheetPlan.from_json(data["sheet"]), data["cells"])
+
+
+def template_digest(template_path):
+    """模板内容、单元格映射与编译格式的哈希"""
+    with open(template_path, "rb") as f:
+        return _content_digest(f.read())
+
+
+def _content_digest(data):
+    digest = hashlib.sha256(json.dumps([PLAN_VERSION, CELL_TEMPLATES], ensure_ascii=False).encode("utf-8"))
+    digest.update(data)
+    return digest.hexdigest()
+
+
+def compile_template(template_path, digest=None):
+    """用 openpyxl 解析模板并编译（不读写缓存）；template_path 也可以是文件对象，此时需要 digest"""
+    from openpyxl import load_workbook
+    from openpyxl.cell.cell import MergedCell
+
+    ws = load_workbook(template_path).active
+    for coord in CELL_TEMPLATES:
+        # 合并区域中除左上角以外的单元格不能填写
+        if isinstance(ws[coord], MergedCell):
+            raise ValueError(f"模板单元格 {coord} 位于合并区域内，无法填写询证函数据")
+    return TemplatePlan(digest or template_digest(template_path), compile_sheet(ws), CELL_TEMPLATES)
+
+
+# 模板路径 -> ((修改时间, 大小), TemplatePlan)；直接传入的模板内容以哈希为键，修改时间为 None
+_memory_cache = {}
+
+
+def _cache_dir():
+    return get_config_dir() / CACHE_DIR_NAME
+
+
+def _write_cache(cache_dir, plan):
+    try:
+        data = plan.to_json()
+    except TypeError as e:
+        logger.warning("模板无法缓存，每次运行重新编译：%s", e)
+        return
+    path = os.path.join(cache_dir, f"{plan.digest}.json")
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False, separators=(",", ":"))
+        os.replace(tmp_path, path)
+    except OSError as e:
+        # 缓存写不了不影响生成，下次重新编译
+        logger.warning("无法写入模板缓存 %s: %s", path, e)
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        return
+    # 只保留最近用到的几个；以前版本以 pickle 保存的缓存一并删除
+    cached = sorted((entry for entry in os.scandir(cache_dir) if entry.name.endswith(".json")),
+                    key=lambda entry: entry.stat().st_mtime, reverse=True)
+    stale = [entry for entry in os.scandir(cache_dir) if entry.name.endswith(".pickle")]
+    for entry in cached[CACHE_KEEP:] + stale:
+        try:
+            os.remove(entry.path)
+        except OSError:
+            pass
+
+
+def load_template_plan(template_path, cache_dir=None):
+    """返回模板的 TemplatePlan：先查内存，再按内容哈希查磁盘缓存，都没有时编译并写入缓存
+
+    cache_dir 默认为配置目录下的 template-cache。template_path 为模板内容（bytes）时只缓存在内存中。
+    """
+    if isinstance(template_path, bytes):
+        digest = _content_digest(template_path)
+        cached = _memory_cache.get(digest)
+        if cached is None:
+            cached = _memory_cache[digest] = (None, compile_template(BytesIO(template_path), digest))
+        return cached[1]
+
+    key = os.path.abspath(template_path)
+    stamp = file_stamp(key)
+    cached = _memory_cache.get(key)
+    if cached is not None and cached[0] == stamp:
+        return cached[1]
+
+    cache_dir = cache_dir or _cache_dir()
+    digest = template_digest(key)
+    path = os.path.join(cache_dir, f"{digest}.json")
+    plan = None
+    with stage("template_cache"):
+        try:
+            with open(path, encoding="utf-8") as f:
+                plan = TemplatePlan.from_json(json.load(f))
+            os.utime(path)
+        except FileNotFoundError:
+            pass
+        # 样式的 XML 片段无法解析时为 SyntaxError（xml.etree.ElementTree.ParseError）
+        except (OSError, ValueError, KeyError, TypeError, IndexError, SyntaxError) as e:
+            # 缓存损坏或与当前代码不兼容：重新编译
+            logger.warning("模板缓存 %s 无法读取，重新编译：%s", path, e)
+            plan = None
+    if plan is None or plan.digest != digest:
+        plan = compile_template(key, digest)
+        _write_cache(cache_dir, plan)
+    _memory_cache[key] = (stamp, plan)
+    return plan
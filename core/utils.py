@@ -2,10 +2,13 @@
 import sys
 import os
 from pathlib import Path
-from openpyxl import load_workbook
-from openpyxl.utils import get_column_letter
+import weakref
 from copy import copy
 
+from core.instrument import stage
+
+# openpyxl 只在克隆工作表时才导入：路径、日期等工具函数在程序启动时就会用到
+
 def resource_path(relative_path):
     """获取资源路径（兼容 PyInstaller）"""
     try:
@@ -15,19 +18,40 @@ def resource_path(relative_path):
         base_path = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
     return os.path.join(base_path, relative_path)
 
-def get_user_template_path():
-    """获取用户模板路径"""
+def get_config_dir():
+    """获取用户配置目录"""
     if sys.platform == "win32":
         config_dir = Path(os.environ["APPDATA"]) / "InquiryLetterGenerator"
     else:
         config_dir = Path.home() / ".config" / "InquiryLetterGenerator"
     config_dir.mkdir(parents=True, exist_ok=True)
-    return config_dir / "template.xlsx"
+    return config_dir
+
+def get_user_template_path():
+    """获取用户模板路径"""
+    return get_config_dir() / "template.xlsx"
 
 def get_default_template_path():
     """获取默认模板路径（assets目录中的模板）"""
     return resource_path("assets/template.xlsx")
 
+def file_stamp(path):
+    """文件的 (修改时间（纳秒）, 大小)，用于判断文件是否被修改过"""
+    stat = os.stat(path)
+    return stat.st_mtime_ns, stat.st_size
+
+def write_atomic(path, write):
+    """先由 write(f) 写入同目录的临时文件再改名，path 处不会出现写了一半的文件；失败时删除临时文件"""
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    try:
+        with open(tmp_path, "wb") as f:
+            write(f)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
 def parse_date(date_str):
     """解析 'YYYY.M.D' 日期"""
     parts = date_str.split('.')
@@ -51,9 +75,10 @@ def get_season_from_date(date_str):
         return f"{y - 1}年第4季度"
     return f"{y}年第{quarter}季度"
 
-def clone_sheet(source_ws, target_wb, new_title):
-    """克隆工作表（含格式）"""
-    target_ws = target_wb.create_sheet(title=new_title)
+def _copy_sheet(source_ws, target_ws):
+    """逐单元格复制值、样式、合并单元格及行列尺寸"""
+    from openpyxl.utils import get_column_letter
+
     for row in source_ws.iter_rows():
         for cell in row:
             new_cell = target_ws.cell(row=cell.row, column=cell.column, value=cell.value)
@@ -78,4 +103,156 @@ def clone_sheet(source_ws, target_wb, new_title):
         if source_ws.row_dimensions[row].height:
             target_ws.row_dimensions[row].height = source_ws.row_dimensions[row].height
 
-    return target_ws
\ No newline at end of file
+
+class SheetPlan:
+    """编译后的工作表模板：单元格值、去重后的样式表、合并单元格及行列尺寸
+
+    样式在每个目标工作簿中只注册一次，之后每张新工作表直接复用已注册的样式索引。
+    """
+
+    def __init__(self, cells, styles, merges, column_widths, row_heights):
+        self.cells = cells                  # [(row, column, value, style_idx, is_merged)]
+        self.styles = styles                # [(font, border, fill, number_format, protection, alignment)]
+        self.merges = merges                # ["A1:B2", ...]
+        self.column_widths = column_widths  # [(列字母, 宽度)]
+        self.row_heights = row_heights      # [(行号, 高度)]
+        self._bound_wb = None
+        self._bound_styles = None
+
+    def __getstate__(self):
+        # 已注册到某个工作簿的样式不随 pickle 传递（例如传给子进程）
+        state = self.__dict__.copy()
+        state["_bound_wb"] = state["_bound_styles"] = None
+        return state
+
+    def to_json(self):
+        """可写成 JSON 的数据（见 core.template_plan 的磁盘缓存）：样式保存为 xlsx 样式表中的 XML 片段
+
+        单元格值只能是文本、数字、布尔值或空，否则抛出 TypeError。
+        """
+        from openpyxl.xml.functions import tostring
+
+        for _, _, value, _, _ in self.cells:
+            if value is not None and not isinstance(value, (str, int, float, bool)):
+                raise TypeError(f"无法保存的单元格值：{value!r}")
+        return {
+            "cells": [list(cell) for cell in self.cells],
+            "styles": [[tostring(font.to_tree()).decode("utf-8"), tostring(border.to_tree()).decode("utf-8"),
+                        tostring(fill.to_tree()).decode("utf-8"), number_format,
+                        tostring(protection.to_tree()).decode("utf-8"), tostring(alignment.to_tree()).decode("utf-8")]
+                       for font, border, fill, number_format, protection, alignment in self.styles],
+            "merges": self.merges,
+            "column_widths": [list(item) for item in self.column_widths],
+            "row_heights": [list(item) for item in self.row_heights],
+        }
+
+    @classmethod
+    def from_json(cls, data):
+        from openpyxl.xml.functions import fromstring
+        from openpyxl.styles import Font, Border, Protection, Alignment
+        from openpyxl.styles.fills import Fill
+
+        styles = [(Font.from_tree(fromstring(font)), Border.from_tree(fromstring(border)),
+                   Fill.from_tree(fromstring(fill)), number_format, Protection.from_tree(fromstring(protection)),
+                   Alignment.from_tree(fromstring(alignment)))
+                  for font, border, fill, number_format, protection, alignment in data["styles"]]
+        return cls([tuple(cell) for cell in data["cells"]], styles, list(data["merges"]),
+                   [tuple(item) for item in data["column_widths"]], [tuple(item) for item in data["row_heights"]])
+
+    @classmethod
+    def from_worksheet(cls, ws):
+        from openpyxl.cell.cell import MergedCell
+
+        wb = ws.parent
+        cells = []
+        styles = []
+        style_index = {}
+        for (row, col), cell in sorted(ws._cells.items()):
+            style_idx = None
+            if cell.has_style:
+                key = tuple(cell._style)
+                style_idx = style_index.get(key)
+                if style_idx is None:
+                    style_idx = style_index[key] = len(styles)
+                    styles.append((
+                        wb._fonts[cell._style.fontId], wb._borders[cell._style.borderId],
+                        wb._fills[cell._style.fillId], cell.number_format,
+                        wb._protections[cell._style.protectionId],
+                        wb._alignments[cell._style.alignmentId],
+                    ))
+            cells.append((row, col, cell.value, style_idx, isinstance(cell, MergedCell)))
+
+        merges = [str(merged_range) for merged_range in ws.merged_cells]
+        column_widths = [(letter, dim.width) for letter, dim in ws.column_dimensions.items() if dim.width]
+        row_heights = [(row, dim.height) for row, dim in ws.row_dimensions.items() if dim.height]
+        return cls(cells, styles, merges, column_widths, row_heights)
+
+    def styles_for(self, ws):
+        """返回已在 ws 所属工作簿中注册的样式数组（每个工作簿只注册一次）"""
+        wb = ws.parent
+        bound = self._bound_wb() if self._bound_wb is not None else None
+        if bound is not wb:
+            from openpyxl.cell.cell import Cell
+
+            registered = []
+            for font, border, fill, number_format, protection, alignment in self.styles:
+                cell = Cell(ws)
+                cell.font = font
+                cell.border = border
+                cell.fill = fill
+                cell.number_format = number_format
+                cell.protection = protection
+                cell.alignment = alignment
+                registered.append(cell._style)
+            self._bound_wb = weakref.ref(wb)
+            self._bound_styles = registered
+        return self._bound_styles
+
+
+def compile_sheet(source_ws):
+    """将模板工作表编译为可重复使用的 SheetPlan（仅需执行一次）"""
+    from openpyxl import Workbook
+
+    with stage("compile_template"):
+        scratch_ws = Workbook().active
+        _copy_sheet(source_ws, scratch_ws)
+        return SheetPlan.from_worksheet(scratch_ws)
+
+def stamp_sheet(plan, target_wb, new_title):
+    """按编译好的 SheetPlan 在目标工作簿中新建工作表"""
+    from openpyxl.cell.cell import Cell, MergedCell
+    from openpyxl.styles.cell_style import StyleArray
+    from openpyxl.worksheet.merge import MergedCellRange
+
+    target_ws = target_wb.create_sheet(title=new_title)
+    styles = plan.styles_for(target_ws)
+    cells = target_ws._cells
+    for row, col, value, style_idx, is_merged in plan.cells:
+        if is_merged:
+            cell = MergedCell(target_ws, row=row, column=col)
+        else:
+            cell = Cell(target_ws, row=row, column=col, value=value)
+        if style_idx is not None:
+            cell._style = StyleArray(styles[style_idx])
+        cells[(row, col)] = cell
+
+    for coord in plan.merges:
+        target_ws.merged_cells.add(MergedCellRange(target_ws, coord))
+
+    for col_letter, width in plan.column_widths:
+        target_ws.column_dimensions[col_letter].width = width
+
+    for row, height in plan.row_heights:
+        target_ws.row_dimensions[row].height = height
+
+    return target_ws
+
+def clone_sheet(source_ws, target_wb, new_title, plan=None):
+    """克隆工作表（含格式）
+
+    批量克隆同一模板时，先用 compile_sheet 编译一次并通过 plan 传入。
+    """
+    if plan is None:
+        plan = compile_sheet(source_ws)
+    with stage("clone_sheet"):
+        return stamp_sheet(plan, target_wb, new_title)
@@ -0,0 +1,189 @@
+# core/validation.py
+"""生成前的台账校验与金额整理
+
+以前金额在渲染时逐个单元格解析，无法解析的金额静默地变成 0.00，Excel 与 PDF 对千分位逗号的
+处理也不一致（现在两者都使用 format_amount）。check_letters 在生成任何文件之前逐行检查整批
+询证函（只遍历一次，不保留询证函）：
+
+- 应收帐款、长期应收款、合计三列解析为数值（允许千分位逗号，空白为 0），格式化为 "1,234.56"；
+- 合计应等于应收帐款与长期应收款之和（按分比较）；
+- 工作表名称不能含 Excel 不允许的字符；截断到 31 个字符后不能与前面的行重名（Excel 不区分大小写，
+  重名的工作表会被改名）；转换为 PDF 文件名后不能与前面的行重名（后面的行会覆盖前面的单份 PDF）。
+
+format_letters 整理后的询证函中金额为 FormattedAmount，生成器原样使用，不再逐个解析。
+"""
+import math
+import re
+
+from core.letters import Letter, LetterBatch, ROW_FIELDS, iter_letters, pdf_file_name
+from core.ledger import REQUIRED_COLUMNS
+
+AMOUNT_FIELDS = ("receivable", "long_term", "total")
+# 字段名 -> 台账列名（用于问题报告）
+COLUMN_TITLES = dict(zip(ROW_FIELDS, REQUIRED_COLUMNS))
+# 与 openpyxl.workbook.child.INVALID_TITLE_REGEX 相同
+INVALID_TITLE_REGEX = re.compile(r'[\\*?:/\[\]]')
+SHEET_TITLE_LENGTH = 31
+
+
+class FormattedAmount(str):
+    """已校验并格式化的金额文本，format_amount 原样返回"""
+    __slots__ = ()
+
+
+class LedgerIssue:
+    """台账中的一处问题；row 为台账行号（不是从台账读取时为询证函序号，从 1 开始）"""
+    __slots__ = ("row", "column", "message")
+
+    def __init__(self, row, column, message):
+        self.row = row
+        self.column = column
+        self.message = message
+
+    def __str__(self):
+        return f"第 {self.row} 行 {self.column}：{self.message}"
+
+    def to_dict(self):
+        return {"row": self.row, "column": self.column, "message": self.message}
+
+
+class LedgerInvalid(ValueError):
+    """台账校验未通过；issues 为全部问题"""
+
+    # 异常信息中列出的问题数，其余只给出总数
+    SHOWN = 20
+
+    def __init__(self, issues):
+        self.issues = issues
+        lines = [str(issue) for issue in issues[:self.SHOWN]]
+        if len(issues) > self.SHOWN:
+            lines.append(f"……共 {len(issues)} 处问题")
+        super().__init__("台账校验未通过：\n" + "\n".join(lines))
+
+
+def parse_amount(text):
+    """金额文本转为数值：允许千分位逗号，空白为 0；无法解析（含 nan、inf）时返回 None"""
+    text = str(text).replace(",", "").strip()
+    if not text:
+        return 0.0
+    try:
+        value = float(text)
+    except ValueError:
+        return None
+    return value if math.isfinite(value) else None
+
+
+def format_amount(value):
+    """渲染用的金额文本 "1,234.56"：FormattedAmount 原样返回，无法解析时为 0.00（未校验时的旧行为）"""
+    if isinstance(value, FormattedAmount):
+        return str(value)
+    if value is None:
+        return "0.00"
+    return f"{parse_amount(value) or 0:,.2f}"
+
+
+def _cents(value):
+    return round(value * 100)
+
+
+def _one_shot(data_list):
+    """data_list 只能遍历一次（生成器，或 letters 为生成器的 LetterBatch）"""
+    letters = data_list.letters if isinstance(data_list, LetterBatch) else data_list
+    return iter(letters) is letters
+
+
+def check_letters(data_list):
+    """遍历一次整批询证函，返回按行号排序的问题列表
+
+    不保留询证函：只保存截断后的工作表名称和 PDF 文件名（用于查重）及问题本身，
+    因此可以直接校验逐行读取的台账（例如 core.ledger.read_letters 的结果）。
+    """
+    column = COLUMN_TITLES["sheet_name"]
+    titles = {}
+    file_names = {}
+    issues = []
+    for i, letter in enumerate(iter_letters(data_list), 1):
+        row = letter.row or i
+
+        # 金额三列
+        amounts = [parse_amount(getattr(letter, field)) for field in AMOUNT_FIELDS]
+        for field, value in zip(AMOUNT_FIELDS, amounts):
+            if value is None:
+                issues.append(LedgerIssue(row, COLUMN_TITLES[field], f"无法识别的金额：{getattr(letter, field)}"))
+        receivable, long_term, total = amounts
+        if None not in amounts and _cents(total) != _cents(receivable) + _cents(long_term):
+            issues.append(LedgerIssue(
+                row, COLUMN_TITLES["total"],
+                f"合计 {total:,.2f} 不等于应收帐款与长期应收款之和 {receivable + long_term:,.2f}"))
+
+        # 工作表名称与 PDF 文件名
+        match = INVALID_TITLE_REGEX.search(letter.sheet_name)
+        if match:
+            issues.append(LedgerIssue(row, column, f"工作表名称不能包含字符 {match.group(0)}：{letter.sheet_name}"))
+        title = letter.sheet_name[:SHEET_TITLE_LENGTH].lower()
+        if title in titles:
+            issues.append(LedgerIssue(
+                row, column, f"截断为 {SHEET_TITLE_LENGTH} 个字符后与第 {titles[title]} 行的工作表重名：{letter.sheet_name}"))
+        else:
+            titles[title] = row
+        file_name = pdf_file_name(letter.sheet_name).lower()
+        if file_name in file_names:
+            issues.append(LedgerIssue(
+                row, column, f"PDF 文件名与第 {file_names[file_name]} 行相同：{pdf_file_name(letter.sheet_name)}"))
+        else:
+            file_names[file_name] = row
+    issues.sort(key=lambda issue: issue.row)
+    return issues
+
+
+def _formatted(letter):
+    amounts = (FormattedAmount(f"{parse_amount(getattr(letter, field)) or 0:,.2f}") for field in AMOUNT_FIELDS)
+    return Letter(letter.header, letter.sheet_name, letter.number, letter.unit, letter.project, *amounts,
+                  row=letter.row)
+
+
+class _FormattedLetters:
+    """遍历时逐项整理金额；原序列可以再次遍历时这里也可以"""
+
+    def __init__(self, letters):
+        self._letters = letters
+
+    def __iter__(self):
+        return map(_formatted, iter_letters(self._letters))
+
+    def __len__(self):
+        return len(self._letters)
+
+
+def format_letters(data_list):
+    """金额整理为 FormattedAmount 的 LetterBatch（无法解析的金额为 0.00），遍历时才逐项整理"""
+    if isinstance(data_list, LetterBatch):
+        header = data_list.header
+    elif _one_shot(data_list):
+        header = None
+    else:
+        header = next((letter.header for letter in iter_letters(data_list)), None)
+    return LetterBatch(header, _FormattedLetters(data_list))
+
+
+def validate_letters(data_list):
+    """校验并整理整批询证函，返回 (LetterBatch, 问题列表)
+
+    data_list 可以是 LetterBatch、Letter 的序列或旧格式的数据字典列表。可以再次遍历时
+    （例如内存中的列表）先由 check_letters 遍历一次校验，返回的 LetterBatch 遍历时再逐项整理；
+    只能遍历一次时（例如 core.ledger.read_letters 的结果）先全部读入内存。逐行读取的大台账
+    应分别调用 check_letters 和 format_letters，各读一遍台账（见 cli.py）。
+    有问题时金额无法解析的行按 0.00 整理，调用方通常应在问题列表不为空时停止生成。
+    """
+    if _one_shot(data_list):
+        data_list = (LetterBatch(data_list.header, list(data_list)) if isinstance(data_list, LetterBatch)
+                     else LetterBatch.from_dicts(data_list))
+    return format_letters(data_list), check_letters(data_list)
+
+
+def checked_letters(data_list):
+    """validate_letters 的结果（data_list 只能遍历一次时同样先全部读入内存）；有问题时抛出 LedgerInvalid"""
+    batch, issues = validate_letters(data_list)
+    if issues:
+        raise LedgerInvalid(issues)
+    return batch
@@ -0,0 +1,49 @@
+# core/worker.py
+"""后台生成线程
+
+生成询证函可能需要几十秒，放在界面线程中执行会使窗口失去响应。GenerationWorker 在
+QThread 中执行 task(progress)，通过信号把进度和结果送回界面线程（信号跨线程时自动排队）。
+"""
+import time
+
+from PyQt6.QtCore import QThread, pyqtSignal
+
+from core.progress import Progress, Cancelled
+
+# 进度信号的最小间隔（秒），避免每份询证函都刷新一次界面
+PROGRESS_INTERVAL = 0.05
+
+
+class GenerationWorker(QThread):
+    progress_changed = pyqtSignal(int, int)   # done, total（total 为 0 表示总数未知）
+    succeeded = pyqtSignal(str)
+    failed = pyqtSignal(str)
+    cancelled = pyqtSignal()
+
+    def __init__(self, task, result="", parent=None):
+        """task(progress) 执行生成；成功时发出 succeeded(result)"""
+        super().__init__(parent)
+        self.task = task
+        self.result = result
+        self.progress = Progress(self._report)
+        self._last_report = 0.0
+
+    def _report(self, done, total):
+        now = time.monotonic()
+        if done == 0 or done == total or now - self._last_report >= PROGRESS_INTERVAL:
+            self._last_report = now
+            self.progress_changed.emit(done, total or 0)
+
+    def cancel(self):
+        """可在界面线程中调用；生成器在处理完当前这份询证函后停止"""
+        self.progress.cancel()
+
+    def run(self):
+        try:
+            self.task(self.progress)
+        except Cancelled:
+            self.cancelled.emit()
+        except Exception as e:
+            self.failed.emit(str(e))
+        else:
+            self.succeeded.emit(self.result)
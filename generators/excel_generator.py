@@ -1,49 +1,129 @@
 # generators/excel_generator.py
-from openpyxl import load_workbook, Workbook
+import os
+from openpyxl import Workbook
+from openpyxl.cell.cell import Cell
+from openpyxl.styles.cell_style import StyleArray
+from openpyxl.utils import column_index_from_string
+from openpyxl.utils.cell import coordinate_from_string
+from openpyxl.worksheet.cell_range import MultiCellRange
 
 # 绝对导入 core 包中的 utils
-from core.utils import clone_sheet
+from core.utils import stamp_sheet
+from core.letters import iter_letters, letter_count
+from core.template_plan import load_template_plan
+from core.instrument import stage
 
-def generate_excel(data_list, template_path, output_path):
-    template_wb = load_workbook(template_path)
-    template_ws = template_wb.active
+def generate_excel(data_list, template_path, output_path, streaming=False, backend="openpyxl", progress=None):
+    """生成询证函工作簿
+
+    streaming=True 时使用只写模式：每张工作表填写完成后立即写出到临时文件，
+    内存占用与询证函数量无关，适合上万行的台账。
+    backend="xml" 时改用 xml_excel_generator 直接拼装 xlsx 包，输出内容一致。
+    data_list 为 LetterBatch 或 Letter 序列（也接受旧格式的数据字典列表）。
+    progress 为 core.progress.Progress：每写完一张工作表前进一步，取消时抛出 Cancelled。
+    """
+    if backend == "xml":
+        from generators.xml_excel_generator import generate_excel_xml
+        return generate_excel_xml(data_list, template_path, output_path, progress=progress)
+    if backend != "openpyxl":
+        raise ValueError(f"未知的 Excel 后端：{backend}")
+
+    if streaming:
+        if progress is not None:
+            progress.begin(letter_count(data_list))
+        # 模板编译结果缓存在内存和磁盘中，之后每份询证函直接按计划生成
+        with stage("template_load"):
+            plan = load_template_plan(template_path)
+        return _generate_excel_streaming(iter_letters(data_list), plan, output_path, progress)
+
+    new_wb = build_workbook(data_list, template_path, progress)
+    with stage("excel_save"):
+        new_wb.save(output_path)
+    return output_path
+
+def build_workbook(data_list, template_path, progress=None):
+    """在内存中构建询证函工作簿（不保存），每份询证函一张由模板克隆的工作表"""
+    if progress is not None:
+        progress.begin(letter_count(data_list))
+    # 模板编译结果缓存在内存和磁盘中，之后每份询证函直接按计划生成
+    with stage("template_load"):
+        plan = load_template_plan(template_path)
 
     new_wb = Workbook()
     new_wb.remove(new_wb.active)
 
-    for data in data_list:
-        sheet_name = data['sheet_name'][:31]
-        ws = clone_sheet(template_ws, new_wb, sheet_name)
-
-        ws['D1'] = f"编号：{data['number']}"
-        ws['A3'] = data['unit']
-        ws['A4'] = (
-            f"    我公司承担的{data['project']}项目，已完成了合同约定的相应工作，我公司核算截止到该项目{data['season']}计价，"
-            f"债权记录截止到{data['date']}尚有下表列示数据未收到，请贵公司核对，如与贵单位记录相符，请在本函下端“信息证明无误”处签章证明；"
-            f"如有不符，请在“信息不符”处列明不符金额"
-        )
-
-        def clean_val(val):
-            if val == "" or val is None:
-                return "0.00"
-            try:
-                num = float(str(val).replace(',', ''))
-                return f"{num:,.2f}"
-            except:
-                return "0.00"
-
-        ws['C13'] = clean_val(data['receivable'])
-        ws['C14'] = clean_val(data['long_term'])
-        ws['C16'] = clean_val(data['total'])
-
-        ws['A9'] = f"回函地址：{data['address']}    联系人：{data['contact']}"
-        ws['A10'] = f"电话：{data['phone']}"
-        ws['C10'] = f"邮箱：{data['email']}"
-        ws['B19'] = data['issuer']
-        ws['D20'] = data['date']
-        ws['B13'] = data['date']
-        ws['B14'] = data['date']
-        ws['A29'] = f"3.备注：（如果截止{data['date']}日后情况有变化，请在此列明最新情况）"
-
-    new_wb.save(output_path)
-    return output_path
\ No newline at end of file
+    for i, data in enumerate(iter_letters(data_list)):
+        with stage("excel_letter", i):
+            sheet_name = data.sheet_name[:31]
+            with stage("clone_sheet"):
+                ws = stamp_sheet(plan.sheet, new_wb, sheet_name)
+            for coord, value in plan.letter_cells(data).items():
+                ws[coord] = value
+        if progress is not None:
+            progress.step()
+    return new_wb
+
+def _generate_excel_streaming(data_list, plan, output_path, progress=None):
+    new_wb = Workbook(write_only=True)
+    try:
+        _write_sheets_streaming(new_wb, data_list, plan, progress)
+    except BaseException:
+        # 出错或取消时删除已写出的工作表临时文件（正常情况下由 save 清理）
+        for ws in new_wb.worksheets:
+            writer = getattr(ws, "_writer", None)
+            if writer is not None and os.path.exists(writer.out):
+                writer.cleanup()
+        raise
+    with stage("excel_save"):
+        new_wb.save(output_path)
+    return output_path
+
+def _write_sheets_streaming(new_wb, data_list, plan, progress):
+
+    # 按行整理模板单元格，填写时只替换询证函对应的单元格
+    template_rows = {}
+    for row, col, value, style_idx, _ in plan.sheet.cells:
+        template_rows.setdefault(row, {})[col] = (value, style_idx)
+
+    for i, data in enumerate(data_list):
+        with stage("excel_letter", i):
+            _write_sheet_streaming(new_wb, data, plan, template_rows)
+        if progress is not None:
+            progress.step()
+
+def _write_sheet_streaming(new_wb, data, plan, template_rows):
+    ws = new_wb.create_sheet(title=data.sheet_name[:31])
+    sheet = plan.sheet
+    styles = sheet.styles_for(ws)
+
+    # 列宽、行高必须在写入第一行之前设置
+    for col_letter, width in sheet.column_widths:
+        ws.column_dimensions[col_letter].width = width
+    for row, height in sheet.row_heights:
+        ws.row_dimensions[row].height = height
+
+    rows = {row: dict(cells) for row, cells in template_rows.items()}
+    for coord, value in plan.letter_cells(data).items():
+        col_letter, row = coordinate_from_string(coord)
+        col = column_index_from_string(col_letter)
+        style_idx = rows.get(row, {}).get(col, (None, None))[1]
+        rows.setdefault(row, {})[col] = (value, style_idx)
+
+    for row in range(1, max(rows, default=0) + 1):
+        cells = rows.get(row, {})
+        values = [None] * max(cells, default=0)
+        for col, (value, style_idx) in cells.items():
+            cell = Cell(ws, row=row, column=col, value=value)
+            if style_idx is not None:
+                cell._style = StyleArray(styles[style_idx])
+            values[col - 1] = cell
+        ws.append(values)
+
+    for coord in sheet.merges:
+        ws.merged_cells.add(coord)
+
+    # 立即写出该工作表，并释放保存时不再需要的行列尺寸与合并信息
+    ws.close()
+    ws.row_dimensions.clear()
+    ws.column_dimensions.clear()
+    ws.merged_cells = MultiCellRange()
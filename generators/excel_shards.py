@@ -0,0 +1,180 @@
+# generators/excel_shards.py
+"""分片输出询证函 Excel
+
+上千张工作表放在同一个工作簿中时，保存要几分钟，Excel 打开时也几乎卡死。分片输出按台账顺序
+把询证函切分为若干个工作簿（每个最多 shard_size 张工作表），多个进程同时生成和保存；
+output_path 处写出索引工作簿，列出每份询证函的编号、函证单位所在的分片文件和工作表。
+
+分片文件与索引放在同一文件夹：询证函.xlsx（索引）、询证函-01.xlsx、询证函-02.xlsx……
+archive=True 时改为把它们依次写入同一个 ZIP 包（询证函.zip），不在文件夹中留下单个文件。
+"""
+import os
+import logging
+from io import BytesIO
+from contextlib import closing
+
+from openpyxl import Workbook
+
+from core.letters import iter_letters
+from core.instrument import stage
+from generators import process_pool
+from generators.excel_generator import generate_excel
+from generators.xml_excel_generator import _SheetTitles
+from generators.write_behind import ArchiveWriter
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SHARD_SIZE = 500
+# 索引工作簿的列及列宽
+INDEX_COLUMNS = (("编号", 16), ("函证单位", 36), ("工作表名称", 24), ("文件", 20), ("工作表", 24))
+
+
+class _Continued:
+    """串行生成时把各分片的进度接续到同一个 Progress（分片内的 begin 不重新计数）"""
+
+    def __init__(self, progress):
+        self.progress = progress
+
+    def begin(self, total):
+        self.progress.check()
+
+    def step(self, count=1):
+        self.progress.step(count)
+
+
+def shard_paths(output_path, count):
+    """'询证函.xlsx' -> ['询证函-01.xlsx', '询证函-02.xlsx', ...]"""
+    base = output_path[:-len(".xlsx")] if output_path.endswith(".xlsx") else output_path
+    width = max(2, len(str(count)))
+    return [f"{base}-{n:0{width}d}.xlsx" for n in range(1, count + 1)]
+
+
+def archive_path(output_path):
+    """'询证函.xlsx' -> '询证函.zip'"""
+    base = output_path[:-len(".xlsx")] if output_path.endswith(".xlsx") else output_path
+    return f"{base}.zip"
+
+
+def _write_shard(letters, template_path, output_path, backend, progress=None):
+    """生成一个分片（可在子进程中执行）"""
+    generate_excel(letters, template_path, output_path, streaming=True, backend=backend,
+                   progress=progress or process_pool.worker_progress())
+
+
+def _shard_bytes(letters, template_path, backend, progress=None):
+    """在内存中生成一个分片，返回文件内容（可在子进程中执行）"""
+    buffer = BytesIO()
+    _write_shard(letters, template_path, buffer, backend, progress)
+    return buffer.getvalue()
+
+
+def write_index(output_path, shards, paths):
+    """写出索引工作簿：每份询证函一行，工作表名称与分片中的实际名称一致（截断、重名编号）"""
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet("索引")
+    for n, (_, width) in enumerate(INDEX_COLUMNS):
+        ws.column_dimensions[chr(ord("A") + n)].width = width
+    ws.append([title for title, _ in INDEX_COLUMNS])
+    for letters, path in zip(shards, paths):
+        titles = _SheetTitles()
+        file_name = os.path.basename(path)
+        for data in letters:
+            ws.append([data.number, data.unit, data.sheet_name, file_name, titles.add(data.sheet_name[:31])])
+    wb.save(output_path)
+
+
+def generate_excel_shards(data_list, template_path, output_path, shard_size=DEFAULT_SHARD_SIZE, workers=1,
+                          backend="openpyxl", progress=None, archive=False, compression="stored"):
+    """分片生成询证函 Excel，返回索引工作簿的路径（archive=True 时返回 ZIP 包的路径）
+
+    每个分片与 generate_excel(streaming=True) 的输出格式相同。workers > 1 时各分片在子进程中
+    生成，进程池无法启动时自动退回串行。progress 每写完一张工作表前进一步；出错或取消时
+    删除本次的全部分片和索引。
+
+    archive=True 时各分片和索引在内存中生成，按顺序写入 archive_path(output_path) 处的 ZIP 包
+    （generators.write_behind.ArchiveWriter，compression 为包内文件的压缩方式）。
+    """
+    if shard_size < 1:
+        raise ValueError("分片大小必须为正整数")
+    letters = list(iter_letters(data_list))
+    if not letters:
+        raise ValueError("没有可生成的询证函数据")
+    shards = [letters[i:i + shard_size] for i in range(0, len(letters), shard_size)]
+    paths = shard_paths(output_path, len(shards))
+    if archive:
+        return _generate_shards_archive(shards, template_path, output_path, paths, backend, workers, progress,
+                                        compression)
+
+    try:
+        pool = _start_pool(workers) if workers and workers > 1 and len(shards) > 1 else None
+        if progress is not None:
+            progress.begin(len(letters))
+        if pool is not None:
+            _write_shards_parallel(pool, shards, template_path, paths, backend, progress)
+        else:
+            for shard, path in zip(shards, paths):
+                _write_shard(shard, template_path, path, backend, _Continued(progress) if progress is not None else None)
+        with stage("excel_index"):
+            write_index(output_path, shards, paths)
+    except BaseException:
+        for path in paths + [output_path]:
+            if os.path.exists(path):
+                os.remove(path)
+        raise
+    return output_path
+
+
+def _start_pool(workers):
+    """启动进程池（见 process_pool.create_pool），无法启动时返回 None，由调用方改为串行"""
+    try:
+        return process_pool.create_pool(workers)
+    except process_pool.STARTUP_ERRORS as e:
+        logger.warning("无法启动多进程，改为串行生成 Excel：%s", e)
+        return None
+
+
+def _write_shards_parallel(started, shards, template_path, paths, backend, progress=None):
+    pool, counter, cancel_event = started
+    with pool:
+        futures = [pool.submit(_write_shard, shard, template_path, path, backend)
+                   for shard, path in zip(shards, paths)]
+        with stage("excel_shards"):
+            process_pool.wait_all(futures, counter, progress, cancel_event)
+
+
+def _generate_shards_archive(shards, template_path, output_path, paths, backend, workers, progress, compression):
+    letters = sum(map(len, shards))
+    target = archive_path(output_path)
+    pool = _start_pool(workers) if workers and workers > 1 and len(shards) > 1 else None
+    if progress is not None:
+        progress.begin(letters)
+    if pool is not None:
+        _archive_shards_parallel(pool, shards, template_path, output_path, paths, backend, workers, progress,
+                                 compression)
+        return target
+    with ArchiveWriter(target, compression) as files:
+        for shard, path in zip(shards, paths):
+            files.submit(path, _shard_bytes(shard, template_path, backend,
+                                            _Continued(progress) if progress is not None else None))
+        _archive_index(files, output_path, shards, paths)
+    return target
+
+
+def _archive_shards_parallel(started, shards, template_path, output_path, paths, backend, workers, progress,
+                             compression):
+    """子进程生成分片内容，主进程按顺序写入 ZIP 包；同时在处理中的分片不超过 workers 的两倍"""
+    pool, counter, cancel_event = started
+    items = ((shard, template_path, backend) for shard in shards)
+    with pool, ArchiveWriter(archive_path(output_path), compression) as files:
+        with stage("excel_shards"), closing(process_pool.ordered_map(pool, _shard_bytes, items, workers * 2, counter,
+                                                                     progress, cancel_event)) as results:
+            for path, data in zip(paths, results):
+                files.submit(path, data)
+        _archive_index(files, output_path, shards, paths)
+
+
+def _archive_index(files, output_path, shards, paths):
+    with stage("excel_index"):
+        buffer = BytesIO()
+        write_index(buffer, shards, paths)
+        files.submit(output_path, buffer.getvalue())
@@ -0,0 +1,184 @@
+# generators/font_cache.py
+"""进程级字体缓存
+
+fpdf 的 add_font 每次都会重新解析整个 TTF（cmap、字宽、字形编号），中文字体尤其耗时。
+这里每个进程只解析一次，并把解析结果序列化到配置目录，下次启动直接读取。
+每个 FPDF 实例仍然拥有独立的子集表和 TTFont 句柄（输出时 fpdf 会就地裁剪字体）。
+"""
+import os
+import copy
+import json
+import logging
+import threading
+from collections import defaultdict
+
+from fontTools import ttLib
+from fpdf.fonts import TTFFont, PDFFontDescriptor, SubsetMap
+from fpdf.enums import TextEmphasis, FontDescriptorFlags
+
+from core.utils import get_config_dir
+
+logger = logging.getLogger(__name__)
+
+CACHE_VERSION = 1
+
+_prototypes = {}
+_lock = threading.Lock()
+
+
+class _FontPrototype:
+    """一份字体文件解析后的只读数据，由同一进程内的所有 PDF 共享"""
+
+    def __init__(self, name, scale, up, ut, sp, ss, desc, cmap, glyph_ids, widths, default_width,
+                 has_notdef=True):
+        self.name = name
+        self.scale = scale
+        self.up = up
+        self.ut = ut
+        self.sp = sp
+        self.ss = ss
+        self.desc = desc
+        self.cmap = cmap
+        self.glyph_ids = glyph_ids
+        self.cw = defaultdict(lambda: default_width, widths)
+        self.default_width = default_width
+        # 缺少 .notdef 的字体需要 fpdf 在 TTFont 中补画字形，不能共享
+        self.has_notdef = has_notdef
+
+    @classmethod
+    def from_ttf_font(cls, font):
+        return cls(
+            font.name, font.scale, font.up, font.ut, font.sp, font.ss, font.desc,
+            font.cmap, font.glyph_ids, dict(font.cw), font.desc.missing_width,
+            has_notdef=".notdef" in font.ttfont.getGlyphOrder(),
+        )
+
+    def to_json(self):
+        desc = self.desc
+        return {
+            "version": CACHE_VERSION,
+            "name": self.name,
+            "has_notdef": self.has_notdef,
+            "metrics": [self.scale, self.up, self.ut, self.sp, self.ss],
+            "desc": [desc.ascent, desc.descent, desc.cap_height, desc.flags.value,
+                     desc.font_b_box, desc.italic_angle, desc.stem_v, desc.missing_width],
+            "glyphs": [[char, glyph, self.glyph_ids[char], self.cw[char]] for char, glyph in self.cmap.items()],
+        }
+
+    @classmethod
+    def from_json(cls, data):
+        if data.get("version") != CACHE_VERSION:
+            raise ValueError("字体缓存版本不匹配")
+        scale, up, ut, sp, ss = data["metrics"]
+        ascent, descent, cap_height, flags, font_b_box, italic_angle, stem_v, missing_width = data["desc"]
+        desc = PDFFontDescriptor(ascent, descent, cap_height, FontDescriptorFlags(flags),
+                                 font_b_box, italic_angle, stem_v, missing_width)
+        cmap = {}
+        glyph_ids = {}
+        widths = {}
+        for char, glyph, glyph_id, width in data["glyphs"]:
+            cmap[char] = glyph
+            glyph_ids[char] = glyph_id
+            widths[char] = width
+        return cls(data["name"], scale, up, ut, sp, ss, desc, cmap, glyph_ids, widths, desc.missing_width,
+                   has_notdef=data["has_notdef"])
+
+
+class _FontHost:
+    """TTFFont 构造时只需要 fonts 属性"""
+    fonts = {}
+
+
+def _cache_file(font_path):
+    stat = os.stat(font_path)
+    stem = os.path.splitext(os.path.basename(font_path))[0]
+    return get_config_dir() / "font_cache" / f"{stem}-{stat.st_size}-{int(stat.st_mtime)}.json"
+
+
+def _parse_prototype(font_path):
+    font = TTFFont(_FontHost(), font_path, "prototype", "")
+    prototype = _FontPrototype.from_ttf_font(font)
+    font.close()
+    return prototype
+
+
+def _load_prototype(font_path, disk_cache):
+    if not disk_cache:
+        return _parse_prototype(font_path)
+    cache_file = _cache_file(font_path)
+    try:
+        with open(cache_file, encoding="utf-8") as f:
+            return _FontPrototype.from_json(json.load(f))
+    except (OSError, ValueError, KeyError, TypeError):
+        pass
+
+    # 缓存不存在或已失效：完整解析一次并写入缓存
+    prototype = _parse_prototype(font_path)
+    tmp_file = cache_file.with_suffix(f".{os.getpid()}.tmp")
+    try:
+        cache_file.parent.mkdir(parents=True, exist_ok=True)
+        with open(tmp_file, "w", encoding="utf-8") as f:
+            json.dump(prototype.to_json(), f, ensure_ascii=False, separators=(",", ":"))
+        os.replace(tmp_file, cache_file)
+    except OSError as e:
+        logger.warning("无法写入字体缓存 %s: %s", cache_file, e)
+        if tmp_file.exists():
+            tmp_file.unlink()
+    return prototype
+
+
+def get_font_prototype(font_path, disk_cache=True):
+    """返回字体的共享解析结果（每个进程只加载一次）
+
+    disk_cache=False 时不读写配置目录中的缓存，完整解析字体（例如嵌入到不允许写文件的进程中）；
+    本进程已经加载过的字体直接返回。
+    """
+    font_path = os.path.abspath(font_path)
+    prototype = _prototypes.get(font_path)
+    if prototype is None:
+        with _lock:
+            prototype = _prototypes.get(font_path)
+            if prototype is None:
+                prototype = _prototypes[font_path] = _load_prototype(font_path, disk_cache)
+    return prototype
+
+
+def add_cached_font(pdf, family, font_path, subset_map=SubsetMap):
+    """与 pdf.add_font(family, "", font_path) 等价，但复用进程内已解析的字体数据
+
+    subset_map 为子集表的类型（默认与 fpdf 相同）。
+    """
+    prototype = get_font_prototype(font_path)
+    if not prototype.has_notdef:
+        pdf.add_font(family, "", font_path)
+        font = pdf.fonts[family.lower()]
+        if not isinstance(font.subset, subset_map):
+            font.subset = subset_map(font)
+            # fpdf 的 SubsetMap 构造时写入类级别缓存，输出时才清理；替换后不再输出，这里清理
+            SubsetMap.get_glyph.cache_clear()
+        return
+    fontkey = family.lower()
+    if fontkey in pdf.fonts:
+        return
+
+    font = TTFFont.__new__(TTFFont)
+    font.i = len(pdf.fonts) + 1
+    font.type = "TTF"
+    font.ttffile = font_path
+    font.fontkey = fontkey
+    # 输出时 fpdf 会就地裁剪 ttfont 并修改字体描述，因此这两项每个实例独立
+    font.ttfont = ttLib.TTFont(font_path, recalcTimestamp=False, fontNumber=0, lazy=True)
+    font.desc = copy.copy(prototype.desc)
+    font.scale = prototype.scale
+    font.cw = prototype.cw
+    font.cmap = prototype.cmap
+    font.glyph_ids = prototype.glyph_ids
+    font.missing_glyphs = []
+    font.name = prototype.name
+    font.up = prototype.up
+    font.ut = prototype.ut
+    font.sp = prototype.sp
+    font.ss = prototype.ss
+    font.emphasis = TextEmphasis.coerce("")
+    font.subset = subset_map(font)
+    pdf.fonts[fontkey] = font
@@ -0,0 +1,79 @@
+# generators/in_memory.py
+"""在内存中生成询证函：输出不经过文件系统（不写临时文件），不导入 Qt，可嵌入到其他 Python 进程中
+
+    from core.ledger import letters_from_records
+    from generators.in_memory import iter_letter_pdfs, excel_bytes
+
+    letters = letters_from_records(records, fields, "2025.9.30")
+    for letter_id, content in iter_letter_pdfs(letters):
+        ...
+    workbook = excel_bytes(letters_from_records(records, fields, "2025.9.30"))
+
+- iter_letter_pdfs 惰性地逐份产出 (letter_id, 单份 PDF 的内容)：每次排版 chunk 份，为这一组用到的
+  字形裁剪一次字体（沿用本进程上次裁剪的结果），内存中只保留一组。内容与 generate_pdfs 写出的
+  单份 PDF 相同。
+- write_excel 把工作簿写入可写的流（不要求支持 seek），excel_bytes 返回工作簿的内容。使用 xml 后端
+  逐张工作表写入流，内容与 generate_excel 相同（openpyxl 保存工作簿时总要写临时文件，这里不用）。
+- template 为模板路径或模板内容（bytes），默认为随程序发布的模板；编译结果只缓存在内存中，
+  不写入配置目录的模板缓存。
+
+台账记录不经过校验；需要时先调用 core.validation.checked_letters（会把全部记录读入内存），记录可以
+再次遍历时也可以先用 check_letters 校验，再把 format_letters 的结果交给这里。
+只读取模板和随程序发布的字体文件。字体的解析结果默认只保存在本进程内存中（每个进程多花一次解析
+字体的时间）；iter_letter_pdfs(..., font_disk_cache=True) 时与其他入口一样读写配置目录中的字体缓存。
+"""
+from io import BytesIO
+from operator import attrgetter
+
+from core.letters import iter_letters
+from core.utils import get_default_template_path
+from core.instrument import stage
+from generators import process_pool
+from generators.xml_excel_generator import generate_excel_xml
+from generators.pdf_generator import render_letter, load_fonts, _covering_fonts, _letter_pdf
+
+# iter_letter_pdfs 每次排版的份数：越大裁剪字体的次数越少，第一份产出得越晚
+PDF_CHUNK = 20
+
+
+def iter_letter_pdfs(data_list, key=attrgetter("sheet_name"), chunk=PDF_CHUNK, font_disk_cache=False):
+    """逐份产出 (key(询证函), 单份 PDF 的内容)，letter_id 默认为工作表名称
+
+    data_list 为 LetterBatch 或 Letter 序列（也接受旧格式的数据字典列表），可以是惰性的。
+    font_disk_cache=True 时使用配置目录中的字体缓存（读写文件），默认只在内存中解析字体。
+    """
+    load_fonts(disk_cache=font_disk_cache)
+    n = 0
+    for letters in process_pool.chunked(iter_letters(data_list), chunk):
+        rendered = []
+        glyphs = {}
+        for data in letters:
+            with stage("pdf_render", n + len(rendered)):
+                pages, used = render_letter(data)
+            rendered.append((data, pages, used))
+            for index, font_glyphs in used.items():
+                glyphs.setdefault(index, {}).update(font_glyphs)
+        fonts = _covering_fonts(glyphs)
+        for data, pages, used in rendered:
+            with stage("pdf_write", n):
+                content = _letter_pdf(pages, used, fonts)
+            n += 1
+            yield key(data), content
+
+
+def _template_content(template):
+    if isinstance(template, bytes):
+        return template
+    with open(template or get_default_template_path(), "rb") as f:
+        return f.read()
+
+
+def write_excel(data_list, stream, template=None):
+    """把询证函工作簿写入可写的二进制流 stream，返回 stream"""
+    generate_excel_xml(data_list, _template_content(template), stream)
+    return stream
+
+
+def excel_bytes(data_list, template=None):
+    """询证函工作簿的内容"""
+    return write_excel(data_list, BytesIO(), template).getvalue()
@@ -1,102 +1,165 @@
 # generators/pdf_generator.py
 import os
+import json
+import pickle
+import hashlib
+import itertools
+import logging
+import tempfile
+from io import BytesIO
+from functools import partial
+from contextlib import closing
 from fpdf import FPDF
 
+from core.letters import (Letter, LetterHeader, ROW_FIELDS, HEADER_FIELDS, iter_letters, letter_count,
+                          pdf_file_name)
+from core.template_plan import letter_texts
+from core.instrument import stage
+from generators.font_cache import add_cached_font, get_font_prototype
+from generators.pdf_writer import GlyphIdSubsetMap, EmbeddedFont, PDFStreamWriter
+from generators import pdf_manifest, process_pool
+from generators.pdf_manifest import PDFManifest
+from generators.write_behind import WriteBehind, ArchiveWriter
+
+logger = logging.getLogger(__name__)
+
+def font_files():
+    """排版用的字体 {字体名: 字体文件}，只包含存在的文件"""
+    # 使用相对路径访问字体文件
+    font_dir = os.path.join(os.path.dirname(__file__), "..", "assets", "fonts")
+    fonts = {
+        "AlibabaPuHuiTi-M": os.path.join(font_dir, "AlibabaPuHuiTi-3-65-Medium.ttf"),
+        "AlibabaPuHuiTi-L": os.path.join(font_dir, "AlibabaPuHuiTi-3-45-Light.ttf"),
+    }
+    return {family: path for family, path in fonts.items() if os.path.exists(path)}
+
+def load_fonts(disk_cache=True):
+    """预先加载排版用的字体（之后本进程的排版直接使用）；disk_cache=False 时不读写配置目录中的字体缓存"""
+    for font_path in font_files().values():
+        get_font_prototype(font_path, disk_cache)
+
 class InquiryPDF(FPDF):
-    def __init__(self):
+    def __init__(self, skeleton=None):
         super().__init__()
-        # 使用相对路径访问字体文件
-        font_dir = os.path.join(os.path.dirname(__file__), "..", "assets", "fonts")
-        font_path = os.path.join(font_dir, "AlibabaPuHuiTi-3-65-Medium.ttf")
-        if os.path.exists(font_path):
-            self.add_font("AlibabaPuHuiTi-M", "", font_path, uni=True)
-        
-        font_path_light = os.path.join(font_dir, "AlibabaPuHuiTi-3-45-Light.ttf")
-        if os.path.exists(font_path_light):
-            self.add_font("AlibabaPuHuiTi-L", "", font_path_light, uni=True)
+        # 不为空时静态部分只引用预先绘制的表单（仅用于 pdf_writer 输出，fpdf 自身的 output 不支持）
+        self.skeleton = skeleton
+        # 字体数据按进程缓存，避免每份询证函重复解析中文字体；
+        # 固定 CID 的子集表使排版结果可以直接写入单份 PDF 和合并 PDF
+        for family, font_path in font_files().items():
+            add_cached_font(self, family, font_path, GlyphIdSubsetMap)
+
+    def used_glyphs(self):
+        return {font.i: font.subset.used_glyphs() for font in self.fonts.values()}
     
     def header(self):
+        if self.skeleton is not None:
+            self.skeleton.stamp(self, "Header")
+        else:
+            self.draw_header()
+
+    def draw_header(self):
         self.set_font("AlibabaPuHuiTi-M", "", 16)
         self.cell(0, 10, "对 账 函", border=0, align="C")
         self.ln(12)
 
-def format_currency(value):
-    try:
-        return f"{float(value):,.2f}"
-    except (ValueError, TypeError):
-        return "0.00"
-
 def generate_single_pdf_content(pdf, data):
-    """将单份询证函内容绘制到给定的 PDF 对象中（供单页或合并使用）"""
+    """将单份询证函内容绘制到给定的 PDF 对象中（供单页或合并使用）
+
+    pdf.skeleton 不为空时，各份相同的静态部分只引用预先绘制好的表单（见 LetterSkeleton），
+    这里只绘制随数据变化的文字。
+    """
+    texts = letter_texts(data)
     pdf.add_page()
     pdf.set_auto_page_break(auto=True, margin=15)
 
     # 抬头单位 + 冒号
     pdf.set_font("AlibabaPuHuiTi-M", size=12)
-    pdf.cell(0, 10, f"{data['unit']}：")
+    pdf.cell(0, 10, f"{texts['unit']}：")
     pdf.ln(10)
 
     # 正文（首行缩进：两个全角空格）
     pdf.set_font("AlibabaPuHuiTi-L", size=12)
-    text = f"\u3000\u3000我公司承担的{data['project']}项目，已完成了合同约定的相应工作，我公司核算截止到该项目{data['season']}计价，债权记录截止到{data['date']}尚有下表列示数据未收到，请贵公司核对，如与贵单位记录相符，请在本函下端“信息证明无误”处签章证明；如有不符，请在“信息不符”处列明不符金额。"
-    pdf.multi_cell(0, 6, text)
+    pdf.multi_cell(0, 6, f"\u3000\u3000{texts['body']}。")
     pdf.ln(5)
 
+    skeleton = getattr(pdf, "skeleton", None)
+    if skeleton is not None and skeleton.fits_body(pdf):
+        # 静态部分与可变文字交替引用，提取文字时的先后顺序与逐项绘制时相同
+        stamp = skeleton.body_stamper(pdf)
+        draw_letter_body(pdf, texts, static=False, before_variable=stamp)
+        stamp()
+    else:
+        # 剩余空间放不下时正常逐项绘制（期间可能自动分页）
+        draw_letter_body(pdf, texts)
+
+def draw_letter_body(pdf, texts, static=True, variable=True, before_variable=None):
+    """回函信息、往来账项表格、落款、结论及备注，各份的高度相同
+
+    texts 为 core.template_plan.letter_texts 的结果。
+    static 控制是否绘制各份相同的部分（固定文字和边框），variable 控制是否绘制随数据
+    变化的文字；不绘制的部分仍按原尺寸移动光标，因此两部分分开绘制时位置完全一致。
+    before_variable 不为空时在每项可变文字之前调用（LetterSkeleton 据此切分静态部分）。
+    """
+    def cell(w, h, text="", fixed=True, border=0, **kwargs):
+        if not fixed and before_variable is not None:
+            before_variable()
+        if not (static if fixed else variable):
+            text = ""
+        pdf.cell(w, h, text, border=border if static else 0, **kwargs)
+
     # 回函信息
     pdf.set_font("AlibabaPuHuiTi-M", size=12)
-    pdf.cell(0, 10, "回函请直接寄至：")
+    cell(0, 10, "回函请直接寄至：")
     pdf.ln(8)
     pdf.set_font("AlibabaPuHuiTi-L", size=12)
-    pdf.cell(0, 10, f"回函地址：{data['address']}    联系人：{data['contact']}")
+    cell(0, 10, f"回函地址：{texts['address']}    联系人：{texts['contact']}", fixed=False)
     pdf.ln(6)
-    pdf.cell(0, 10, f"电话：{data['phone']}    邮箱：{data['email']}")
+    cell(0, 10, f"电话：{texts['phone']}    邮箱：{texts['email']}", fixed=False)
     pdf.ln(10)
 
     # 表格标题
     pdf.set_font("AlibabaPuHuiTi-M", size=12)
-    pdf.cell(0, 10, "本单位与贵单位的往来账项列示如下：")
+    cell(0, 10, "本单位与贵单位的往来账项列示如下：")
     pdf.ln(0)
-    pdf.cell(0, 10, "单位：元", align="R")
+    cell(0, 10, "单位：元", align="R")
     pdf.ln(10)
 
     # 表格
     col_widths = [60, 30, 35, 35, 30]
     headers = ["本单位账户", "截止日期", "贵单位欠", "欠贵单位", "备 注"]
     for i, header in enumerate(headers):
-        pdf.cell(col_widths[i], 10, header, border=1, align="C")
+        cell(col_widths[i], 10, header, border=1, align="C")
     pdf.ln()
 
     pdf.set_font("AlibabaPuHuiTi-L", size=11)
-    receivable = format_currency(data['receivable'])
-    long_term = format_currency(data['long_term'])
-    total = format_currency(data['total'])
-
-    pdf.cell(col_widths[0], 10, "应收帐款（已开票末付款）", border=1)
-    pdf.cell(col_widths[1], 10, data['date'], border=1, align="C")
-    pdf.cell(col_widths[2], 10, receivable, border=1, align="R")
-    pdf.cell(col_widths[3], 10, "", border=1)
-    pdf.cell(col_widths[4], 10, "", border=1)
+    date = texts['date']
+
+    cell(col_widths[0], 10, "应收帐款（已开票末付款）", border=1)
+    cell(col_widths[1], 10, date, fixed=False, border=1, align="C")
+    cell(col_widths[2], 10, texts['receivable'], fixed=False, border=1, align="R")
+    cell(col_widths[3], 10, "", border=1)
+    cell(col_widths[4], 10, "", border=1)
     pdf.ln()
 
-    pdf.cell(col_widths[0], 10, "长期应收款（质量保金）", border=1)
-    pdf.cell(col_widths[1], 10, data['date'], border=1, align="C")
-    pdf.cell(col_widths[2], 10, long_term, border=1, align="R")
-    pdf.cell(col_widths[3], 10, "", border=1)
-    pdf.cell(col_widths[4], 10, "", border=1)
+    cell(col_widths[0], 10, "长期应收款（质量保金）", border=1)
+    cell(col_widths[1], 10, date, fixed=False, border=1, align="C")
+    cell(col_widths[2], 10, texts['long_term'], fixed=False, border=1, align="R")
+    cell(col_widths[3], 10, "", border=1)
+    cell(col_widths[4], 10, "", border=1)
     pdf.ln()
 
     pdf.set_font("AlibabaPuHuiTi-M", size=12)
-    pdf.cell(col_widths[0], 10, "合计", border=1)
-    pdf.cell(col_widths[1], 10, "", border=1)
-    pdf.cell(col_widths[2], 10, total, border=1, align="R")
-    pdf.cell(col_widths[3], 10, "", border=1)
-    pdf.cell(col_widths[4], 10, "", border=1)
+    cell(col_widths[0], 10, "合计", border=1)
+    cell(col_widths[1], 10, "", border=1)
+    cell(col_widths[2], 10, texts['total'], fixed=False, border=1, align="R")
+    cell(col_widths[3], 10, "", border=1)
+    cell(col_widths[4], 10, "", border=1)
     pdf.ln(30)
 
     # 落款（靠右）
-    pdf.cell(0, 10, data['issuer'], align="R")
+    cell(0, 10, texts['issuer'], fixed=False, align="R")
     pdf.ln(8)
-    pdf.cell(0, 10, data['date'], align="R")
+    cell(0, 10, date, fixed=False, align="R")
     pdf.ln(15)
 
     # ========== 结论部分（保持你现有逻辑）==========
@@ -118,50 +181,479 @@ def generate_single_pdf_content(pdf, data):
     ]
     line_height = 10
     box_height = len(left_lines) * line_height
-    pdf.cell(left_width, box_height, border=1, ln=False)
-    pdf.cell(right_width, box_height, border=1, ln=True)
+    cell(left_width, box_height, border=1, ln=False)
+    cell(right_width, box_height, border=1, ln=True)
     pdf.set_xy(pdf.l_margin, pdf.get_y() - box_height)
     for i, line in enumerate(left_lines):
         pdf.set_x(pdf.l_margin)
         if i == 0:
-            pdf.cell(left_width, line_height, line, border=0, ln=False)
+            cell(left_width, line_height, line, border=0, ln=False)
         else:
-            pdf.cell(left_width, line_height, line, border=0, align="R", ln=False)
+            cell(left_width, line_height, line, border=0, align="R", ln=False)
         pdf.set_x(pdf.l_margin + left_width)
-        pdf.cell(right_width, line_height, right_lines[i], border=0, align="R" if i > 0 else "L", ln=True)
+        cell(right_width, line_height, right_lines[i], border=0, align="R" if i > 0 else "L", ln=True)
 
-    remark_text = f"3.备注：（如果截止{data['date']}日后情况有变化，请在此列明最新情况）"
     remark_lines = [
-        remark_text,
+        texts['remark'],
         "(盖章)              ",
         "年       月       日",
         "经办人：          "
     ]
     remark_box_height = len(remark_lines) * line_height
-    pdf.cell(total_width, remark_box_height, border=1, ln=True)
+    cell(total_width, remark_box_height, border=1, ln=True)
     pdf.set_xy(pdf.l_margin, pdf.get_y() - remark_box_height)
     for i, line in enumerate(remark_lines):
         if i == 0:
-            pdf.cell(total_width, line_height, line, border=0, ln=True)
+            cell(total_width, line_height, line, fixed=False, border=0, ln=True)
         else:
-            pdf.cell(total_width, line_height, line, border=0, align="R", ln=True)
+            cell(total_width, line_height, line, border=0, align="R", ln=True)
 
-def generate_pdfs(data_list, output_dir):
-    os.makedirs(output_dir, exist_ok=True)
+class LetterSkeleton:
+    """各份询证函相同的静态部分：抬头，以及回函信息之后的固定文字、表格边框、结论及备注框
+
+    每个进程只绘制一次，作为表单对象（Form XObject）写入 PDF；每页只引用表单，
+    可变文字另行绘制。表单内的文字编码使用固定 CID，可直接用于任意文件。
+    回函信息之后的部分在每项可变文字处切分为 Body0、Body1……，与可变文字交替引用。
+    """
 
-    # 1. 生成单个 PDF
-    for data in data_list:
-        safe_name = "".join(c for c in data['sheet_name'] if c.isalnum() or c in (' ', '-', '_')).rstrip()
-        if not safe_name:
-            safe_name = "询证函"
-        output_path = os.path.join(output_dir, f"{safe_name}.pdf")
+    def __init__(self):
         pdf = InquiryPDF()
-        generate_single_pdf_content(pdf, data)
-        pdf.output(output_path)
+        pdf.add_page()
+        pdf.set_auto_page_break(auto=True, margin=15)
+        # name -> (内容流, 绘制时的纵坐标, 高度)
+        self.forms = {"Header": self._capture(pdf, pdf.t_margin, pdf.draw_header)}
+        # 各段的表单名称，两项可变文字之间没有静态内容时为 None
+        self.body = []
+        self.body_y = pdf.t_margin + 12
+        pdf.set_xy(pdf.l_margin, self.body_y)
+        contents = pdf.pages[pdf.page].contents
+        cuts = [len(contents)]
+
+        def cut():
+            cuts.append(len(contents))
+            # 表单不继承页面上已选定的字体，每段绘制时须重新设置
+            pdf.current_font_is_set_on_page = False
+
+        pdf.current_font_is_set_on_page = False
+        draw_letter_body(pdf, letter_texts(_BLANK_LETTER), variable=False, before_variable=cut)
+        cuts.append(len(contents))
+        self.body_height = pdf.get_y() - self.body_y
+        for start, end in zip(cuts, cuts[1:]):
+            name = f"Body{len(self.body)}" if end > start else None
+            if name is not None:
+                self.forms[name] = (bytes(contents[start:end]), self.body_y, self.body_height)
+            self.body.append(name)
+        self.glyphs = pdf.used_glyphs()
+        self.k = pdf.k
+
+    @staticmethod
+    def _capture(pdf, y, draw):
+        pdf.set_xy(pdf.l_margin, y)
+        # 表单不继承页面上已选定的字体，绘制时须重新设置
+        pdf.current_font_is_set_on_page = False
+        contents = pdf.pages[pdf.page].contents
+        start = len(contents)
+        draw()
+        return bytes(contents[start:]), y, pdf.get_y() - y
+
+    def fits_body(self, pdf):
+        """当前页剩余空间能否放下回函信息之后的全部内容（放得下时逐项绘制也不会分页）"""
+        return pdf.get_y() + self.body_height <= pdf.page_break_trigger
+
+    def stamp(self, pdf, name, restore_y=False):
+        """在当前位置引用表单；restore_y 为 False 时光标移到表单之后，否则留在原处供绘制可变文字"""
+        _, y, height = self.forms[name]
+        dy = (y - pdf.get_y()) * self.k
+        pdf._out(f"q 1 0 0 1 0 {dy:.2f} cm /{name} Do Q")
+        if not restore_y:
+            pdf.set_xy(pdf.l_margin, pdf.get_y() + height)
+
+    def body_stamper(self, pdf):
+        """以当前位置为起点，返回依次引用回函信息之后各段表单的函数
+
+        在每项可变文字之前调用一次，绘制完全部可变文字后再调用一次引用最后一段。
+        """
+        segments = iter(self.body)
+        dy = (self.body_y - pdf.get_y()) * self.k
+
+        def stamp():
+            name = next(segments)
+            if name is not None:
+                pdf._out(f"q 1 0 0 1 0 {dy:.2f} cm /{name} Do Q")
+        return stamp
+
+    def xobjects(self):
+        """写入 PDF 的表单：{名称: 内容流}"""
+        return {name: contents for name, (contents, _, _) in self.forms.items()}
+
+_BLANK_LETTER = Letter(LetterHeader(*[""] * len(HEADER_FIELDS)), *[""] * len(ROW_FIELDS))
+_skeleton = None
+
+def letter_skeleton():
+    """返回本进程的静态部分（首次调用时绘制）"""
+    global _skeleton
+    if _skeleton is None:
+        _skeleton = LetterSkeleton()
+    return _skeleton
+
+# 修改询证函可变部分的版式时加一，使增量生成的缓存失效（静态部分和字体的变化会自动识别）
+LAYOUT_VERSION = 2
+
+def layout_hash():
+    """版式的哈希：版式版本、静态部分的表单和字体文件"""
+    skeleton = letter_skeleton()
+    digest = hashlib.sha256(str(LAYOUT_VERSION).encode("ascii"))
+    for name, contents in sorted(skeleton.xobjects().items()):
+        digest.update(name.encode("utf-8"))
+        digest.update(contents)
+    for font in InquiryPDF().fonts.values():
+        # 与字体缓存一样按文件大小和修改时间识别字体文件的变化
+        stat = os.stat(font.ttffile)
+        digest.update(json.dumps([os.path.basename(font.ttffile), stat.st_size, int(stat.st_mtime)]).encode("utf-8"))
+    return digest.hexdigest()
+
+def render_letter(data):
+    """排版一份询证函（只绘制一次），返回 (各页内容流, 用到的字形)"""
+    pdf = InquiryPDF(letter_skeleton())
+    generate_single_pdf_content(pdf, data)
+    for font in pdf.fonts.values():
+        if font.missing_glyphs:
+            missing = ", ".join(f"'{chr(x)}'" for x in font.missing_glyphs[:10])
+            logger.warning("字体 %s 缺少以下字符：%s", font.name, missing)
+    pages = [bytes(pdf.pages[n].contents) for n in range(1, pdf.pages_count + 1)]
+    return pages, pdf.used_glyphs()
+
+def _render_chunk(rows, spool_path, progress=None):
+    """排版一组询证函并顺序写入临时文件（可在子进程中执行），返回用到的全部字形"""
+    glyphs = {}
+    with open(spool_path, "wb") as f:
+        for i, (output_path, data) in enumerate(rows):
+            with stage("pdf_render", i):
+                pages, used = render_letter(data)
+            pickle.dump((output_path, pages, used), f, protocol=pickle.HIGHEST_PROTOCOL)
+            for index, font_glyphs in used.items():
+                glyphs.setdefault(index, {}).update(font_glyphs)
+            process_pool.step(progress)
+    return glyphs
+
+def _read_spool(spool_path):
+    with open(spool_path, "rb") as f:
+        while True:
+            try:
+                yield pickle.load(f)
+            except EOFError:
+                return
+
+def _embedded_fonts(glyphs):
+    """为整批用到的字形（含静态部分）各裁剪一份小字体，后续每份 PDF 都从它裁剪"""
+    skeleton_glyphs = letter_skeleton().glyphs
+    fonts = []
+    with stage("pdf_fonts"):
+        for font in InquiryPDF().fonts.values():
+            glyph_ids = {gid for gid, _, _ in glyphs.get(font.i, {}).values()}
+            glyph_ids.update(gid for gid, _, _ in skeleton_glyphs.get(font.i, {}).values())
+            fonts.append(EmbeddedFont.from_ttf_font(font, glyph_ids))
+    return fonts
+
+def _open_writer(output_path, fonts):
+    skeleton = letter_skeleton()
+    return PDFStreamWriter(output_path, fonts, InquiryPDF().default_page_dimensions,
+                           forms=skeleton.xobjects(), form_glyphs=skeleton.glyphs)
+
+def _letter_pdf(pages, used, fonts):
+    """单份 PDF 的文件内容（在内存中生成，由 WriteBehind 写出）"""
+    buffer = BytesIO()
+    with _open_writer(buffer, fonts) as writer:
+        writer.add_pages(pages, used)
+    return buffer.getvalue()
+
+# archive=True 时单份 PDF 写入输出目录中的这个 ZIP 包
+ARCHIVE_NAME = "询证函.zip"
 
-    # 2. 生成合并 PDF
-    merged_pdf = InquiryPDF()
-    for data in data_list:
-        generate_single_pdf_content(merged_pdf, data)
+def _letter_files(output_dir, archive=False, compression="stored"):
+    """写出单份 PDF 的后台线程：逐个写到输出目录（WriteBehind）或写入同一个 ZIP 包（ArchiveWriter）"""
+    if archive:
+        return ArchiveWriter(os.path.join(output_dir, ARCHIVE_NAME), compression)
+    return WriteBehind()
+
+def _write_letters(spool_path, fonts, keep, files, start=0, progress=None):
+    """由排版结果写出单份 PDF（可在子进程中执行），文件交给 files 的后台线程写出
+
+    keep 为需要写出单份 PDF 的行号（None 表示全部），start 为该临时文件第一行的行号。
+    """
+    with files:
+        for i, (output_path, pages, used) in enumerate(_read_spool(spool_path), start):
+            if keep is None or i in keep:
+                with stage("pdf_write", i):
+                    data = _letter_pdf(pages, used, fonts)
+                files.submit(output_path, data)
+            process_pool.step(progress)
+
+def _write_merged(spool_paths, fonts, output_path, progress=None):
+    """按台账顺序把全部页面流式写入合并 PDF，字体只嵌入一次（可在子进程中执行）"""
+    with stage("pdf_merge"), _open_writer(output_path, fonts) as writer:
+        for spool_path in spool_paths:
+            for _, pages, used in _read_spool(spool_path):
+                writer.add_pages(pages, used)
+                process_pool.step(progress)
+
+def _render_cached(rows, pages_dir, layout, progress=None):
+    """排版一组询证函并保存到增量缓存（可在子进程中执行）；rows 为 (哈希, 询证函)，layout 为版式哈希"""
+    for i, (letter_hash, data) in enumerate(rows):
+        with stage("pdf_render", i):
+            pages, used = render_letter(data)
+        pdf_manifest.store_pages(os.path.join(pages_dir, f"{letter_hash}.bin"), pages, used, letter_hash, layout)
+        process_pool.step(progress)
+
+def _cached_glyphs(pages_paths):
+    glyphs = {}
+    for pages_path in pages_paths:
+        for index, font_glyphs in pdf_manifest.load_glyphs(pages_path).items():
+            glyphs.setdefault(index, {}).update(font_glyphs)
+    return glyphs
+
+def _write_cached_letters(items, fonts, cache_dir, progress=None):
+    """由缓存的排版结果写出单份 PDF，每写完一份记入日志（可在子进程中执行）
+
+    items 为 (输出路径, 排版结果路径, 哈希)。文件由后台线程写出，写完后才记入日志。
+    """
+    with WriteBehind() as files:
+        for i, (output_path, pages_path, letter_hash) in enumerate(items):
+            pages, used = pdf_manifest.load_pages(pages_path)
+            with stage("pdf_write", i):
+                data = _letter_pdf(pages, used, fonts)
+            files.submit(output_path, data, partial(pdf_manifest.record_written, cache_dir, output_path, letter_hash))
+            process_pool.step(progress)
+
+def _write_cached_merged(pages_paths, fonts, output_path, progress=None):
+    """由缓存的排版结果按台账顺序写出合并 PDF（可在子进程中执行）"""
+    with stage("pdf_merge"), _open_writer(output_path, fonts) as writer:
+        for pages_path in pages_paths:
+            pages, used = pdf_manifest.load_pages(pages_path)
+            writer.add_pages(pages, used)
+            process_pool.step(progress)
+
+def _generate_pdfs_incremental(rows, last_row, merged_output, workers, progress=None):
+    """只排版哈希变化的询证函，只重写内容变化的单份 PDF，合并 PDF 由缓存的排版结果重建"""
+    manifest = PDFManifest(os.path.dirname(merged_output), layout_hash())
+
+    # 先计算全部哈希，得到需要排版和写出的份数
+    if progress is not None:
+        progress.begin(None)
+    letter_hashes = []
+    stale = {}
+    for _, data in rows:
+        letter_hash = manifest.letter_hash(data, ROW_FIELDS + HEADER_FIELDS)
+        letter_hashes.append(letter_hash)
+        if letter_hash not in stale and not manifest.has_pages(letter_hash):
+            stale[letter_hash] = data
+    if not letter_hashes:
+        return
+
+    files = {os.path.basename(path): letter_hashes[i] for path, i in last_row.items()}
+    to_write = [(path, manifest.pages_path(letter_hashes[i]), letter_hashes[i])
+                for path, i in last_row.items() if not manifest.is_current(path, letter_hashes[i])]
+    merged_hash = manifest.merged_hash(letter_hashes)
+    rebuild_merged = not manifest.has_merged(merged_output, merged_hash)
+    pages_paths = [manifest.pages_path(letter_hash) for letter_hash in letter_hashes]
+    if progress is not None:
+        progress.begin(len(stale) + len(to_write) + (len(pages_paths) if rebuild_merged else 0))
+
+    stale = list(stale.items())
+    if workers and workers > 1 and len(stale) + len(to_write) > 1:
+        pool = _start_pool(workers)
+        if pool is not None:
+            _generate_pdfs_incremental_parallel(pool, stale, to_write, pages_paths if rebuild_merged else None,
+                                                merged_output, manifest, workers, progress)
+            stale, to_write, rebuild_merged = [], [], False
+
+    _render_cached(stale, manifest.pages_dir, manifest.layout_hash, progress)
+    if to_write or rebuild_merged:
+        fonts = _embedded_fonts(_cached_glyphs(pages_paths if rebuild_merged else [p for _, p, _ in to_write]))
+        _write_cached_letters(to_write, fonts, manifest.cache_dir, progress)
+        if rebuild_merged:
+            _write_cached_merged(pages_paths, fonts, merged_output, progress)
+    manifest.save(files, merged_hash, letter_hashes)
+
+def _start_pool(workers):
+    """启动进程池（见 process_pool.create_pool），无法启动时返回 None，由调用方改为串行"""
+    try:
+        return process_pool.create_pool(workers)
+    except process_pool.STARTUP_ERRORS as e:
+        logger.warning("无法启动多进程，改为串行生成 PDF：%s", e)
+        return None
+
+def _generate_pdfs_incremental_parallel(started, stale, to_write, pages_paths, merged_output, manifest, workers,
+                                        progress=None):
+    """started 为 _start_pool 的返回值；pages_paths 为 None 时不重建合并 PDF"""
+    pool, counter, cancel_event = started
+    with pool:
+        if stale:
+            chunk_size = -(-len(stale) // min(len(stale), workers * 4))
+            futures = [pool.submit(_render_cached, stale[i:i + chunk_size], manifest.pages_dir, manifest.layout_hash)
+                       for i in range(0, len(stale), chunk_size)]
+            with stage("pdf_render"):
+                process_pool.wait_all(futures, counter, progress, cancel_event)
+        if not to_write and pages_paths is None:
+            return
+
+        fonts = _embedded_fonts(_cached_glyphs(pages_paths or [p for _, p, _ in to_write]))
+        futures = []
+        if pages_paths is not None:
+            # 合并 PDF 耗时最长，最先提交
+            futures.append(pool.submit(_write_cached_merged, pages_paths, fonts, merged_output))
+        if to_write:
+            chunk_size = -(-len(to_write) // min(len(to_write), workers * 4))
+            futures.extend(pool.submit(_write_cached_letters, to_write[i:i + chunk_size], fonts, manifest.cache_dir)
+                           for i in range(0, len(to_write), chunk_size))
+        with stage("pdf_write"):
+            process_pool.wait_all(futures, counter, progress, cancel_event)
+
+def generate_pdfs(data_list, output_dir, workers=1, progress=None, incremental=False, archive=False,
+                  compression="stored"):
+    """生成单份 PDF 及合并 PDF
+
+    每份询证函只排版一次：各页内容流先顺序写入临时文件，再分别写出单份 PDF 和合并 PDF。
+    合并 PDF 逐页写入磁盘，字体子集只嵌入一次，内存占用与台账行数无关。
+
+    workers > 1 时使用多进程流水线（见 _generate_pdfs_pipelined）：主进程边读台账边分块提交，
+    子进程排版并生成单份 PDF，主进程按台账顺序把它们交给后台线程写出并写入合并 PDF，因此
+    文件名和页序与串行结果一致。进程池无法启动时自动退回串行；开始生成后出错（例如磁盘已满）
+    不再退回串行，直接抛出。
+
+    单份 PDF 都在内存中生成后交给 generators.write_behind.WriteBehind 的后台线程写出（先写临时
+    文件再改名），输出到网络共享盘时排版不必等待每个文件的写入。
+
+    archive=True 时单份 PDF 不逐个写到输出目录，而是边生成边写入输出目录中的 ARCHIVE_NAME
+    （generators.write_behind.ArchiveWriter），合并 PDF 仍单独写出。包内同名的文件依次编号，
+    台账中的每一行都保留。compression 为包内文件的压缩方式："stored"（默认，PDF 本身已压缩）
+    或 "deflated"。全部写完后包才出现在输出目录中。不能与 incremental 同时使用。
+
+    data_list 为 LetterBatch 或 Letter 序列（也接受旧格式的数据字典列表），可以是惰性的
+    （例如 core.ledger.read_letters 的返回值）：边读边排版，台账数据不在内存中累积。
+
+    progress 为 core.progress.Progress：每份询证函依次排版、写出单份 PDF、写入合并 PDF，
+    共前进三步（总数为份数的三倍）。取消时抛出 Cancelled，已写完的单份 PDF 保留，
+    未写完的文件删除。
+
+    incremental=True 时在输出目录中保存清单和排版缓存（见 generators.pdf_manifest）：
+    只排版台账行、模板字段或版式有变化的询证函，只重写内容有变化或缺失的单份 PDF，
+    合并 PDF 由缓存的排版结果重建。中断后再次运行时从中断处继续。此时需要先读完台账
+    计算哈希，需要排版的询证函在内存中保留到排版完成。
+    """
+    if incremental and archive:
+        raise ValueError("增量生成不能输出 ZIP 包")
+    os.makedirs(output_dir, exist_ok=True)
     merged_output = os.path.join(output_dir, "询证函-合并.pdf")
-    merged_pdf.output(merged_output)
\ No newline at end of file
+
+    # 同名文件以台账中最后一行为准（与串行逐个覆盖的结果一致）；被覆盖的行只进入合并 PDF
+    last_row = {}
+
+    def iter_rows():
+        for i, data in enumerate(iter_letters(data_list)):
+            output_path = os.path.join(output_dir, pdf_file_name(data.sheet_name))
+            last_row[output_path] = i
+            yield output_path, data
+
+    rows = iter_rows()
+    if incremental:
+        _generate_pdfs_incremental(rows, last_row, merged_output, workers, progress)
+        return
+    count = letter_count(data_list)
+    open_files = partial(_letter_files, output_dir, archive, compression)
+    with tempfile.TemporaryDirectory(prefix="inquiry-pdf-") as tmp_dir:
+        pool = None
+        if workers and workers > 1 and (count is None or count > 1):
+            pool = _start_pool(workers)
+        if pool is not None:
+            if progress is not None:
+                progress.begin(3 * count if count is not None else None)
+            _generate_pdfs_pipelined(pool, rows, merged_output, workers, tmp_dir, open_files, progress)
+            return
+
+        # 串行时边读台账边排版，台账数据不在内存中累积
+        if progress is not None:
+            progress.begin(3 * count if count is not None else None)
+        spool_path = os.path.join(tmp_dir, "letters-0.bin")
+        glyphs = _render_chunk(rows, spool_path, progress)
+        if not last_row:
+            return
+        if progress is not None and progress.total is None:
+            # 惰性台账排版完才知道份数
+            progress.total = 3 * progress.done
+        fonts = _embedded_fonts(glyphs)
+        # 1. 生成单个 PDF
+        _write_letters(spool_path, fonts, None if archive else set(last_row.values()), open_files(),
+                       progress=progress)
+        # 2. 生成合并 PDF
+        _write_merged([spool_path], fonts, merged_output, progress)
+
+# 流水线中每块的份数：块越小写出越早开始，块越大进程间传输的开销越小
+PIPELINE_CHUNK = 20
+
+def _generate_pdfs_pipelined(started, rows, merged_output, workers, tmp_dir, open_files=WriteBehind, progress=None):
+    """多进程流水线：读台账、排版、写出同时进行
+
+    主进程边读台账边把每 PIPELINE_CHUNK 份提交给子进程，子进程排版并生成单份 PDF 的内容；
+    主进程按台账顺序取回结果，把单份 PDF 交给后台线程写出（同名时后面的行覆盖前面的），同时把
+    页面写入合并 PDF，合并 PDF 的字体在全部写完后按用到的字形裁剪。同时在处理中的块不超过
+    workers 的两倍，内存占用与台账行数无关。started 为 _start_pool 的返回值，open_files 返回写出
+    单份 PDF 的后台线程（见 _letter_files）。
+    """
+    pool, counter, cancel_event = started
+    chunks = ((chunk, os.path.join(tmp_dir, f"letters-{n}.bin"))
+              for n, chunk in enumerate(process_pool.chunked(rows, PIPELINE_CHUNK)))
+    with pool:
+        first = next(chunks, None)
+        if first is None:
+            return
+        chunks = itertools.chain([first], chunks)
+        with _open_writer(merged_output, None) as merged, open_files() as files:
+            # 主进程出错或被取消时 closing 关闭流水线，通知子进程停止
+            with closing(process_pool.ordered_map(pool, _render_chunk_letters, chunks, workers * 2, counter,
+                                                  progress, cancel_event)) as results:
+                for spool_path, written in results:
+                    for output_path, data in written:
+                        files.submit(output_path, data)
+                    with stage("pdf_merge"):
+                        for _, pages, used in _read_spool(spool_path):
+                            merged.add_pages(pages, used)
+                            if progress is not None:
+                                progress.step()
+                    os.remove(spool_path)
+            if progress is not None and progress.total is None:
+                progress.total = progress.done
+            merged.set_fonts(_embedded_fonts(merged.glyphs))
+
+def _render_chunk_letters(rows, spool_path, progress=None):
+    """排版一块询证函并生成单份 PDF 的内容（在子进程中执行）
+
+    返回 (排版结果的临时文件, [(输出路径, 单份 PDF 的内容)])，由主进程按顺序交给后台线程写出。
+    """
+    glyphs = _render_chunk(rows, spool_path, progress)
+    fonts = _covering_fonts(glyphs)
+    written = []
+    for n, (output_path, pages, used) in enumerate(_read_spool(spool_path)):
+        with stage("pdf_write", n):
+            written.append((output_path, _letter_pdf(pages, used, fonts)))
+        process_pool.step(progress)
+    return spool_path, written
+
+# 本进程上次裁剪的小字体：(已覆盖的字形, 字体)
+_covering = None
+
+def _covering_fonts(glyphs):
+    """覆盖 glyphs 的小字体：沿用本进程上次裁剪的结果，有新字形时按累计用到的字形重新裁剪
+
+    单份 PDF 的字体从任何覆盖其字形的小字体裁剪，结果都相同；同一批询证函用到的字基本一致，
+    每个进程通常只需裁剪一两次。
+    """
+    global _covering
+    union, fonts = _covering or ({}, None)
+    size = sum(map(len, union.values()))
+    for index, font_glyphs in glyphs.items():
+        union.setdefault(index, {}).update(font_glyphs)
+    if fonts is None or sum(map(len, union.values())) != size:
+        fonts = _embedded_fonts(union)
+    _covering = (union, fonts)
+    return fonts
@@ -0,0 +1,178 @@
+# generators/pdf_manifest.py
+"""增量生成 PDF 的清单与排版缓存
+
+输出目录下的 .inquiry-cache 目录保存：
+- manifest.json：单份 PDF 文件名 -> 写出时的询证函哈希，以及合并 PDF 的哈希；
+- pages/<哈希>.bin：每份询证函的排版结果，合并 PDF 由它们重建。第一行为 JSON 头（格式版本、
+  询证函哈希、版式哈希、用到的字形、各页长度），之后是各页内容流的原始字节。读取时校验头部
+  和长度，不符或无法解析时视为没有缓存，重新排版；
+- journal-<进程号>.jsonl：本次运行中已写完的单份 PDF，逐行追加。运行中断后下次启动时
+  读回，已写完的文件不再重写；运行完成后并入 manifest.json 并删除。
+
+询证函哈希由台账行、模板字段和版式（静态部分与字体文件）共同决定，任何一项变化都会重新排版。
+"""
+import os
+import json
+import glob
+import hashlib
+import logging
+
+from core.utils import write_atomic
+
+logger = logging.getLogger(__name__)
+
+CACHE_DIR_NAME = ".inquiry-cache"
+MANIFEST_VERSION = 1
+PAGES_VERSION = 1
+# 排版结果头部的最大长度，超过时视为损坏
+_MAX_HEADER = 1 << 20
+
+
+class PDFManifest:
+    def __init__(self, output_dir, layout_hash):
+        self.cache_dir = os.path.join(output_dir, CACHE_DIR_NAME)
+        self.pages_dir = os.path.join(self.cache_dir, "pages")
+        self.manifest_path = os.path.join(self.cache_dir, "manifest.json")
+        self.layout_hash = layout_hash
+        os.makedirs(self.pages_dir, exist_ok=True)
+
+        self.files = {}
+        self.merged = None
+        try:
+            with open(self.manifest_path, encoding="utf-8") as f:
+                data = json.load(f)
+            if data.get("version") == MANIFEST_VERSION:
+                self.files = data["files"]
+                self.merged = data["merged"]
+        except (OSError, ValueError, KeyError, TypeError):
+            pass
+        # 上次中断的运行已写完的单份 PDF
+        for journal in self._journals():
+            with open(journal, encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        name, letter_hash = json.loads(line)
+                    except ValueError:
+                        # 中断时最后一行可能不完整
+                        continue
+                    self.files[name] = letter_hash
+
+    def _journals(self):
+        return glob.glob(os.path.join(glob.escape(self.cache_dir), "journal-*.jsonl"))
+
+    def letter_hash(self, letter, fields):
+        """fields 为参与哈希的字段名（台账行与模板字段）"""
+        values = [self.layout_hash] + [getattr(letter, name) for name in fields]
+        return hashlib.sha256(json.dumps(values, ensure_ascii=False).encode("utf-8")).hexdigest()
+
+    @staticmethod
+    def merged_hash(letter_hashes):
+        return hashlib.sha256("\n".join(letter_hashes).encode("ascii")).hexdigest()
+
+    def is_current(self, output_path, letter_hash):
+        """单份 PDF 已按同一哈希写出且文件仍在"""
+        return self.files.get(os.path.basename(output_path)) == letter_hash and os.path.exists(output_path)
+
+    def has_merged(self, output_path, merged_hash):
+        return self.merged == merged_hash and os.path.exists(output_path)
+
+    def pages_path(self, letter_hash):
+        return os.path.join(self.pages_dir, f"{letter_hash}.bin")
+
+    def has_pages(self, letter_hash):
+        """排版结果存在且完整，按同一版式保存"""
+        pages_path = self.pages_path(letter_hash)
+        try:
+            with open(pages_path, "rb") as f:
+                header = _read_header(f, pages_path)
+            size = os.path.getsize(pages_path)
+        except FileNotFoundError:
+            return False
+        except (OSError, ValueError) as e:
+            logger.warning("增量缓存中的排版结果无效，重新排版：%s", e)
+            return False
+        if header["layout"] != self.layout_hash or size != header["size"]:
+            logger.warning("增量缓存中的排版结果无效，重新排版：%s 版式或长度不符", pages_path)
+            return False
+        return True
+
+    def save(self, files, merged, letter_hashes):
+        """运行完成：写入清单，删除日志和本次台账不再用到的排版结果"""
+        data = {"version": MANIFEST_VERSION, "layout": self.layout_hash, "files": files, "merged": merged}
+        write_atomic(self.manifest_path,
+                      lambda f: f.write(json.dumps(data, ensure_ascii=False, indent=1).encode("utf-8")))
+        self.files = files
+        self.merged = merged
+        for journal in self._journals():
+            os.remove(journal)
+        keep = {f"{letter_hash}.bin" for letter_hash in letter_hashes}
+        for name in os.listdir(self.pages_dir):
+            if name not in keep:
+                os.remove(os.path.join(self.pages_dir, name))
+
+
+def store_pages(pages_path, pages, used, letter_hash, layout_hash):
+    """保存一份询证函的排版结果（先写头部，读取字形时不必载入页面）"""
+    glyphs = {
+        str(index): [[char_id, gid, list(unicodes), width] for char_id, (gid, unicodes, width) in font_glyphs.items()]
+        for index, font_glyphs in used.items()
+    }
+    header = {"version": PAGES_VERSION, "hash": letter_hash, "layout": layout_hash, "glyphs": glyphs,
+              "pages": [len(page) for page in pages]}
+    line = json.dumps(header, ensure_ascii=False).encode("utf-8") + b"\n"
+
+    def write(f):
+        f.write(line)
+        for page in pages:
+            f.write(page)
+    write_atomic(pages_path, write)
+
+
+def _read_header(f, pages_path):
+    """读取并校验头部，返回 {"layout", "glyphs", "pages", "size"}；无效时抛出 ValueError"""
+    line = f.readline(_MAX_HEADER)
+    if not line.endswith(b"\n"):
+        raise ValueError(f"{pages_path} 头部不完整")
+    try:
+        header = json.loads(line)
+    except ValueError as e:
+        raise ValueError(f"{pages_path} 头部无法解析：{e}") from e
+    if not isinstance(header, dict) or header.get("version") != PAGES_VERSION:
+        raise ValueError(f"{pages_path} 格式版本不符")
+    if header.get("hash") != os.path.splitext(os.path.basename(pages_path))[0]:
+        raise ValueError(f"{pages_path} 与清单中的哈希不符")
+    try:
+        used = {
+            int(index): {int(char_id): (int(gid), tuple(map(int, unicodes)), width)
+                         for char_id, gid, unicodes, width in font_glyphs}
+            for index, font_glyphs in header["glyphs"].items()
+        }
+        lengths = [int(length) for length in header["pages"]]
+        layout = str(header["layout"])
+    except (KeyError, TypeError, ValueError, AttributeError) as e:
+        raise ValueError(f"{pages_path} 头部无效：{e}") from e
+    if not all(isinstance(width, (int, float)) for glyphs in used.values() for _, _, width in glyphs.values()):
+        raise ValueError(f"{pages_path} 头部无效：字宽不是数字")
+    return {"layout": layout, "glyphs": used, "pages": lengths, "size": len(line) + sum(lengths)}
+
+
+def load_glyphs(pages_path):
+    with open(pages_path, "rb") as f:
+        return _read_header(f, pages_path)["glyphs"]
+
+
+def load_pages(pages_path):
+    """返回 (各页内容流, 用到的字形)"""
+    with open(pages_path, "rb") as f:
+        header = _read_header(f, pages_path)
+        pages = [f.read(length) for length in header["pages"]]
+        if any(len(page) != length for page, length in zip(pages, header["pages"])) or f.read(1):
+            raise ValueError(f"{pages_path} 长度与头部不符")
+    return pages, header["glyphs"]
+
+
+def record_written(cache_dir, output_path, letter_hash):
+    """单份 PDF 写完后追加到本进程的日志（可在子进程中执行）"""
+    journal = os.path.join(cache_dir, f"journal-{os.getpid()}.jsonl")
+    with open(journal, "a", encoding="utf-8") as f:
+        f.write(json.dumps([os.path.basename(output_path), letter_hash], ensure_ascii=False) + "\n")
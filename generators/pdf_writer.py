@@ -0,0 +1,401 @@
+# generators/pdf_writer.py
+"""流式 PDF 写入器
+
+fpdf 只负责排版：每份询证函绘制一次，取出各页的内容流。本模块把这些内容流逐页写入
+磁盘，字体子集、资源字典等共享对象在文件末尾只写一次，因此内存占用与页数无关。
+
+页面内容流中的文字编码（CID）取自字体原始字形编号（见 GlyphIdSubsetMap），
+与具体文档无关，同一份排版结果可以直接写入单份 PDF 和合并 PDF。
+"""
+import os
+import copy
+import hashlib
+from datetime import datetime, timezone
+from io import BytesIO
+
+from fontTools import subset as ftsubset
+from fontTools import ttLib
+from fpdf import FPDF_VERSION
+from fpdf.fonts import Glyph, SubsetMap
+from fpdf.output import (
+    PDFFont, PDFFontStream, CIDSystemInfo, PDFInfo, PDFCatalog, PDFResources,
+    PDFPagesRoot, ZOOM_CONFIGS,
+)
+from fpdf.syntax import PDFContentStream, PDFDate, PDFObject, Name, iobj_ref
+
+# 与 fpdf 输出时的子集选项一致
+DROP_TABLES = [
+    "FFTM", "GDEF", "GPOS", "GSUB", "MATH", "hdmx", "meta", "sbix", "CBDT", "CBLC",
+    "EBDT", "EBLC", "EBSC", "SVG ", "CPAL", "COLR", "fvar",
+]
+
+# UTF-16 代理区的编号无法写入 fpdf 的文字串
+_MAX_GLYPH_ID = 0xD7FF
+
+# 文档信息中的 Creator 和 Producer
+PRODUCER = f"PyFPDF/fpdf{FPDF_VERSION}"
+
+
+class GlyphIdSubsetMap(SubsetMap):
+    """以字体原始字形编号作为 CID 的子集表
+
+    fpdf 默认按首次出现的顺序分配 CID，每份文档各不相同；这里 CID 固定，页面内容流
+    因此可以在不同文档、不同进程之间直接拼接。空格固定为 0x20（fpdf 的两端对齐依赖它），
+    与原编号为 0x20 的字形互换。
+    """
+
+    def __init__(self, font):
+        # 不调用父类构造：父类会预先登记 .notdef 和空格，并写入类级别的 lru_cache
+        self.font = font
+        self._char_id_per_glyph = {}
+        self._char_ids = {}
+        self._space_id = font.glyph_ids.get(0x20, 0x20)
+        if max(font.glyph_ids.values(), default=0) > _MAX_GLYPH_ID:
+            raise ValueError(f"字体 {font.name} 字形过多，无法使用固定 CID")
+
+    def __repr__(self):
+        return f"GlyphIdSubsetMap(font={self.font}, glyphs={len(self._char_id_per_glyph)})"
+
+    def pick(self, unicode):
+        char_id = self._char_ids.get(unicode)
+        if char_id is not None or unicode in self._char_ids:
+            return char_id
+        glyph_id = self.font.glyph_ids.get(unicode)
+        if glyph_id is None:
+            if unicode not in self.font.missing_glyphs:
+                self.font.missing_glyphs.append(unicode)
+            char_id = None
+        else:
+            char_id = self.char_id(glyph_id)
+            glyph = Glyph(glyph_id, (unicode,), self.font.cmap[unicode], self.font.cw[unicode])
+            self._char_id_per_glyph.setdefault(glyph, char_id)
+        self._char_ids[unicode] = char_id
+        return char_id
+
+    def pick_glyph(self, glyph):
+        if glyph is None:
+            return None
+        return self._char_id_per_glyph.setdefault(glyph, self.char_id(glyph.glyph_id))
+
+    def char_id(self, glyph_id):
+        if glyph_id == self._space_id:
+            return 0x20
+        if glyph_id == 0x20:
+            return self._space_id
+        return glyph_id
+
+    def used_glyphs(self):
+        """本文档用到的字形：{CID: (原字形编号, unicode 元组, 字宽)}"""
+        return {
+            char_id: (glyph.glyph_id, glyph.unicode, glyph.glyph_width)
+            for glyph, char_id in self._char_id_per_glyph.items()
+        }
+
+
+def _subset_options():
+    options = ftsubset.Options(notdef_outline=True, recommended_glyphs=True)
+    options.drop_tables += DROP_TABLES
+    return options
+
+
+def _load_font(file):
+    # 子集不改变单个字形的轮廓，跳过边界框重算可避免逐个展开、重新编码字形
+    return ttLib.TTFont(file, recalcBBoxes=False, recalcTimestamp=False, fontNumber=0, lazy=True)
+
+
+def _subset(ttfont, glyph_ids):
+    """就地裁剪字体，返回 (字体文件字节, {裁剪前字形编号: 裁剪后字形编号})"""
+    order = ttfont.getGlyphOrder()
+    names = {gid: order[gid] for gid in glyph_ids}
+    subsetter = ftsubset.Subsetter(_subset_options())
+    subsetter.populate(gids=sorted(glyph_ids))
+    subsetter.subset(ttfont)
+    new_ids = {gid: ttfont.getGlyphID(name) for gid, name in names.items()}
+    output = BytesIO()
+    ttfont.save(output)
+    ttfont.close()
+    return output.getvalue(), new_ids
+
+
+class EmbeddedFont:
+    """写入 PDF 的一种字体：名称与字体描述取自 fpdf 的 TTFFont，字形取自整批共用的小字体
+
+    fontTools 从上万个字形的完整字体中裁剪很慢（每份 PDF 每种字体约 0.2 秒）；
+    先为整批文档用到的字形裁剪一次，每份 PDF 再从这份小字体裁剪，结果与直接
+    从完整字体裁剪相同。
+    """
+
+    def __init__(self, index, name, desc, font_data, glyph_map):
+        self.index = index
+        self.name = name
+        self.desc = desc
+        self.font_data = font_data
+        # 原字形编号 -> 小字体中的字形编号
+        self.glyph_map = glyph_map
+
+    @classmethod
+    def from_ttf_font(cls, font, glyph_ids):
+        """为 fpdf 字体 font 中原编号为 glyph_ids 的字形构建整批共用的小字体"""
+        font_data, glyph_map = _subset(_load_font(font.ttffile), glyph_ids)
+        return cls(font.i, font.name, font.desc, font_data, glyph_map)
+
+    def subset(self, glyph_ids):
+        """裁剪出原编号为 glyph_ids 的字形，返回 (字体文件字节, {原字形编号: 子集中的字形编号})"""
+        font_data, new_ids = _subset(
+            _load_font(BytesIO(self.font_data)), {self.glyph_map[gid] for gid in glyph_ids})
+        return font_data, {gid: new_ids[self.glyph_map[gid]] for gid in glyph_ids}
+
+
+class _RawObject(PDFObject):
+    """已序列化好的字典体"""
+
+    def __init__(self, body):
+        super().__init__()
+        self._body = body
+
+    def serialize(self, obj_dict=None, _security_handler=None):
+        return f"{self.id} 0 obj\n{self._body}\nendobj"
+
+
+def _widths(glyphs):
+    """CIDFont 的 /W 数组：连续 CID 合并为一组"""
+    groups = []
+    for char_id in sorted(glyphs):
+        width = str(int(glyphs[char_id][2]))
+        if groups and char_id == groups[-1][0] + len(groups[-1][1]):
+            groups[-1][1].append(width)
+        else:
+            groups.append((char_id, [width]))
+    return "[" + "".join(f" {start} [ {' '.join(widths)} ]\n" for start, widths in groups) + "]"
+
+
+def _unicode_hex(unicode):
+    if unicode > 0xFFFF:
+        high = 0xD800 | (unicode - 0x10000) >> 10
+        low = 0xDC00 | (unicode & 0x3FF)
+        return f"{high:04X}{low:04X}"
+    return f"{unicode:04X}"
+
+
+def _to_unicode(glyphs):
+    bf_char = "".join(
+        f"<{char_id:04X}> <{''.join(_unicode_hex(u) for u in unicodes)}>\n"
+        for char_id, (_, unicodes, _) in sorted(glyphs.items()) if unicodes
+    )
+    return (
+        "/CIDInit /ProcSet findresource begin\n"
+        "12 dict begin\n"
+        "begincmap\n"
+        "/CIDSystemInfo\n"
+        "<</Registry (Adobe)\n"
+        "/Ordering (UCS)\n"
+        "/Supplement 0\n"
+        ">> def\n"
+        "/CMapName /Adobe-Identity-UCS def\n"
+        "/CMapType 2 def\n"
+        "1 begincodespacerange\n"
+        "<0000> <FFFF>\n"
+        "endcodespacerange\n"
+        f"{bf_char.count(chr(10))} beginbfchar\n"
+        f"{bf_char}"
+        "endbfchar\n"
+        "endcmap\n"
+        "CMapName currentdict /CMap defineresource pop\n"
+        "end\n"
+        "end"
+    )
+
+
+class PDFStreamWriter:
+    """逐页写入磁盘的 PDF 文件
+
+    页面内容流立即写出；字体在 close() 时按全部页面用到的字形裁剪并只写一次。fonts 为 None 时
+    须在 close() 之前调用 set_fonts（边排版边写出时，排版结束才知道整批用到哪些字形）。
+    forms 为各页共用的表单对象 {名称: 内容流}，页面内容流中以 "/名称 Do" 引用，
+    form_glyphs 为表单用到的字形。path 也可以是已打开的二进制文件对象（例如 BytesIO），
+    此时由调用方关闭。creator、producer 写入文档信息，默认为 PRODUCER。
+    """
+
+    def __init__(self, path, fonts, page_size, zoom_mode="fullwidth", creation_date=None,
+                 forms=None, form_glyphs=None, creator=PRODUCER, producer=PRODUCER):
+        self.path = path
+        self.creator = creator
+        self.producer = producer
+        self.fonts = None
+        if fonts is not None:
+            self.set_fonts(fonts)
+        self.page_size = page_size
+        self.zoom_mode = zoom_mode
+        self.creation_date = creation_date or datetime.now(timezone.utc)
+        # 字体序号 -> 用到的字形
+        self.glyphs = {}
+        self.page_ids = []
+        self.offsets = {}
+        self.obj_id = 0
+        self._md5 = hashlib.md5()
+        self._owns_file = not hasattr(path, "write")
+        self._file = open(path, "wb") if self._owns_file else path
+        self._pos = 0
+        # 页面树和共享资源字典先占号，页面对象直接引用
+        self.pages_root_id = self._next_id()
+        self.resources_id = self._next_id()
+        self._write(b"%PDF-1.3\n")
+
+        self.form_ids = {name: self._write_form(contents) for name, contents in (forms or {}).items()}
+        for index, used in (form_glyphs or {}).items():
+            self.glyphs.setdefault(index, {}).update(used)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            # 出错或被取消时不留下写了一半的文件
+            if self._owns_file:
+                self._file.close()
+                os.remove(self.path)
+
+    def _next_id(self):
+        self.obj_id += 1
+        return self.obj_id
+
+    def _write(self, data):
+        self._file.write(data)
+        self._md5.update(data)
+        self._pos += len(data)
+
+    def _write_obj(self, obj):
+        if obj._id is None:
+            obj.id = self._next_id()
+        self.offsets[obj.id] = self._pos
+        data = obj.serialize()
+        if not isinstance(data, bytes):
+            data = data.encode("latin-1")
+        self._write(data + b"\n")
+        return obj.id
+
+    def _write_form(self, contents):
+        width, height = self.page_size
+        form = PDFContentStream(contents=bytes(contents), compress=True)
+        form.type = Name("XObject")
+        form.subtype = Name("Form")
+        form.b_box = f"[0 0 {width:.2f} {height:.2f}]"
+        form.resources = iobj_ref(self.resources_id)
+        return self._write_obj(form)
+
+    def add_pages(self, pages, glyphs):
+        """写入一份文档的各页内容流；glyphs 为这些页用到的字形 {字体序号: GlyphIdSubsetMap.used_glyphs()}"""
+        for contents in pages:
+            contents_id = self._write_obj(PDFContentStream(contents=bytes(contents), compress=True))
+            page_id = self._write_obj(_RawObject(
+                f"<</Type /Page /Contents {iobj_ref(contents_id)} "
+                f"/Resources {iobj_ref(self.resources_id)} /Parent {iobj_ref(self.pages_root_id)}>>"
+            ))
+            self.page_ids.append(page_id)
+        for index, used in glyphs.items():
+            self.glyphs.setdefault(index, {}).update(used)
+
+    def set_fonts(self, fonts):
+        self.fonts = {font.index: font for font in fonts}
+
+    def _write_font(self, font, glyphs):
+        font_file, new_ids = font.subset({gid for gid, _, _ in glyphs.values()})
+        fontname = f"{_subset_tag(font_file)}+{font.name}"
+
+        cid_to_gid = bytearray(256 * 256 * 2)
+        for char_id, (gid, _, _) in glyphs.items():
+            new_id = new_ids[gid]
+            cid_to_gid[char_id * 2] = new_id >> 8
+            cid_to_gid[char_id * 2 + 1] = new_id & 0xFF
+
+        composite = PDFFont(subtype="Type0", base_font=fontname, encoding="Identity-H")
+        composite.id = self._next_id()
+        cid_font = PDFFont(subtype="CIDFontType2", base_font=fontname,
+                           d_w=font.desc.missing_width, w=_widths(glyphs))
+        cid_font.id = self._next_id()
+        composite.descendant_fonts = f"[{iobj_ref(cid_font.id)}]"
+
+        to_unicode = PDFContentStream(_to_unicode(glyphs).encode("latin-1"), compress=True)
+        composite.to_unicode = to_unicode
+        system_info = CIDSystemInfo()
+        cid_font.c_i_d_system_info = system_info
+        desc = _copy_descriptor(font.desc, fontname)
+        cid_font.font_descriptor = desc
+        cid_to_gid_map = PDFContentStream(contents=bytes(cid_to_gid), compress=True)
+        cid_font.c_i_d_to_g_i_d_map = cid_to_gid_map
+        font_stream = PDFFontStream(contents=font_file)
+        desc.font_file2 = font_stream
+
+        for obj in (to_unicode, system_info, desc, cid_to_gid_map, font_stream):
+            obj.id = self._next_id()
+        for obj in (composite, cid_font, to_unicode, system_info, desc, cid_to_gid_map, font_stream):
+            self._write_obj(obj)
+        return composite.id
+
+    def close(self):
+        try:
+            self._finish()
+        finally:
+            if self._owns_file:
+                self._file.close()
+
+    def _finish(self):
+        if not self.page_ids:
+            raise ValueError("PDF 中没有任何页面")
+
+        font_ids = {
+            index: self._write_font(self.fonts[index], glyphs)
+            for index, glyphs in sorted(self.glyphs.items()) if glyphs
+        }
+        font_dict = "".join(f"/F{index} {iobj_ref(obj_id)}" for index, obj_id in font_ids.items())
+        form_dict = "".join(f"/{name} {iobj_ref(obj_id)}" for name, obj_id in self.form_ids.items())
+        resources = PDFResources(
+            proc_set="[/PDF /Text /ImageB /ImageC /ImageI]",
+            font=f"<<{font_dict}>>" if font_ids else None,
+            x_object=f"<<{form_dict}>>" if form_dict else None,
+            ext_g_state=None, shading=None, pattern=None,
+        )
+        resources.id = self.resources_id
+        self._write_obj(resources)
+
+        width, height = self.page_size
+        pages_root = PDFPagesRoot(count=len(self.page_ids), media_box=f"[0 0 {width:.2f} {height:.2f}]")
+        pages_root.id = self.pages_root_id
+        pages_root.kids = "[" + " ".join(iobj_ref(page_id) for page_id in self.page_ids) + "]"
+        self._write_obj(pages_root)
+
+        catalog = PDFCatalog()
+        catalog.pages = pages_root
+        zoom = ZOOM_CONFIGS.get(self.zoom_mode, ("/Fit",))
+        catalog.open_action = f"[{iobj_ref(self.page_ids[0])} {' '.join(zoom)}]"
+        catalog_id = self._write_obj(catalog)
+        info_id = self._write_obj(PDFInfo(
+            title=None, subject=None, author=None, keywords=None, creator=self.creator,
+            producer=self.producer, creation_date=PDFDate(self.creation_date, with_tz=True, encrypt=True),
+        ))
+
+        startxref = self._pos
+        file_id = self._md5.hexdigest().upper()
+        out = ["xref", f"0 {self.obj_id + 1}", "0000000000 65535 f "]
+        out += [f"{self.offsets[obj_id]:010} 00000 n " for obj_id in range(1, self.obj_id + 1)]
+        out += [
+            "trailer", "<<", f"/Size {self.obj_id + 1}", f"/Root {iobj_ref(catalog_id)}",
+            f"/Info {iobj_ref(info_id)}", f"/ID [<{file_id}><{file_id}>]", ">>",
+            "startxref", str(startxref), "%%EOF",
+        ]
+        self._write("\n".join(out).encode("latin-1"))
+
+
+def _subset_tag(font_file):
+    """子集字体名称的前缀：由子集内容的哈希得到的六个大写字母，不同子集的前缀不同"""
+    digest = hashlib.sha256(font_file).digest()
+    return "".join(chr(ord("A") + b % 26) for b in digest[:6])
+
+
+def _copy_descriptor(desc, fontname):
+    """每个文件各写一份字体描述（FontFile2 不同），不修改共享的原对象"""
+    copied = copy.copy(desc)
+    copied.font_name = Name(fontname)
+    return copied
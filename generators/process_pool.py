@@ -0,0 +1,244 @@
+# generators/process_pool.py
+"""多进程生成的公共部分（PDF 与分片 Excel 共用）
+
+子进程的进度累加到各进程共享的计数器，主进程在等待任务期间转交给 core.progress.Progress；
+主进程取消或任一任务失败时设置共享事件，子进程在下一步抛出 Cancelled，未写完的文件由子进程自己删除。
+
+wait_all 等待预先提交的全部任务；ordered_map 是有界的流水线：边读取边提交，同时进行的任务
+不超过 window 个，结果按提交顺序交给主进程写出。
+
+进程池不在主线程中创建时（例如图形界面的生成线程）不使用 fork，改用 spawn 启动子进程。
+
+常驻进程（例如监视文件夹）用 warm_pool 保持一个进程池：期间 create_pool 返回同一个进程池，
+子进程已导入的模块、加载的字体和模板在各次生成之间保留。
+"""
+import itertools
+import threading
+import contextlib
+import multiprocessing
+import tracemalloc
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, FIRST_EXCEPTION, wait
+from concurrent.futures.process import BrokenProcessPool
+
+from core import instrument
+from core.progress import Cancelled
+
+# 子进程中的进度（由 _init_worker 设置），各步骤通过 step 前进
+_worker_progress = None
+
+
+class SharedProgress:
+    """子进程中的进度：接口与 Progress 相同，总数由主进程设置"""
+
+    def __init__(self, counter, cancel_event):
+        self.counter = counter
+        self.cancel_event = cancel_event
+
+    def begin(self, total):
+        self.check()
+
+    def step(self, count=1):
+        self.check()
+        with self.counter.get_lock():
+            self.counter.value += count
+
+    def check(self):
+        if self.cancel_event.is_set():
+            raise Cancelled()
+
+
+def _init_worker(counter, cancel_event):
+    global _worker_progress
+    _worker_progress = SharedProgress(counter, cancel_event)
+    # fork 出的子进程继承了主进程的接收方和内存跟踪（--trace-memory），子进程中不记录
+    instrument.set_sink(None)
+    if tracemalloc.is_tracing():
+        tracemalloc.stop()
+
+
+def worker_progress():
+    """子进程中为 SharedProgress，主进程中为 None"""
+    return _worker_progress
+
+
+def step(progress):
+    """前进一步：progress 为 None 时使用子进程的进度"""
+    progress = progress or _worker_progress
+    if progress is not None:
+        progress.step()
+
+
+# 进程池无法启动时 create_pool 抛出的异常，调用方据此退回串行
+STARTUP_ERRORS = (OSError, NotImplementedError, BrokenProcessPool)
+
+
+def create_pool(workers):
+    """返回 (进程池, 进度计数器, 取消事件)，计数器和事件交给 wait_all
+
+    返回前等待子进程启动并完成初始化：系统不允许创建进程或子进程初始化失败时在这里抛出
+    STARTUP_ERRORS 之一。之后生成中的错误（包括写文件的 I/O 错误）不应再退回串行。
+    warm_pool 期间进程数相同时返回常驻的进程池（计数器清零、取消事件复位），with 块结束时不关闭。
+    """
+    if _warm is not None and _warm.workers == workers:
+        return _warm.lease()
+    pool, counter, cancel_event = _new_pool(workers)
+    try:
+        pool.submit(_started).result()
+    except BaseException:
+        pool.shutdown(wait=False, cancel_futures=True)
+        raise
+    return pool, counter, cancel_event
+
+
+def _started():
+    return None
+
+
+def _new_pool(workers):
+    context = multiprocessing.get_context()
+    if context.get_start_method() == "fork" and threading.current_thread() is not threading.main_thread():
+        # 在其他线程（例如图形界面的生成线程）中 fork 多线程的进程，子进程可能卡在其他线程持有的锁上
+        context = multiprocessing.get_context("spawn")
+    counter = context.Value("q", 0)
+    cancel_event = context.Event()
+    pool = ProcessPoolExecutor(max_workers=workers, mp_context=context, initializer=_init_worker,
+                               initargs=(counter, cancel_event))
+    return pool, counter, cancel_event
+
+
+# warm_pool 期间的常驻进程池
+_warm = None
+
+
+class _WarmPool:
+    """常驻进程池：with 块结束时不关闭；子进程异常退出后下次使用时重新创建"""
+
+    def __init__(self, workers, warm_up=None):
+        self.workers = workers
+        self.warm_up = warm_up
+        self._start()
+
+    def _start(self):
+        self.pool, self.counter, self.cancel_event = _new_pool(self.workers)
+        if self.warm_up is not None:
+            # 提交 workers 个预热任务，使子进程立即启动并预先加载，而不是等到第一次生成
+            wait([self.pool.submit(self.warm_up) for _ in range(self.workers)])
+
+    def lease(self):
+        """把进程池交给一次生成（同一时间只能有一次）"""
+        self.counter.value = 0
+        self.cancel_event.clear()
+        return self, self.counter, self.cancel_event
+
+    def submit(self, *args, **kwargs):
+        return self.pool.submit(*args, **kwargs)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is not None and issubclass(exc_type, BrokenProcessPool):
+            self.pool.shutdown(cancel_futures=True)
+            self._start()
+        return False
+
+    def shutdown(self):
+        self.pool.shutdown(cancel_futures=True)
+
+
+@contextlib.contextmanager
+def warm_pool(workers, warm_up=None):
+    """with warm_pool(workers, 预热函数): 期间的多进程生成共用一个常驻进程池
+
+    预热函数（可 pickle 的顶层函数）在子进程启动后执行，例如加载字体和编译好的模板；
+    fork 的子进程还继承主进程中已经加载的内容。
+    """
+    global _warm
+    previous = _warm
+    _warm = _WarmPool(workers, warm_up)
+    try:
+        yield _warm
+    finally:
+        _warm.shutdown()
+        _warm = previous
+
+
+def wait_all(futures, counter, progress, cancel_event):
+    """等待全部任务完成，期间把子进程的进度转交给 progress，按提交顺序返回结果
+
+    任一任务失败或 progress 被取消时通知其余子进程停止，并重新抛出异常。
+    """
+    pending = set(futures)
+    try:
+        while pending:
+            done, pending = wait(pending, timeout=0.1, return_when=FIRST_EXCEPTION)
+            if progress is not None:
+                count = counter.value - progress.done
+                if count:
+                    progress.step(count)
+                progress.check()
+            for future in done:
+                future.result()
+    except BaseException:
+        cancel_event.set()
+        for future in pending:
+            future.cancel()
+        # 等正在执行的任务停下，未写完的文件由它们自己删除
+        wait(pending)
+        raise
+    return [future.result() for future in futures]
+
+
+def chunked(iterable, size):
+    """按顺序每 size 个一组（最后一组可能不足），惰性读取 iterable"""
+    iterator = iter(iterable)
+    while True:
+        chunk = list(itertools.islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def ordered_map(pool, func, items, window, counter, progress, cancel_event):
+    """流水线：逐个从 items 取出参数元组提交 func(*item)，按提交顺序逐个返回结果（生成器）
+
+    同时提交的任务不超过 window 个：前面的结果还没被取走时不再读取 items，内存中的任务数有上限
+    （背压）。等待期间把子进程的进度转交给 progress（主进程自己也可以调用 progress.step）。
+    任一任务失败、progress 被取消或调用方中途停止时通知其余子进程停止。
+    """
+    items = iter(items)
+    pending = deque()
+    forwarded = 0
+    exhausted = False
+    try:
+        while True:
+            while not exhausted and len(pending) < window:
+                item = next(items, None)
+                if item is None:
+                    exhausted = True
+                else:
+                    pending.append(pool.submit(func, *item))
+            if not pending:
+                return
+            while True:
+                done, _ = wait(pending, timeout=0.1, return_when=FIRST_EXCEPTION)
+                if progress is not None:
+                    count = counter.value - forwarded
+                    if count:
+                        forwarded += count
+                        progress.step(count)
+                    progress.check()
+                for future in done:
+                    if future.exception() is not None:
+                        future.result()
+                if pending[0] in done:
+                    break
+            yield pending.popleft().result()
+    except BaseException:
+        cancel_event.set()
+        for future in pending:
+            future.cancel()
+        # 等正在执行的任务停下，未写完的文件由它们自己删除
+        wait(pending)
+        raise
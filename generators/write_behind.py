@@ -0,0 +1,204 @@
+# generators/write_behind.py
+"""后台写出单份 PDF（write-behind）
+
+输出到网络共享盘时，每个文件的打开、写入、改名都要等服务器往返，逐个同步写出几千份单份 PDF
+时大部分时间花在等待上。WriteBehind 把已经生成好的文件内容交给几个后台线程写出，排版同时继续：
+
+- 每个文件先写到同一文件夹中的临时文件再原子地改名，写到一半失败不会留下残缺的文件；
+- 同一路径总由同一个线程按提交顺序写出（台账中同名的行仍以最后一行为准）；
+- 每个线程的队列有上限，写出跟不上时 submit 阻塞，内存中待写的文件数有上限；
+- 任一文件写出失败时，之后的 submit 和 close 抛出 WriteFailed，错误不会丢失；
+- metrics() 给出写出的文件数、字节数、队列最大深度、提交时等待的次数等，close 时经
+  core.instrument.record_metrics 记入运行报告。
+
+ArchiveWriter 接口相同，但把文件逐个写入同一个 ZIP 包，不在输出文件夹中留下单个文件。
+"""
+import os
+import time
+import queue
+import zipfile
+import threading
+
+from core import instrument
+from core.instrument import stage
+from core.utils import write_atomic
+
+# 写出线程数与每个线程的队列长度
+DEFAULT_THREADS = 4
+DEFAULT_QUEUE_SIZE = 8
+
+_STOP = object()
+
+
+class WriteFailed(Exception):
+    """后台线程写出文件失败；__cause__ 为原来的异常"""
+
+    def __init__(self, path, error):
+        self.path = path
+        super().__init__(f"无法写出 {path}：{error}")
+
+
+class WriteBehind:
+    """with WriteBehind() as files: files.submit(路径, 内容) —— 正常退出时等待全部写完
+
+    with 块中出错或被取消时丢弃尚未写出的文件，已写完的保留。
+    """
+
+    def __init__(self, threads=DEFAULT_THREADS, queue_size=DEFAULT_QUEUE_SIZE, name="pdf_io"):
+        self.name = name
+        self._queues = [queue.Queue(queue_size) for _ in range(threads)]
+        self._lock = threading.Lock()
+        self._error = None
+        self._discard = False
+        self._depth = 0
+        self._started = time.perf_counter()
+        self.files = 0
+        self.bytes = 0
+        self.busy = 0.0
+        self.max_queue = 0
+        self.waits = 0
+        self._threads = [threading.Thread(target=self._run, args=(q,), name=f"write-behind-{n}", daemon=True)
+                         for n, q in enumerate(self._queues)]
+        for thread in self._threads:
+            thread.start()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self._discard = True
+            self._join()
+        return False
+
+    def submit(self, path, data, done=None, **options):
+        """在后台把 data（bytes）写到 path；写完后在后台线程中调用 done()（各次调用互斥）
+
+        options 交给 _write（ArchiveWriter 的 compression）。
+        """
+        self._check()
+        q = self._queues[hash(path) % len(self._queues)]
+        with self._lock:
+            self._depth += 1
+            self.max_queue = max(self.max_queue, self._depth)
+        if q.full():
+            self.waits += 1
+        q.put((path, data, done, options))
+        self._check()
+
+    def close(self):
+        """等待全部写完；有文件写出失败时抛出第一个错误（WriteFailed）"""
+        self._join()
+        instrument.record_metrics(self.name, self.metrics())
+        self._check()
+
+    def metrics(self):
+        seconds = time.perf_counter() - self._started
+        return {
+            "files": self.files,
+            "bytes": self.bytes,
+            "seconds": seconds,
+            "busy_seconds": self.busy,
+            "max_queue": self.max_queue,
+            "waits": self.waits,
+        }
+
+    def _check(self):
+        if self._error is not None:
+            raise self._error
+
+    def _join(self):
+        for q in self._queues:
+            q.put(_STOP)
+        for thread in self._threads:
+            thread.join()
+
+    def _run(self, q):
+        while True:
+            item = q.get()
+            if item is _STOP:
+                return
+            path, data, done, options = item
+            with self._lock:
+                self._depth -= 1
+            # 已经出错或放弃时只清空队列，让 submit 不会阻塞
+            if self._discard or self._error is not None:
+                continue
+            start = time.perf_counter()
+            try:
+                with stage(self.name):
+                    self._write(path, data, **options)
+                with self._lock:
+                    if done is not None:
+                        done()
+                    self.files += 1
+                    self.bytes += len(data)
+                    self.busy += time.perf_counter() - start
+            except Exception as e:
+                error = WriteFailed(path, e)
+                error.__cause__ = e
+                with self._lock:
+                    if self._error is None:
+                        self._error = error
+
+    def _write(self, path, data):
+        write_atomic(path, lambda f: f.write(data))
+
+
+# ZIP 包中各文件的压缩方式；PDF 与 xlsx 本身已经压缩，默认直接存储
+COMPRESSION = {"stored": zipfile.ZIP_STORED, "deflated": zipfile.ZIP_DEFLATED}
+
+
+class ArchiveWriter(WriteBehind):
+    """把文件逐个写入 archive_path 处的 ZIP 包，接口与 WriteBehind 相同
+
+    一个后台线程按提交顺序写入（压缩时 zlib 释放 GIL，与排版同时进行）。包内名称取 submit 的
+    路径中的文件名，同名时依次改为“名称 (2).pdf”……，每一份都保留。compression 为
+    "stored"（默认）或 "deflated"，submit(..., compression=...) 可为单个文件另行指定。
+    包先写到临时文件，正常关闭时改名；出错或取消时删除，不留下不完整的包。
+    """
+
+    def __init__(self, archive_path, compression="stored", queue_size=DEFAULT_QUEUE_SIZE, name="archive_io"):
+        if compression not in COMPRESSION:
+            raise ValueError(f"未知的压缩方式：{compression}")
+        self.archive_path = archive_path
+        self.compression = compression
+        self._tmp_path = f"{archive_path}.{os.getpid()}.tmp"
+        self._zip = zipfile.ZipFile(self._tmp_path, "w")
+        self._names = set()
+        super().__init__(threads=1, queue_size=queue_size, name=name)
+
+    def __exit__(self, exc_type, exc, tb):
+        try:
+            return super().__exit__(exc_type, exc, tb)
+        finally:
+            if exc_type is not None:
+                self._zip.close()
+                os.remove(self._tmp_path)
+
+    def close(self):
+        try:
+            super().close()
+        except BaseException:
+            self._zip.close()
+            os.remove(self._tmp_path)
+            raise
+        self._zip.close()
+        os.replace(self._tmp_path, self.archive_path)
+
+    def _write(self, path, data, compression=None):
+        name = self._unique_name(os.path.basename(path))
+        info = zipfile.ZipInfo(name, time.localtime()[:6])
+        info.compress_type = COMPRESSION[compression or self.compression]
+        self._zip.writestr(info, data)
+
+    def _unique_name(self, name):
+        stem, ext = os.path.splitext(name)
+        n = 1
+        while name.lower() in self._names:
+            n += 1
+            name = f"{stem} ({n}){ext}"
+        self._names.add(name.lower())
+        return name
@@ -0,0 +1,285 @@
+# generators/xml_excel_generator.py
+"""直接拼装 xlsx 包的 Excel 后端
+
+模板的工作表 XML、样式、共享字符串只读取一次；每份询证函只替换约 15 个单元格，
+其余字节原样复用，再直接写入 zip 包，不经过 openpyxl 的对象模型。
+"""
+import os
+import re
+import hashlib
+import zipfile
+from io import BytesIO
+from xml.etree import ElementTree
+from xml.sax.saxutils import escape
+
+from openpyxl.cell.cell import ILLEGAL_CHARACTERS_RE
+from openpyxl.utils import column_index_from_string
+from openpyxl.utils.cell import coordinate_from_string
+from openpyxl.utils.exceptions import IllegalCharacterError
+from openpyxl.workbook.child import INVALID_TITLE_REGEX, avoid_duplicate_name
+
+from core.letters import iter_letters, letter_count
+from core.instrument import stage
+from core.utils import file_stamp
+from core.template_plan import CELL_TEMPLATES, letter_cells
+
+NS_MAIN = "http://schemas.openxmlformats.org/spreadsheetml/2006/main"
+NS_REL = "http://schemas.openxmlformats.org/officeDocument/2006/relationships"
+NS_PKG_REL = "http://schemas.openxmlformats.org/package/2006/relationships"
+REL_WORKSHEET = NS_REL + "/worksheet"
+REL_CALC_CHAIN = NS_REL + "/calcChain"
+CT_WORKSHEET = "application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"
+CT_CALC_CHAIN = "application/vnd.openxmlformats-officedocument.spreadsheetml.calcChain+xml"
+
+_CELL_RE = re.compile(rb'<c\b[^>]*?\br="([A-Z]+[0-9]+)"[^>]*?(?:/>|>.*?</c>)', re.S)
+_ROW_RE = re.compile(rb'<row\b[^>]*?\br="([0-9]+)"[^>]*?(?:/>|>.*?</row>)', re.S)
+_STYLE_RE = re.compile(rb'\bs="([0-9]+)"')
+
+APP_XML = (
+    b'<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    b'<Properties xmlns="http://schemas.openxmlformats.org/officeDocument/2006/extended-properties">'
+    b'<Application>Microsoft Excel</Application></Properties>'
+)
+
+
+def _sort_key(coord):
+    col_letter, row = coordinate_from_string(coord)
+    return row, column_index_from_string(col_letter)
+
+
+def _ensure_cells(sheet_xml, coords):
+    """确保待替换的单元格在工作表 XML 中存在（不存在时按行列顺序插入空单元格）"""
+    existing = {m.group(1).decode() for m in _CELL_RE.finditer(sheet_xml)}
+    for coord in sorted(set(coords) - existing, key=_sort_key):
+        row, col = _sort_key(coord)
+        new_cell = f'<c r="{coord}"/>'.encode()
+        row_match = next((m for m in _ROW_RE.finditer(sheet_xml) if int(m.group(1)) == row), None)
+        if row_match is None:
+            # 整行不存在：插入到第一个行号更大的行之前
+            new_row = f'<row r="{row}">'.encode() + new_cell + b'</row>'
+            following = next((m for m in _ROW_RE.finditer(sheet_xml) if int(m.group(1)) > row), None)
+            if following is not None:
+                pos = following.start()
+            elif b'<sheetData/>' in sheet_xml:
+                sheet_xml = sheet_xml.replace(b'<sheetData/>', b'<sheetData></sheetData>', 1)
+                pos = sheet_xml.index(b'</sheetData>')
+            else:
+                pos = sheet_xml.index(b'</sheetData>')
+            sheet_xml = sheet_xml[:pos] + new_row + sheet_xml[pos:]
+            continue
+
+        row_xml = row_match.group(0)
+        if row_xml.endswith(b'/>'):
+            row_xml = row_xml[:-2] + b'>' + new_cell + b'</row>'
+        else:
+            pos = len(row_xml) - len(b'</row>')
+            for cell in _CELL_RE.finditer(row_xml):
+                if _sort_key(cell.group(1).decode())[1] > col:
+                    pos = cell.start()
+                    break
+            row_xml = row_xml[:pos] + new_cell + row_xml[pos:]
+        sheet_xml = sheet_xml[:row_match.start()] + row_xml + sheet_xml[row_match.end():]
+    return sheet_xml
+
+
+def _cell_xml(coord, style, value):
+    if value is None or value == "":
+        return f'<c r="{coord}"{style}/>'
+    value = str(value)
+    if ILLEGAL_CHARACTERS_RE.search(value):
+        raise IllegalCharacterError(f"{value} cannot be used in worksheets.")
+    return f'<c r="{coord}"{style} t="inlineStr"><is><t xml:space="preserve">{escape(value)}</t></is></c>'
+
+
+class XlsxTemplate:
+    """从模板 xlsx 编译得到的包结构，可重复渲染任意数量的工作表"""
+
+    def __init__(self, template_path, coords):
+        with zipfile.ZipFile(template_path) as zf:
+            self.parts = {name: zf.read(name) for name in zf.namelist()}
+
+        workbook_rels = self._rels("xl/_rels/workbook.xml.rels")
+        workbook = ElementTree.fromstring(self.parts["xl/workbook.xml"])
+        sheets = workbook.findall(f"{{{NS_MAIN}}}sheets/{{{NS_MAIN}}}sheet")
+        view = workbook.find(f"{{{NS_MAIN}}}bookViews/{{{NS_MAIN}}}workbookView")
+        active = int(view.get("activeTab", 0)) if view is not None else 0
+        active_rid = sheets[active].get(f"{{{NS_REL}}}id")
+        sheet_path = "xl/" + workbook_rels[active_rid][1].lstrip("/").removeprefix("xl/")
+        self.sheet_rels = self.parts.get(
+            sheet_path.replace("worksheets/", "worksheets/_rels/") + ".rels")
+
+        # 丢弃模板中原有的工作表及计算链（替换公式单元格后计算链会失效）
+        dropped = {
+            "xl/" + target.lstrip("/").removeprefix("xl/")
+            for rel_type, target in workbook_rels.values()
+            if rel_type in (REL_WORKSHEET, REL_CALC_CHAIN)
+        }
+        self.dropped = dropped | {
+            name.replace("worksheets/", "worksheets/_rels/") + ".rels" for name in dropped
+        } | {"xl/workbook.xml", "xl/_rels/workbook.xml.rels", "[Content_Types].xml", "docProps/app.xml"}
+        self.workbook_rels = [
+            (rid, rel_type, target) for rid, (rel_type, target) in workbook_rels.items()
+            if rel_type not in (REL_WORKSHEET, REL_CALC_CHAIN)
+        ]
+
+        sheet_xml = self.parts[sheet_path]
+        # 每张工作表复制同一模板，去掉不能重复的 codeName 和修订 uid
+        sheet_xml = re.sub(rb'(<sheetPr\b[^>]*?)\s+codeName="[^"]*"', rb'\1', sheet_xml, count=1)
+        sheet_xml = re.sub(rb'(<worksheet\b[^>]*?)\s+xr:uid="[^"]*"', rb'\1', sheet_xml, count=1)
+        sheet_xml = _ensure_cells(sheet_xml, coords)
+
+        # 拆分为固定片段与待替换单元格，渲染时按顺序拼接
+        self.segments = []
+        self.slots = []
+        pos = 0
+        for match in _CELL_RE.finditer(sheet_xml):
+            coord = match.group(1).decode()
+            if coord not in coords:
+                continue
+            self.segments.append(sheet_xml[pos:match.start()])
+            style = _STYLE_RE.search(match.group(0).split(b'>', 1)[0])
+            self.slots.append((coord, f' s="{style.group(1).decode()}"' if style else ""))
+            pos = match.end()
+        self.segments.append(sheet_xml[pos:])
+        # 只有第一张工作表保持选中状态
+        self.first_head = self.segments[0]
+        self.other_head = re.sub(rb'\s+tabSelected="1"', b'', self.segments[0])
+
+    def _rels(self, name):
+        root = ElementTree.fromstring(self.parts[name])
+        return {
+            rel.get("Id"): (rel.get("Type"), rel.get("Target"))
+            for rel in root.findall(f"{{{NS_PKG_REL}}}Relationship")
+        }
+
+    def render_sheet(self, values, first=False):
+        out = [self.first_head if first else self.other_head]
+        for (coord, style), segment in zip(self.slots, self.segments[1:]):
+            out.append(_cell_xml(coord, style, values.get(coord)).encode())
+            out.append(segment)
+        return b"".join(out)
+
+    def workbook_xml(self, titles):
+        sheets = "".join(
+            f'<sheet name="{escape(title, {chr(34): "&quot;"})}" sheetId="{i}" r:id="rIdSheet{i}"/>'
+            for i, title in enumerate(titles, 1)
+        ).encode()
+        xml = self.parts["xl/workbook.xml"]
+        xml = re.sub(rb'<sheets>.*?</sheets>|<sheets/>', lambda m: b'<sheets>' + sheets + b'</sheets>', xml, count=1, flags=re.S)
+        xml = re.sub(rb'<definedNames>.*?</definedNames>', b'', xml, count=1, flags=re.S)
+        xml = re.sub(rb'\s+(?:activeTab|firstSheet)="[0-9]+"', b'', xml)
+        return xml
+
+    def workbook_rels_xml(self, count):
+        rels = [
+            f'<Relationship Id="{rid}" Type="{rel_type}" Target="{target}"/>'
+            for rid, rel_type, target in self.workbook_rels
+        ]
+        rels += [
+            f'<Relationship Id="rIdSheet{i}" Type="{REL_WORKSHEET}" Target="worksheets/sheet{i}.xml"/>'
+            for i in range(1, count + 1)
+        ]
+        return (
+            '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+            f'<Relationships xmlns="{NS_PKG_REL}">{"".join(rels)}</Relationships>'
+        ).encode()
+
+    def content_types_xml(self, count):
+        xml = self.parts["[Content_Types].xml"]
+        for content_type in (CT_WORKSHEET, CT_CALC_CHAIN):
+            xml = re.sub(rb'<Override\b[^>]*ContentType="' + re.escape(content_type.encode()) + rb'"\s*/>', b'', xml)
+        overrides = "".join(
+            f'<Override PartName="/xl/worksheets/sheet{i}.xml" ContentType="{CT_WORKSHEET}"/>'
+            for i in range(1, count + 1)
+        ).encode()
+        return xml.replace(b'</Types>', overrides + b'</Types>')
+
+
+# 模板路径（或模板内容的哈希） -> ((修改时间, 大小), 待替换的单元格, XlsxTemplate)
+_template_cache = {}
+
+
+def load_xlsx_template(template_path, coords):
+    """编译模板（按路径缓存在内存中，模板文件修改后重新编译）
+
+    template_path 也可以是模板内容（bytes），此时按内容哈希缓存。
+    """
+    if isinstance(template_path, bytes):
+        key, stamp, source = hashlib.sha256(template_path).hexdigest(), None, BytesIO(template_path)
+    else:
+        key = os.path.abspath(template_path)
+        stamp, source = file_stamp(key), template_path
+    coords = frozenset(coords)
+    cached = _template_cache.get(key)
+    if cached is not None and cached[:2] == (stamp, coords):
+        return cached[2]
+    template = XlsxTemplate(source, coords)
+    _template_cache[key] = (stamp, coords, template)
+    return template
+
+
+class _SheetTitles:
+    """与 openpyxl 一致的工作表命名规则（截断、非法字符检查、重名自动编号）"""
+
+    def __init__(self):
+        self.titles = []
+        self._lower = set()
+
+    def add(self, title):
+        title = title or "Sheet"
+        m = INVALID_TITLE_REGEX.search(title)
+        if m:
+            raise ValueError("Invalid character {0} found in sheet title".format(m.group(0)))
+        if title.lower() in self._lower:
+            title = avoid_duplicate_name(self.titles, title)
+        self.titles.append(title)
+        self._lower.add(title.lower())
+        return title
+
+
+def generate_excel_xml(data_list, template_path, output_path, progress=None):
+    """与 generate_excel 输出一致，但直接按字节拼装工作表 XML，适合成千上万张工作表
+
+    出错或取消（progress 抛出 Cancelled）时删除未写完的文件。output_path 也可以是文件对象。
+    """
+    if progress is not None:
+        progress.begin(letter_count(data_list))
+    try:
+        _write_package(data_list, template_path, output_path, progress)
+    except BaseException:
+        if isinstance(output_path, str) and os.path.exists(output_path):
+            os.remove(output_path)
+        raise
+    return output_path
+
+
+def _write_package(data_list, template_path, output_path, progress):
+    template = None
+    titles = _SheetTitles()
+
+    with zipfile.ZipFile(output_path, "w", zipfile.ZIP_DEFLATED) as zf:
+        for i, data in enumerate(iter_letters(data_list), 1):
+            values = letter_cells(data)
+            if template is None:
+                with stage("template_load"):
+                    template = load_xlsx_template(template_path, CELL_TEMPLATES)
+            with stage("excel_letter", i - 1):
+                titles.add(data.sheet_name[:31])
+                zf.writestr(f"xl/worksheets/sheet{i}.xml", template.render_sheet(values, first=(i == 1)))
+                if template.sheet_rels is not None:
+                    zf.writestr(f"xl/worksheets/_rels/sheet{i}.xml.rels", template.sheet_rels)
+            if progress is not None:
+                progress.step()
+
+        if template is None:
+            raise ValueError("没有可生成的询证函数据")
+
+        with stage("excel_save"):
+            count = len(titles.titles)
+            zf.writestr("[Content_Types].xml", template.content_types_xml(count))
+            zf.writestr("xl/workbook.xml", template.workbook_xml(titles.titles))
+            zf.writestr("xl/_rels/workbook.xml.rels", template.workbook_rels_xml(count))
+            zf.writestr("docProps/app.xml", APP_XML)
+            for name, data in template.parts.items():
+                if name not in template.dropped:
+                    zf.writestr(name, data)
@@ -1,7 +1,9 @@
 # main.py
 import sys
 import os
+import multiprocessing
 from PyQt6.QtWidgets import QApplication
+from PyQt6.QtCore import QTimer
 
 # 关键：添加项目根目录到Python路径
 ROOT_DIR = os.path.dirname(os.path.abspath(__file__))
@@ -16,7 +18,11 @@ def main():
     DarkTheme.apply(app)
     window = ExcelToInquiryLetter()
     window.show()
+    # 窗口显示后再在后台加载 pandas、openpyxl 和 PDF 字体
+    QTimer.singleShot(0, window.start_warm_up)
     sys.exit(app.exec())
 
 if __name__ == "__main__":
+    # PyInstaller 打包后多进程生成 PDF 需要
+    multiprocessing.freeze_support()
     main()
\ No newline at end of file
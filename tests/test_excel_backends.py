@@ -0,0 +1,68 @@
+# tests/test_excel_backends.py
+"""xml 后端与 openpyxl 后端的输出对比
+
+“打开后一致”指：工作表名称及顺序（包括截断到 31 个字符和重名自动编号的结果）、每个单元格的值、
+合并区域、行高和列宽相同，每个单元格的填充、边框、对齐和数字格式相同，有值的单元格字体相同。
+空单元格（包括合并区域内部的单元格）的字体不比较：两种后端在这些单元格上的字体不同，但不显示任何内容。
+"""
+from copy import copy
+
+import pytest
+from openpyxl import load_workbook
+
+from benchmarks.sample_data import make_data_list
+from core.utils import get_default_template_path
+from generators.excel_generator import generate_excel
+
+LONG_NAME = "四川省成都市某某建设工程有限公司金牛区某某片区安置房一期施工总承包工程"
+
+
+def _letters():
+    data_list = make_data_list(8)
+    # 截断到 31 个字符后相同、大小写不同的重名，以及完全相同的名称
+    data_list[1]["sheet_name"] = LONG_NAME + "甲"
+    data_list[2]["sheet_name"] = LONG_NAME + "乙"
+    data_list[3]["sheet_name"] = "Project"
+    data_list[4]["sheet_name"] = "PROJECT"
+    data_list[5]["sheet_name"] = data_list[0]["sheet_name"]
+    return data_list
+
+
+def _style(cell):
+    # 单元格返回的样式是只读代理，复制后才能与另一工作簿中的样式比较
+    return copy(cell.fill), copy(cell.border), copy(cell.alignment), cell.number_format
+
+
+@pytest.mark.filterwarnings("ignore:Title is more than 31 characters")
+@pytest.mark.parametrize("streaming", [False, True])
+def test_xml_backend_matches_openpyxl(tmp_path, streaming):
+    template = get_default_template_path()
+    expected_path = generate_excel(_letters(), template, tmp_path / "openpyxl.xlsx", streaming=streaming)
+    actual_path = generate_excel(_letters(), template, tmp_path / "xml.xlsx", backend="xml")
+    expected = load_workbook(expected_path)
+    actual = load_workbook(actual_path)
+
+    assert actual.sheetnames == expected.sheetnames
+    assert len(set(expected.sheetnames)) == 8
+    assert expected.sheetnames[1] == LONG_NAME[:31]
+    assert expected.sheetnames[2] == LONG_NAME[:31] + "1"
+    assert expected.sheetnames[4] == "PROJECT1"
+    assert expected.sheetnames[5] == expected.sheetnames[0] + "1"
+
+    for title in expected.sheetnames:
+        ws, other = expected[title], actual[title]
+        assert {str(r) for r in other.merged_cells.ranges} == {str(r) for r in ws.merged_cells.ranges}
+        for key in set(ws.column_dimensions) | set(other.column_dimensions):
+            assert other.column_dimensions[key].width == ws.column_dimensions[key].width, (title, key)
+        for key in set(ws.row_dimensions) | set(other.row_dimensions):
+            assert other.row_dimensions[key].height == ws.row_dimensions[key].height, (title, key)
+
+        max_row = max(ws.max_row, other.max_row)
+        max_col = max(ws.max_column, other.max_column)
+        for row in range(1, max_row + 1):
+            for col in range(1, max_col + 1):
+                cell, other_cell = ws.cell(row, col), other.cell(row, col)
+                assert other_cell.value == cell.value, (title, cell.coordinate)
+                assert _style(other_cell) == _style(cell), (title, cell.coordinate)
+                if cell.value is not None:
+                    assert copy(other_cell.font) == copy(cell.font), (title, cell.coordinate)
@@ -0,0 +1,60 @@
+# tests/test_incremental_pdf.py
+"""增量生成 PDF：中断后再次运行时从 journal-<进程号>.jsonl 记录的位置继续"""
+import os
+import json
+import time
+
+import pytest
+
+from benchmarks.sample_data import make_batch
+from core.letters import pdf_file_name
+from core.progress import Progress, Cancelled
+from generators.pdf_generator import font_files, generate_pdfs
+from generators.pdf_manifest import CACHE_DIR_NAME
+
+pytestmark = [
+    pytest.mark.skipif(len(font_files()) < 2, reason="assets/fonts 中缺少排版用的字体文件"),
+    # 询证函正文沿用 fpdf 的 ln 参数
+    pytest.mark.filterwarnings('ignore:The parameter "ln" is deprecated:DeprecationWarning'),
+]
+
+LETTERS = 12
+
+
+def _journals(cache_dir):
+    return list(cache_dir.glob("journal-*.jsonl"))
+
+
+def test_resume_after_interruption(tmp_path):
+    batch = make_batch(LETTERS)
+    cache_dir = tmp_path / CACHE_DIR_NAME
+
+    def cancel_after_first_write(done, total):
+        # 全部排版完成、第一份单份 PDF 写完并记入日志后取消
+        if total and done > LETTERS:
+            deadline = time.monotonic() + 5
+            while not _journals(cache_dir) and time.monotonic() < deadline:
+                time.sleep(0.01)
+            progress.cancel()
+
+    progress = Progress(cancel_after_first_write)
+    with pytest.raises(Cancelled):
+        generate_pdfs(batch, tmp_path, progress=progress, incremental=True)
+    journals = _journals(cache_dir)
+    assert len(journals) == 1
+    written = {json.loads(line)[0] for line in journals[0].read_text(encoding="utf-8").splitlines()}
+    assert 0 < len(written) < LETTERS
+    assert not (cache_dir / "manifest.json").exists()
+    before = {name: (tmp_path / name).stat().st_mtime_ns for name in written}
+
+    totals = []
+    generate_pdfs(batch, tmp_path, progress=Progress(lambda done, total: totals.append(total)), incremental=True)
+    # 排版结果已缓存：只写出其余的单份 PDF，再由缓存重建合并 PDF
+    assert totals[-1] == (LETTERS - len(written)) + LETTERS
+    assert {name: (tmp_path / name).stat().st_mtime_ns for name in written} == before
+    assert not _journals(cache_dir)
+
+    expected = {pdf_file_name(letter.sheet_name) for letter in batch}
+    manifest = json.loads((cache_dir / "manifest.json").read_text(encoding="utf-8"))
+    assert set(manifest["files"]) == expected
+    assert {name for name in os.listdir(tmp_path) if name.endswith(".pdf")} == expected | {"询证函-合并.pdf"}
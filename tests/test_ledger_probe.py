@@ -0,0 +1,65 @@
+# tests/test_ledger_probe.py
+"""选择台账时的快速探查：在很大的合成台账上检查 list_sheets、probe_sheet 的结果和耗时"""
+import time
+
+import pytest
+from openpyxl import Workbook
+
+from benchmarks.sample_data import make_data_list
+from core.ledger import REQUIRED_COLUMNS, list_sheets, probe_sheet
+
+ROWS = 20000
+EXTRA_COLUMNS = [f"备注{n}" for n in range(40)]
+# 只缺少金额列的工作表
+PARTIAL_COLUMNS = [col for col in REQUIRED_COLUMNS if col not in ("长期应收款（质量保金）", "合计")]
+# list_sheets + probe_sheet 的耗时上限（秒），与 benchmarks/bench_ledger_probe.py 的默认预算相同
+PROBE_BUDGET = 1.0
+
+
+def _row(data):
+    return [data['sheet_name'], data['number'], data['unit'], data['project'],
+            float(data['receivable']), float(data['long_term'] or 0), float(data['total'])]
+
+
+@pytest.fixture(scope="module")
+def large_ledger(tmp_path_factory):
+    """约 4 MB 的台账：两万行、47 列的“台账”，以及缺少两列、只有几行的“汇总”"""
+    path = tmp_path_factory.mktemp("ledger") / "台账.xlsx"
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet("台账")
+    ws.append(REQUIRED_COLUMNS + EXTRA_COLUMNS)
+    for data in make_data_list(ROWS, realistic=True):
+        ws.append(_row(data) + [f"无关数据{n}" for n in range(len(EXTRA_COLUMNS))])
+    ws = wb.create_sheet("汇总")
+    ws.append(PARTIAL_COLUMNS)
+    for data in make_data_list(3):
+        ws.append(_row(data)[:len(PARTIAL_COLUMNS)])
+    wb.save(path)
+    return path
+
+
+def test_probe_reports_sheets_columns_and_rows(large_ledger):
+    assert list_sheets(large_ledger) == ["台账", "汇总"]
+
+    probe = probe_sheet(large_ledger, "台账")
+    assert probe.sheet_name == "台账"
+    assert probe.columns == REQUIRED_COLUMNS + EXTRA_COLUMNS
+    assert probe.missing == []
+    assert probe.rows == ROWS
+
+    probe = probe_sheet(large_ledger, "汇总")
+    assert probe.columns == PARTIAL_COLUMNS
+    assert probe.missing == ["长期应收款（质量保金）", "合计"]
+    assert probe.rows == 3
+
+
+def test_probe_within_budget(large_ledger):
+    def probe():
+        start = time.perf_counter()
+        list_sheets(large_ledger)
+        probe_sheet(large_ledger, "台账")
+        return time.perf_counter() - start
+
+    # 取多次中最快的一次，避免偶发的调度延迟
+    seconds = min(probe() for _ in range(3))
+    assert seconds <= PROBE_BUDGET, f"探查耗时 {seconds * 1000:.0f} ms，超过预算 {PROBE_BUDGET * 1000:.0f} ms"
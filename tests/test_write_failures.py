@@ -0,0 +1,57 @@
+# tests/test_write_failures.py
+"""后台写出失败时错误抛给调用方：增量清单不更新，不留下临时文件和不完整的 ZIP 包"""
+import os
+
+import pytest
+
+from benchmarks.sample_data import make_batch
+from core.letters import Letter, LetterBatch, pdf_file_name
+from generators.pdf_generator import ARCHIVE_NAME, font_files, generate_pdfs
+from generators.pdf_manifest import CACHE_DIR_NAME
+from generators.write_behind import ArchiveWriter, WriteFailed
+
+pytestmark = [
+    pytest.mark.skipif(len(font_files()) < 2, reason="assets/fonts 中缺少排版用的字体文件"),
+    # 询证函正文沿用 fpdf 的 ln 参数
+    pytest.mark.filterwarnings('ignore:The parameter "ln" is deprecated:DeprecationWarning'),
+]
+
+LETTERS = 8
+
+
+def _temporary_files(output_dir):
+    return [name for name in os.listdir(output_dir) if name.endswith(".tmp")]
+
+
+def test_incremental_write_failure_keeps_manifest(tmp_path):
+    batch = make_batch(LETTERS)
+    generate_pdfs(batch, tmp_path, incremental=True)
+    manifest_path = tmp_path / CACHE_DIR_NAME / "manifest.json"
+    manifest = manifest_path.read_bytes()
+
+    # 修改一份询证函，并让它的单份 PDF 无法写出：目标路径被同名文件夹占用
+    letters = list(batch)
+    old = letters[3]
+    letters[3] = Letter(old.header, old.sheet_name, old.number, old.unit, old.project, "123.45", old.long_term,
+                        old.total)
+    target = tmp_path / pdf_file_name(old.sheet_name)
+    target.unlink()
+    target.mkdir()
+
+    with pytest.raises(WriteFailed) as info:
+        generate_pdfs(LetterBatch(batch.header, letters), tmp_path, incremental=True)
+    assert info.value.path == str(target)
+    assert isinstance(info.value.__cause__, OSError)
+    assert manifest_path.read_bytes() == manifest
+    assert not _temporary_files(tmp_path)
+
+
+def test_archive_write_failure_leaves_no_archive(tmp_path, monkeypatch):
+    def disk_full(self, path, data, compression=None):
+        raise OSError("磁盘已满")
+    monkeypatch.setattr(ArchiveWriter, "_write", disk_full)
+
+    with pytest.raises(WriteFailed):
+        generate_pdfs(make_batch(LETTERS), tmp_path, archive=True)
+    assert not (tmp_path / ARCHIVE_NAME).exists()
+    assert not _temporary_files(tmp_path)
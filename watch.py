@@ -0,0 +1,311 @@
+# watch.py
+"""监视文件夹模式：常驻进程自动处理放入收件文件夹的台账（不导入 PyQt6）
+
+示例：
+    python watch.py 收件/ 输出/ --workers 4 -- --sheet Sheet1 --zip
+
+每次运行 cli.py 都要重新启动 Python、导入 pandas、openpyxl、fpdf，解析中文字体和模板。常驻进程
+启动时预热一次（导入生成模块，加载 PDF 字体与静态部分、编译好的用户模板），并用
+generators.process_pool.warm_pool 保持一个常驻进程池，之后每个台账放入后直接开始生成。
+
+- 安装了 watchdog 时用文件系统通知及时发现新文件，否则每 --interval 秒轮询一次，不需要任何系统服务；
+  两种方式都以扫描文件夹的结果为准，通知只是提前唤醒（网络共享盘上的通知并不可靠）。
+- 台账的大小和修改时间连续 --settle 秒不变才算写完（复制到共享盘需要时间）。
+- 每个台账的输出在“输出/<台账名>-<时间>/”中：询证函.xlsx、pdf/、report.json（运行报告）和
+  events.jsonl（与 cli.py --json 相同的事件）；处理后台账移到收件文件夹的“已处理/”或“失败/”中。
+- “输出/jobs.jsonl”每个任务一行：退出码、发现时间、开始与结束时间、等待与生成的秒数，以及从发现
+  到生成完毕的延迟。轮询时新文件最多晚 --interval 秒才被发现，这部分不计入延迟。
+
+-- 之后的参数原样交给 cli.py（例如 --sheet、--zip、--shard-size、模板字段），启动时先检查一遍；
+--excel、--pdf、--report、--json、--workers 由 watch.py 为每个任务指定，不能写在 -- 之后。
+"""
+import os
+import sys
+import json
+import time
+import logging
+import argparse
+import datetime
+import threading
+import contextlib
+import multiprocessing
+from functools import partial
+
+ROOT_DIR = os.path.dirname(os.path.abspath(__file__))
+if ROOT_DIR not in sys.path:
+    sys.path.insert(0, ROOT_DIR)
+
+import cli
+
+logger = logging.getLogger(__name__)
+
+POLL_INTERVAL = 2.0
+SETTLE_SECONDS = 2.0
+DONE_DIR = "已处理"
+FAILED_DIR = "失败"
+JOBS_LOG = "jobs.jsonl"
+# watch.py 为每个任务指定的 cli.py 参数，不能写在 -- 之后
+JOB_OPTIONS = ("excel", "pdf", "report", "json", "workers")
+
+
+def warm_up(template_path=None):
+    """导入生成所需的模块，加载 PDF 字体与静态部分和编译好的模板（主进程和子进程中都执行）"""
+    import core.ledger
+    import core.validation
+    import generators.excel_generator
+    from core.template_plan import load_template_plan
+    from generators.pdf_generator import letter_skeleton
+    if template_path and os.path.exists(template_path):
+        load_template_plan(template_path)
+    letter_skeleton()
+
+
+def is_ledger(name):
+    # ~$ 开头的是 Excel 打开文件时的锁文件
+    return name.lower().endswith(".xlsx") and not name.startswith(("~$", "."))
+
+
+class FolderScanner:
+    """扫描收件文件夹（不含子文件夹），找出已经写完的台账"""
+
+    def __init__(self, folder, settle=SETTLE_SECONDS):
+        self.folder = folder
+        self.settle = settle
+        # 路径 -> (大小与修改时间, 首次发现的时间, 最近一次变化的时间)
+        self._seen = {}
+        # 已处理但没能移走的台账：路径 -> 大小与修改时间（内容变化后重新处理）
+        self._handled = {}
+
+    def scan(self):
+        """返回 (写完的台账 [(路径, 发现时间)]，仍在写入的台账数)，按发现的先后排序"""
+        now = time.time()
+        seen = {}
+        for entry in os.scandir(self.folder):
+            if not is_ledger(entry.name):
+                continue
+            try:
+                if not entry.is_file():
+                    continue
+                stat = entry.stat()
+            except OSError:
+                continue
+            stamp = (stat.st_size, stat.st_mtime_ns)
+            if self._handled.get(entry.path) == stamp:
+                continue
+            previous = self._seen.get(entry.path)
+            if previous is None:
+                seen[entry.path] = (stamp, now, now)
+            elif previous[0] != stamp:
+                seen[entry.path] = (stamp, previous[1], now)
+            else:
+                seen[entry.path] = previous
+        self._seen = seen
+        ready = sorted(((path, detected) for path, (_, detected, changed) in seen.items()
+                        if now - changed >= self.settle), key=lambda item: item[1])
+        return ready, len(seen) - len(ready)
+
+    def handled(self, path):
+        """path 已处理；仍在收件文件夹中时（没能移走）不再重复处理同一内容"""
+        stamp = self._seen.pop(path, (None,))[0]
+        if stamp is not None and os.path.exists(path):
+            self._handled[path] = stamp
+
+
+def _start_observer(folder, wake):
+    """安装了 watchdog 时在文件变化时设置 wake，返回 observer；否则返回 None（只轮询）"""
+    try:
+        from watchdog.observers import Observer
+        from watchdog.events import FileSystemEventHandler
+    except ImportError:
+        return None
+
+    class Handler(FileSystemEventHandler):
+        def on_any_event(self, event):
+            wake.set()
+
+    observer = Observer()
+    observer.schedule(Handler(), folder, recursive=False)
+    observer.start()
+    return observer
+
+
+def _timestamp(seconds):
+    return datetime.datetime.fromtimestamp(seconds).isoformat(timespec="milliseconds")
+
+
+class WatchFolder:
+    """监视 input_dir，把写完的台账逐个交给 cli.run，输出到 output_dir 中各任务的文件夹"""
+
+    def __init__(self, input_dir, output_dir, cli_args=(), workers=1, interval=POLL_INTERVAL,
+                 settle=SETTLE_SECONDS, reporter=None):
+        self.input_dir = input_dir
+        self.output_dir = output_dir
+        self.cli_args = list(cli_args)
+        self.workers = workers
+        self.interval = interval
+        self.scanner = FolderScanner(input_dir, settle)
+        self.reporter = reporter or cli.Reporter(False)
+        self._wake = threading.Event()
+        self._stopped = False
+
+    def stop(self):
+        """可在任意线程中调用；正在处理的台账处理完后返回"""
+        self._stopped = True
+        self._wake.set()
+
+    def run(self, once=False):
+        """持续监视；once=True 时处理完收件文件夹中现有的台账后返回"""
+        observer = _start_observer(self.input_dir, self._wake)
+        try:
+            while not self._stopped:
+                self._wake.clear()
+                ready, pending = self.scanner.scan()
+                for path, detected in ready:
+                    if self._stopped:
+                        break
+                    self.process(path, detected)
+                    self.scanner.handled(path)
+                if once and not pending:
+                    return
+                if not ready:
+                    # 有台账正在写入时按 settle 复查，否则等待通知或下一次轮询
+                    self._wake.wait(min(self.interval, self.scanner.settle) if pending else self.interval)
+        finally:
+            if observer is not None:
+                observer.stop()
+                observer.join()
+
+    def process(self, path, detected):
+        """生成一个台账，写出任务记录（同时追加到 jobs.jsonl）并返回"""
+        started = time.time()
+        stem = os.path.splitext(os.path.basename(path))[0]
+        stamp = datetime.datetime.fromtimestamp(started).strftime("%Y%m%d-%H%M%S")
+        job_dir = self._unique(os.path.join(self.output_dir, f"{stem}-{stamp}"))
+        os.makedirs(job_dir)
+        # 每个任务的参数放在最后，与 cli_args 重复时以它们为准
+        argv = [path, *self.cli_args, "--excel", os.path.join(job_dir, "询证函.xlsx"),
+                "--pdf", os.path.join(job_dir, "pdf"), "--report", os.path.join(job_dir, "report.json"),
+                "--json", "--workers", str(self.workers)]
+        with open(os.path.join(job_dir, "events.jsonl"), "w", encoding="utf-8") as events:
+            reporter = cli.Reporter(True, stream=events)
+            try:
+                code = cli.run(cli.build_parser().parse_args(argv), reporter)
+            except Exception as e:
+                code = reporter.error(cli.EXIT_FAILED, f"处理失败：{e}")
+        finished = time.time()
+
+        moved = self._move(path, DONE_DIR if code == cli.EXIT_OK else FAILED_DIR, f"{stem}-{stamp}")
+        record = {
+            "input": path,
+            "output": job_dir,
+            "code": code,
+            "moved_to": moved,
+            "detected": _timestamp(detected),
+            "started": _timestamp(started),
+            "finished": _timestamp(finished),
+            "wait_seconds": round(started - detected, 3),
+            "run_seconds": round(finished - started, 3),
+            "latency_seconds": round(finished - detected, 3),
+        }
+        with open(os.path.join(self.output_dir, JOBS_LOG), "a", encoding="utf-8") as f:
+            f.write(json.dumps(record, ensure_ascii=False) + "\n")
+        result = "完成" if code == cli.EXIT_OK else f"失败（退出码 {code}，详见 events.jsonl）"
+        self.reporter.emit("job", f"{os.path.basename(path)}：{result}，输出 {job_dir}，"
+                                  f"从发现到完成 {finished - detected:.2f} 秒（生成 {finished - started:.2f} 秒）",
+                           **record)
+        return record
+
+    def _move(self, path, folder, stem):
+        """把处理过的台账移到收件文件夹的子文件夹；移不走（例如仍被占用）时返回 None"""
+        target_dir = os.path.join(self.input_dir, folder)
+        try:
+            os.makedirs(target_dir, exist_ok=True)
+            target = self._unique(os.path.join(target_dir, stem), ".xlsx")
+            os.replace(path, target)
+        except OSError as e:
+            logger.warning("无法移动台账 %s：%s", path, e)
+            return None
+        return target
+
+    @staticmethod
+    def _unique(base, ext=""):
+        path, n = base + ext, 1
+        while os.path.exists(path):
+            n += 1
+            path = f"{base}-{n}{ext}"
+        return path
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        prog="watch.py",
+        description="监视收件文件夹，自动为放入的台账生成询证函（常驻进程，字体、模板和进程池保持预热）",
+        epilog="-- 之后的参数原样交给 cli.py，例如：python watch.py 收件/ 输出/ -- --sheet Sheet1 --zip",
+    )
+    parser.add_argument("input_dir", help="收件文件夹：放入台账 .xlsx 后自动处理")
+    parser.add_argument("output_dir", help="输出文件夹：每个台账一个子文件夹，jobs.jsonl 记录每个任务")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="常驻进程池的进程数")
+    parser.add_argument("--interval", type=float, default=POLL_INTERVAL, help="轮询间隔（秒）")
+    parser.add_argument("--settle", type=float, default=SETTLE_SECONDS,
+                        help="台账的大小和修改时间连续这么多秒不变才开始处理")
+    parser.add_argument("--once", action="store_true", help="处理完收件文件夹中现有的台账后退出")
+    parser.add_argument("--json", action="store_true", help="以 JSON Lines 输出事件")
+    return parser
+
+
+def _user_template():
+    from core.template_manager import TemplateManager
+    return TemplateManager().user_template
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else list(argv)
+    cli_args = []
+    if "--" in argv:
+        argv, cli_args = argv[:argv.index("--")], argv[argv.index("--") + 1:]
+    args = build_parser().parse_args(argv)
+    cli.setup_logging()
+    reporter = cli.Reporter(args.json)
+    if not os.path.isdir(args.input_dir):
+        return reporter.error(cli.EXIT_INPUT, f"收件文件夹不存在：{args.input_dir}")
+    if args.workers < 1:
+        return reporter.error(cli.EXIT_USAGE, "--workers 必须为正整数")
+    if args.interval <= 0 or args.settle < 0:
+        return reporter.error(cli.EXIT_USAGE, "--interval 必须为正数，--settle 不能为负数")
+    # 交给 cli.py 的参数有误时在启动时就报错（argparse 退出码为 2）
+    cli_parser = cli.build_parser()
+    cli_parser.set_defaults(workers=None)
+    options = cli_parser.parse_args(["台账.xlsx", *cli_args])
+    fixed = [f"--{name}" for name in JOB_OPTIONS if getattr(options, name) not in (None, False)]
+    if fixed:
+        hint = "（进程数请在 -- 之前用 watch.py 的 --workers 指定）" if "--workers" in fixed else ""
+        return reporter.error(cli.EXIT_USAGE, f"{', '.join(fixed)} 由 watch.py 为每个任务指定，不能写在 -- 之后{hint}")
+    os.makedirs(args.output_dir, exist_ok=True)
+
+    start = time.perf_counter()
+    template = options.template or _user_template()
+    warm_up(template)
+    from generators import process_pool
+
+    watcher = WatchFolder(args.input_dir, args.output_dir, cli_args, args.workers, args.interval, args.settle,
+                          reporter)
+    with contextlib.ExitStack() as stack:
+        if args.workers > 1:
+            try:
+                stack.enter_context(process_pool.warm_pool(args.workers, partial(warm_up, template)))
+            except process_pool.STARTUP_ERRORS as e:
+                logger.warning("无法启动常驻进程池，每个任务各自启动进程：%s", e)
+        reporter.emit("ready", f"预热完成（{time.perf_counter() - start:.2f} 秒），开始监视：{args.input_dir}",
+                      input=args.input_dir, output=args.output_dir, workers=args.workers,
+                      warm_up_seconds=round(time.perf_counter() - start, 3))
+        try:
+            watcher.run(once=args.once)
+        except KeyboardInterrupt:
+            pass
+    return cli.EXIT_OK
+
+
+if __name__ == "__main__":
+    # 多进程生成需要（与 main.py 一致）
+    multiprocessing.freeze_support()
+    sys.exit(main())